@@ -0,0 +1,322 @@
+"""Time the LRQC endpoints against synthetic MLWH and LRQC databases.
+
+Usage:
+    python -m benchmarks.endpoints --scale 1k --output report.json
+    python -m benchmarks.endpoints --scale 1k --compare previous-report.json
+
+The databases are SQLite files in --data-dir, generated on first use for each scale and
+reused afterwards. Each endpoint is called through the FastAPI TestClient; the report
+has the wall time and the SQL time (from the Server-Timing header) of every endpoint.
+"""
+
+import argparse
+import json
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks.fixtures import SCALES, create_lrqc, create_mlwh, run_name, well_label
+
+SERVER_TIMING_SQL = re.compile(r"[\w-]+-sql;[^,]*dur=([\d.]+)")
+
+
+def prepare_databases(data_dir: Path, scale: str) -> Dict[str, str]:
+    """Get the URLs of the synthetic databases for a scale, creating them if needed.
+
+    The benchmarks write to the LRQC DB, so they are given a fresh copy of it.
+    """
+
+    data_dir.mkdir(parents=True, exist_ok=True)
+    wells = SCALES[scale]
+    urls = {}
+    for name, create in (("mlwh", create_mlwh), ("lrqc", create_lrqc)):
+        path = data_dir / f"{name}-{scale}.db"
+        urls[name] = f"sqlite+pysqlite:///{path}"
+        if not path.exists():
+            start = time.perf_counter()
+            try:
+                create(urls[name], wells).dispose()
+            except BaseException:
+                path.unlink(missing_ok=True)
+                raise
+            print(
+                f"Created {path} in {time.perf_counter() - start:.1f}s", file=sys.stderr
+            )
+
+    working_copy = data_dir / f"lrqc-{scale}-run.db"
+    shutil.copyfile(data_dir / f"lrqc-{scale}.db", working_copy)
+    urls["lrqc"] = f"sqlite+pysqlite:///{working_copy}"
+
+    return urls
+
+
+def make_app(urls: Dict[str, str]):
+    """Build the application, with its databases at `urls`."""
+
+    from lrqc.config import Settings
+    from lrqc.main import create_app
+
+    return create_app(Settings(mlwh_db_url=urls["mlwh"], lrqc_db_url=urls["lrqc"]))
+
+
+def cases(wells: int, batch: int) -> Dict[str, Callable]:
+    """The requests to time, by name. Each takes a client, an RNG and a call number."""
+
+    from lrqc.mlwh.endpoints.inbox import inbox_cache
+
+    def random_wells(rng, count):
+        return [
+            {"run_name": run_name(i), "well_label": well_label(i)}
+            for i in rng.sample(range(wells), min(count, wells))
+        ]
+
+    def inbox_cold(client, rng, n):
+        inbox_cache.clear()
+        return client.get("/mlwh/pacbio/inbox", params={"weeks": 4})
+
+    def inbox(client, rng, n):
+        return client.get("/mlwh/pacbio/inbox", params={"weeks": 4})
+
+    def inbox_page(client, rng, n):
+        return client.get("/mlwh/pacbio/inbox", params={"weeks": 4, "limit": batch})
+
+    def inbox_qc_status(client, rng, n):
+        return client.get(
+            "/mlwh/pacbio/inbox/qc_status", params={"weeks": 4, "pending_only": True}
+        )
+
+    def run(client, rng, n):
+        return client.get("/mlwh/pacbio/run", params=random_wells(rng, 1)[0])
+
+    def well_metrics(client, rng, n):
+        return client.get(
+            "/mlwh/pacbio/well_metrics",
+            params={
+                "since": (datetime.now() - timedelta(weeks=4)).isoformat(),
+                "metrics": ["hifi_read_bases", "p1_num", "local_base_rate"],
+            },
+        )
+
+    def well_metrics_summary(client, rng, n):
+        return client.get(
+            "/mlwh/pacbio/well_metrics/summary",
+            params={
+                "since": (date.today() - timedelta(weeks=8)).isoformat(),
+                "metrics": ["hifi_read_bases", "productive_zmws_num"],
+            },
+        )
+
+    def runs(client, rng, n):
+        return client.post("/mlwh/pacbio/runs", json=random_wells(rng, batch))
+
+    def qc_outcome_create(client, rng, n):
+        return client.post(
+            "/qc/qc_outcome/create",
+            json={
+                "pacbio_entity": random_wells(rng, 1)[0],
+                "qc_outcome": {
+                    "user_name": "bench",
+                    "created_by": "benchmarks",
+                    "description": rng.choice(["Passed", "Failed"]),
+                },
+            },
+        )
+
+    def qc_outcome_create_bulk(client, rng, n):
+        return client.post(
+            "/qc/qc_outcome/create_bulk",
+            json=[
+                {
+                    "pacbio_entity": terms,
+                    "qc_outcome": {
+                        "user_name": "bench",
+                        "created_by": "benchmarks",
+                        "description": rng.choice(["Passed", "Failed"]),
+                    },
+                }
+                for terms in random_wells(rng, batch)
+            ],
+        )
+
+    def qc_outcome_retrieve(client, rng, n):
+        return client.post("/qc/qc_outcome/retrieve", json=random_wells(rng, batch))
+
+    def qc_outcome_search(client, rng, n):
+        prefix = run_name(rng.randrange(wells))
+        return client.get("/qc/qc_outcome/search", params={"run_name_prefix": prefix})
+
+    def qc_outcome_retrieve_with_annotations(client, rng, n):
+        return client.post(
+            "/qc/qc_outcome/retrieve_with_annotations", json=random_wells(rng, batch)
+        )
+
+    def annotations_create(client, rng, n):
+        return client.post(
+            "/qc/annotations/create",
+            json={
+                "pacbio_entities": random_wells(rng, batch),
+                "annotation": {"annotation": f"Benchmark {n}", "user_name": "bench"},
+            },
+        )
+
+    def summary_retrieve(client, rng, n):
+        return client.post("/qc/summary/retrieve", json=random_wells(rng, batch))
+
+    def annotations_retrieve(client, rng, n):
+        return client.post("/qc/annotations/retrieve", json=random_wells(rng, batch))
+
+    return {
+        "inbox_cold": inbox_cold,
+        "inbox": inbox,
+        "inbox_page": inbox_page,
+        "inbox/qc_status": inbox_qc_status,
+        "run": run,
+        "runs": runs,
+        "well_metrics": well_metrics,
+        "well_metrics/summary": well_metrics_summary,
+        "qc_outcome/create": qc_outcome_create,
+        "qc_outcome/create_bulk": qc_outcome_create_bulk,
+        "qc_outcome/retrieve": qc_outcome_retrieve,
+        "qc_outcome/search": qc_outcome_search,
+        "qc_outcome/retrieve_with_annotations": qc_outcome_retrieve_with_annotations,
+        "annotations/create": annotations_create,
+        "annotations/retrieve": annotations_retrieve,
+        "summary/retrieve": summary_retrieve,
+    }
+
+
+def summarise(values: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(values),
+        "median": statistics.median(values),
+        "mean": statistics.fmean(values),
+        "max": max(values),
+    }
+
+
+def time_case(client, case: Callable, repeat: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    case(client, rng, -1)  # warm up
+
+    wall, sql, errors = [], [], 0
+    for n in range(repeat):
+        start = time.perf_counter()
+        response = case(client, rng, n)
+        wall.append((time.perf_counter() - start) * 1000)
+        sql.append(
+            sum(
+                float(ms)
+                for ms in SERVER_TIMING_SQL.findall(
+                    response.headers.get("server-timing", "")
+                )
+            )
+        )
+        if response.status_code >= 400:
+            errors += 1
+
+    return {"wall_ms": summarise(wall), "sql_ms": summarise(sql), "errors": errors}
+
+
+def run_benchmarks(
+    scale: str, data_dir: Path, repeat: int, batch: int, only: List[str] = None
+) -> Dict:
+    """Run the endpoint benchmarks and build the report."""
+
+    from fastapi.testclient import TestClient
+
+    urls = prepare_databases(data_dir, scale)
+    app = make_app(urls)
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    report = {
+        "scale": scale,
+        "wells": SCALES[scale],
+        "repeat": repeat,
+        "batch": batch,
+        "commit": commit,
+        "python": platform.python_version(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {},
+    }
+    with TestClient(app, raise_server_exceptions=False) as client:
+        for name, case in cases(SCALES[scale], batch).items():
+            if only and name not in only:
+                continue
+            report["results"][name] = time_case(client, case, repeat, seed=len(name))
+
+    return report
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Get the endpoints whose median wall time regressed by more than `threshold`."""
+
+    regressions = []
+    for name, result in report["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["wall_ms"]["median"]
+        after = result["wall_ms"]["median"]
+        ratio = after / before if before else float("inf")
+        print(f"{name:45} {before:10.2f} -> {after:10.2f} ms  x{ratio:.2f}")
+        if ratio > threshold:
+            regressions.append(name)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--data-dir", type=Path, default=Path("benchmark-data"))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--batch", type=int, default=96, help="Wells per retrieve/annotate request"
+    )
+    parser.add_argument("--only", nargs="*", help="Names of the endpoints to time")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to a file")
+    parser.add_argument("--compare", type=Path, help="JSON report to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Median slowdown ratio reported as a regression by --compare",
+    )
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        args.scale, args.data_dir, args.repeat, args.batch, args.only
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(
+            report, json.loads(args.compare.read_text()), args.threshold
+        )
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""Synthetic MLWH and LRQC databases for the benchmarks.
+
+The MLWH tables are copies of the PacBio tables of `ml_warehouse.schema` (and the tables
+they reference), with MySQL-specific types replaced by their generic equivalents so that
+they can be created in SQLite.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from ml_warehouse.schema import (
+    Base as MlwhBase,
+    PacBioProductMetrics,
+    PacBioRun,
+    PacBioRunWellMetrics,
+    Sample,
+    Study,
+)
+from sqlalchemy import (
+    Boolean,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    create_engine,
+    insert,
+)
+from sqlalchemy.engine import Engine
+
+from lrqc.lrqc_outcome.db.db_schema import (
+    Annotation,
+    Entity,
+    EntityAnnotation,
+    EntityPacbioEnt,
+    PacbioEnt,
+    QcOutcome,
+    QcOutcomeDict,
+)
+from lrqc.lrqc_outcome.db.migrations import upgrade
+from lrqc.lrqc_outcome.db.summary import rebuild_summaries
+
+# Number of wells generated for each named scale.
+SCALES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+
+WELLS_PER_RUN = 4
+WELL_LABELS = ["A1", "B1", "C1", "D1"]
+INSTRUMENTS = [("Sequel2e", f"6454{i}") for i in range(4)] + [
+    ("Revio", f"84{i:03}") for i in range(4)
+]
+CHIP_TYPES = ["8mChip", "25mChip"]
+QC_OUTCOMES = [
+    ("Passed", "Passed QC"),
+    ("Failed", "Failed QC"),
+    ("On hold", "Waiting for a decision"),
+]
+
+# Number of rows inserted per executemany batch.
+BATCH_SIZE = 10_000
+
+# Share of the wells which have a QC outcome in the LRQC DB.
+QC_OUTCOME_FRACTION = 0.5
+
+
+def run_name(well_index: int) -> str:
+    return f"TRACTION-RUN-{well_index // WELLS_PER_RUN + 1}"
+
+
+def well_label(well_index: int) -> str:
+    return WELL_LABELS[well_index % WELLS_PER_RUN]
+
+
+def _pk(model) -> str:
+    return model.__table__.primary_key.columns[0].name
+
+
+def _fk(model, target) -> str:
+    """Name of the column of `model` referencing the table of `target`."""
+
+    for fk in model.__table__.foreign_keys:
+        if fk.column.table is target.__table__:
+            return fk.parent.name
+    raise ValueError(f"{model.__tablename__} does not reference {target.__tablename__}")
+
+
+def _mlwh_tables() -> MetaData:
+    """Copy the MLWH PacBio tables into new metadata, with generic column types."""
+
+    wanted = [
+        PacBioRun.__table__,
+        PacBioRunWellMetrics.__table__,
+        PacBioProductMetrics.__table__,
+    ]
+    tables: Dict[str, Table] = {}
+    while wanted:
+        table = wanted.pop()
+        if table.name in tables:
+            continue
+        tables[table.name] = table
+        wanted.extend(fk.column.table for fk in table.foreign_keys)
+
+    metadata = MetaData()
+    for table in MlwhBase.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        copy = table.to_metadata(metadata)
+        for column in copy.columns:
+            try:
+                column.type = column.type.as_generic()
+            except NotImplementedError:
+                column.type = String()
+            column.server_default = None
+            column.server_onupdate = None
+
+    return metadata
+
+
+def _filler(column, index: int, now: datetime):
+    """A value for a NOT NULL column the benchmarks do not care about."""
+
+    type_ = column.type
+    if isinstance(type_, Boolean):
+        return False
+    if isinstance(type_, Integer):
+        return index
+    if isinstance(type_, (Float, Numeric)):
+        return 0.0
+    if isinstance(type_, DateTime):
+        return now
+    if isinstance(type_, Date):
+        return now.date()
+    value = f"{column.name}-{index}"
+    length = getattr(type_, "length", None)
+    return value[-length:] if length else value
+
+
+def _rows(table: Table, count: int, values, now: datetime) -> List[dict]:
+    required = [
+        c
+        for c in table.columns
+        if not c.nullable and c.default is None and not c.primary_key
+    ]
+    rows = []
+    for i in range(count):
+        row = {c.name: _filler(c, i + 1, now) for c in required}
+        row.update(values(i))
+        rows.append(row)
+    return rows
+
+
+def _insert(engine: Engine, table: Table, count: int, values, now: datetime):
+    with engine.begin() as connection:
+        for start in range(0, count, BATCH_SIZE):
+            size = min(BATCH_SIZE, count - start)
+            rows = _rows(table, size, lambda i: values(start + i), now)
+            connection.execute(insert(table), rows)
+
+
+def create_mlwh(url: str, wells: int, seed: int = 0) -> Engine:
+    """Create a synthetic MLWH with `wells` PacBio wells completed over the last year.
+
+    Every well has a PacBioRun, a PacBioRunWellMetrics and a PacBioProductMetrics row.
+    """
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    engine = create_engine(url, future=True)
+    metadata = _mlwh_tables()
+    metadata.create_all(engine)
+    tables = metadata.tables
+
+    studies, samples = 50, max(wells // 10, 1)
+    _insert(
+        engine,
+        tables[Study.__tablename__],
+        studies,
+        lambda i: {_pk(Study): i + 1, "id_study_lims": str(5000 + i)},
+        now,
+    )
+    _insert(
+        engine,
+        tables[Sample.__tablename__],
+        samples,
+        lambda i: {_pk(Sample): i + 1, "id_sample_lims": str(100000 + i)},
+        now,
+    )
+
+    completed = [now - timedelta(minutes=rng.randrange(525_600)) for _ in range(wells)]
+
+    def well_metrics(i):
+        instrument_type, instrument_name = INSTRUMENTS[(i // WELLS_PER_RUN) % 8]
+        ccs_mode = rng.choice(["OnInstrument", "OffInstrument", "None"])
+        return {
+            _pk(PacBioRunWellMetrics): i + 1,
+            "pac_bio_run_name": run_name(i),
+            "well_label": well_label(i),
+            "well_start": completed[i] - timedelta(hours=30),
+            "well_complete": completed[i],
+            "last_changed": completed[i],
+            "well_status": "Complete" if rng.random() < 0.95 else "Aborted",
+            "run_status": "Complete",
+            "instrument_type": instrument_type,
+            "instrument_name": instrument_name,
+            "chip_type": CHIP_TYPES[i % 2],
+            "ccs_execution_mode": ccs_mode,
+            "polymerase_num_reads": rng.randrange(1_000_000, 8_000_000),
+            "hifi_num_reads": rng.randrange(500_000, 4_000_000),
+            "hifi_read_bases": rng.randrange(10**10, 4 * 10**10),
+            "hifi_read_quality_median": rng.randrange(25, 40),
+            "productive_zmws_num": rng.randrange(4_000_000, 8_000_000),
+            "p1_num": rng.randrange(2_000_000, 6_000_000),
+            "local_base_rate": rng.uniform(2, 3),
+        }
+
+    def run(i):
+        return {
+            _pk(PacBioRun): i + 1,
+            "last_updated": completed[i],
+            "recorded_at": completed[i],
+            _fk(PacBioRun, Study): i % studies + 1,
+            _fk(PacBioRun, Sample): i % samples + 1,
+            "pac_bio_run_name": run_name(i),
+            "well_label": well_label(i),
+        }
+
+    def product_metrics(i):
+        return {
+            _pk(PacBioProductMetrics): i + 1,
+            _fk(PacBioProductMetrics, PacBioRunWellMetrics): i + 1,
+            _fk(PacBioProductMetrics, PacBioRun): i + 1,
+        }
+
+    _insert(
+        engine, tables[PacBioRunWellMetrics.__tablename__], wells, well_metrics, now
+    )
+    _insert(engine, tables[PacBioRun.__tablename__], wells, run, now)
+    _insert(
+        engine, tables[PacBioProductMetrics.__tablename__], wells, product_metrics, now
+    )
+
+    return engine
+
+
+def create_lrqc(url: str, wells: int, seed: int = 0) -> Engine:
+    """Create an LRQC DB with QC outcomes and annotations for a share of the wells.
+
+    The wells are those of `create_mlwh` for the same number of wells.
+    """
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    engine = create_engine(url, future=True)
+    upgrade(engine)
+
+    indexes = sorted(rng.sample(range(wells), int(wells * QC_OUTCOME_FRACTION)))
+
+    with engine.begin() as connection:
+        connection.execute(
+            insert(QcOutcomeDict),
+            [
+                {"id_qc_outcome_dict": n + 1, "description": d, "long_description": ld}
+                for n, (d, ld) in enumerate(QC_OUTCOMES)
+            ],
+        )
+
+    def rows(n, i):
+        entity_id = n + 1
+        return {
+            PacbioEnt: {
+                "id_pacbio_ent": entity_id,
+                "run_name": run_name(i),
+                "cell_label": well_label(i),
+            },
+            Entity: {
+                "id_entity": entity_id,
+                "type_": "cell",
+                "platform_name": "pacbio",
+            },
+            EntityPacbioEnt: {"id_entity": entity_id, "id_pacbio_ent": entity_id},
+            QcOutcome: {
+                "id_entity": entity_id,
+                "id_qc_outcome_dict": rng.randrange(len(QC_OUTCOMES)) + 1,
+                "user_name": "bench",
+                "created_by": "benchmarks",
+                "date_created": now,
+                "date_updated": now,
+            },
+            Annotation: {
+                "id_annotation": entity_id,
+                "annotation": f"Annotation of well {i}",
+                "user_name": "bench",
+                "date_created": now,
+            },
+            EntityAnnotation: {"id_entity": entity_id, "id_annotation": entity_id},
+        }
+
+    with engine.begin() as connection:
+        for start in range(0, len(indexes), BATCH_SIZE):
+            batch = [
+                rows(start + n, i) for n, i in enumerate(indexes[start:][:BATCH_SIZE])
+            ]
+            for model in batch[0]:
+                connection.execute(insert(model), [r[model] for r in batch])
+        rebuild_summaries(connection)
+
+    return engine
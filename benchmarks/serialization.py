@@ -0,0 +1,165 @@
+"""Compare the CPU time of the validated and trusted response serialization paths.
+
+Usage:
+    python -m benchmarks.serialization --records 1000
+
+For each response model, the same rows are serialized as FastAPI does by default
+(validation against the response model, jsonable_encoder and json.dumps) and with the
+fast path (from_orm_trusted and orjson). The report has the CPU time per 1,000 records.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+from benchmarks.fixtures import run_name, well_label
+
+START = datetime(2022, 1, 1)
+
+
+def _value(field, rng: random.Random) -> Any:
+    if field.outer_type_ in (date, datetime):
+        return START + timedelta(minutes=rng.randrange(500_000))
+    if field.outer_type_ is bool:
+        return rng.random() < 0.5
+    if field.outer_type_ is int:
+        return rng.randrange(10**9)
+    if field.outer_type_ is float:
+        return rng.uniform(0, 100)
+    return f"value-{rng.randrange(1000)}"
+
+
+def _row(model, rng: random.Random, **values) -> SimpleNamespace:
+    """A stand-in for an ORM row with a value for every field of a model."""
+
+    return SimpleNamespace(
+        **{name: _value(field, rng) for name, field in model.__fields__.items()}
+        | values
+    )
+
+
+def cases(records: int) -> Dict[str, Dict[str, Callable[[], Any]]]:
+    """The validated and fast paths building the response content of each model."""
+
+    from lrqc.lrqc_outcome.models import Annotation, AnnotationOut, QcOutcomeOut
+    from lrqc.mlwh.endpoints.pacbio_run import run_response
+    from lrqc.mlwh.models import (
+        PacBioRunInfo,
+        PacBioRunResponse,
+        PacBioRunWellMetrics,
+        Sample,
+        Study,
+    )
+    from lrqc.serialization import from_orm_trusted
+
+    rng = random.Random(0)
+    annotations = [_row(Annotation, rng) for _ in range(records)]
+    outcomes = [_row(QcOutcomeOut, rng) for _ in range(records)]
+    runs = [
+        _row(
+            PacBioRunInfo,
+            rng,
+            pac_bio_run_name=run_name(i),
+            well_label=well_label(i),
+            study=SimpleNamespace(id_study_lims=str(i)),
+            sample=SimpleNamespace(id_sample_lims=str(i)),
+            pac_bio_product_metrics=[
+                SimpleNamespace(
+                    pac_bio_run_well_metrics=_row(PacBioRunWellMetrics, rng)
+                )
+            ],
+        )
+        for i in range(records)
+    ]
+
+    def run_validated(run):
+        return PacBioRunResponse(
+            run_info=run,
+            metrics=run.pac_bio_product_metrics[0].pac_bio_run_well_metrics,
+            study=Study(id=run.study.id_study_lims),
+            sample=Sample(id=run.sample.id_sample_lims),
+        )
+
+    return {
+        "AnnotationOut": {
+            "model": List[AnnotationOut],
+            "validated": lambda: [AnnotationOut.from_orm(a) for a in annotations],
+            "fast": lambda: [from_orm_trusted(AnnotationOut, a) for a in annotations],
+        },
+        "QcOutcomeOut": {
+            "model": List[QcOutcomeOut],
+            "validated": lambda: [QcOutcomeOut.from_orm(o) for o in outcomes],
+            "fast": lambda: [from_orm_trusted(QcOutcomeOut, o) for o in outcomes],
+        },
+        "PacBioRunResponse": {
+            "model": List[PacBioRunResponse],
+            "validated": lambda: [run_validated(run) for run in runs],
+            "fast": lambda: [run_response(run) for run in runs],
+        },
+    }
+
+
+def cpu_ms(call: Callable[[], Any], repeat: int) -> float:
+    """Median CPU time of a call, in milliseconds."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.process_time()
+        call()
+        times.append((time.process_time() - start) * 1000)
+
+    return sorted(times)[len(times) // 2]
+
+
+def run_benchmarks(records: int, repeat: int) -> Dict:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from fastapi.utils import create_response_field
+
+    from lrqc.serialization import FastJSONResponse
+
+    report = {"records": records, "repeat": repeat, "results": {}}
+    for name, case in cases(records).items():
+        field = create_response_field(name="Response", type_=case["model"])
+
+        def validated():
+            value, errors = field.validate(case["validated"](), {}, loc=("response",))
+            assert not errors
+            return JSONResponse(jsonable_encoder(value)).body
+
+        def fast():
+            return FastJSONResponse(case["fast"]()).body
+
+        # Both paths must produce the same response
+        assert json.loads(validated()) == json.loads(fast()), name
+
+        per_1000 = 1000 / records
+        before = cpu_ms(validated, repeat) * per_1000
+        after = cpu_ms(fast, repeat) * per_1000
+        report["results"][name] = {
+            "validated_cpu_ms_per_1000": before,
+            "fast_cpu_ms_per_1000": after,
+            "saved_cpu_ms_per_1000": before - after,
+        }
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(json.dumps(run_benchmarks(args.records, args.repeat), indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Time the cold start of the application in fresh interpreters.
+
+Usage:
+    python -m benchmarks.startup --scale 1k --repeat 10
+    python -m benchmarks.startup --importtime 15
+
+Each run starts a new Python process, as a uvicorn worker does, and times importing
+lrqc.main, building the application with create_app and serving a first request from
+each database. --importtime lists the modules slowest to import when the application
+is built, from `python -X importtime`.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.endpoints import prepare_databases
+from benchmarks.fixtures import SCALES
+
+# Database settings are passed explicitly, none are read from the environment.
+CONFIG_VARIABLES = ("DB_URL", "LRQC_DB_URL", "LRQC_MODE")
+
+COLD_START = """
+import json, sys, time
+
+start = time.perf_counter()
+import lrqc.main
+imported = time.perf_counter()
+
+from lrqc.config import Settings
+
+app = lrqc.main.create_app(Settings(mlwh_db_url=sys.argv[1], lrqc_db_url=sys.argv[2]))
+created = time.perf_counter()
+
+from fastapi.testclient import TestClient
+
+with TestClient(app) as client:
+    ready = time.perf_counter()
+    client.get("/mlwh/pacbio/inbox", params={"weeks": 4}).raise_for_status()
+    client.post("/qc/summary/retrieve", json=[]).raise_for_status()
+    served = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_requests_ms": (served - ready) * 1000,
+}))
+"""
+
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _environment() -> Dict[str, str]:
+    return {k: v for k, v in os.environ.items() if k not in CONFIG_VARIABLES}
+
+
+def summarise(values: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(values),
+        "median": statistics.median(values),
+        "max": max(values),
+    }
+
+
+def cold_start(urls: Dict[str, str], repeat: int) -> Dict[str, Dict[str, float]]:
+    """Time the phases of the cold start of the application, over `repeat` processes.
+
+    Returns:
+        the summary of each phase, in milliseconds; `process_ms` is the wall time of
+        the whole process, from its start to its exit
+    """
+
+    phases: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", COLD_START, urls["mlwh"], urls["lrqc"]],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=_environment(),
+        )
+        phases.setdefault("process_ms", []).append((time.perf_counter() - start) * 1000)
+        for name, ms in json.loads(result.stdout.splitlines()[-1]).items():
+            phases.setdefault(name, []).append(ms)
+
+    return {name: summarise(values) for name, values in phases.items()}
+
+
+def import_times(count: int) -> List[Dict]:
+    """Get the modules slowest to import while building the application.
+
+    Returns:
+        the `count` modules with the longest import time of their own, in
+        milliseconds, with their cumulative import time including their imports
+    """
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from lrqc.main import create_app; create_app()",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=_environment(),
+    )
+
+    modules = [
+        {
+            "module": match.group(4),
+            "self_ms": int(match.group(1)) / 1000,
+            "cumulative_ms": int(match.group(2)) / 1000,
+        }
+        for match in map(IMPORT_TIME.match, result.stderr.splitlines())
+        if match
+    ]
+
+    return sorted(modules, key=lambda m: m["self_ms"], reverse=True)[:count]
+
+
+def run_benchmarks(scale: str, data_dir: Path, repeat: int, importtime: int) -> Dict:
+    urls = prepare_databases(data_dir, scale)
+
+    report = {
+        "scale": scale,
+        "repeat": repeat,
+        "python": sys.version.split()[0],
+        "cold_start": cold_start(urls, repeat),
+    }
+    if importtime:
+        report["slowest_imports"] = import_times(importtime)
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--data-dir", type=Path, default=Path("benchmark-data"))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--importtime",
+        type=int,
+        default=0,
+        help="Number of the slowest modules to import to report",
+    )
+    parser.add_argument("--output", type=Path, help="Write the JSON report to a file")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.scale, args.data_dir, args.repeat, args.importtime)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
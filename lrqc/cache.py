@@ -0,0 +1,659 @@
+"""Bounded caches, kept in process or shared by the processes of a host.
+
+The caches of the application are `Cache`s, whose entries are stored in a backend:
+by default an `LRUCache` in the memory of each process, or with `configure_caches`, a
+`SQLiteCache` in a file shared by all the worker processes of a host, so that they
+share their entries and their invalidations.
+
+The methods of a `Cache` are coroutines. Those of a backend which blocks on I/O run in
+a worker thread, so that they do not hold up the event loop.
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+import orjson
+from pydantic import BaseModel, Field, ValidationError, parse_obj_as
+from sqlalchemy.engine import make_url
+from starlette.concurrency import run_in_threadpool
+
+from lrqc.chunking import chunked
+from lrqc.serialization import dumps
+
+T = TypeVar("T")
+V = TypeVar("V")
+
+
+class CacheStats(BaseModel):
+
+    size: int = Field(default=0, title="Number of cached entries")
+    maxsize: int = Field(default=0, title="Maximum number of cached entries")
+    hits: int = Field(default=0, title="Lookups answered from the cache")
+    misses: int = Field(default=0, title="Lookups not answered from the cache")
+    revalidations: int = Field(
+        default=0,
+        title="Expired entries revalidated",
+        description="Expired entries found unchanged at the source and kept",
+    )
+    evictions: int = Field(
+        default=0, title="Entries evicted to keep the cache within its size"
+    )
+
+
+class CacheBackend(ABC, Generic[V]):
+    """Storage of the entries of a cache, which expire after a time to live.
+
+    Expired entries are kept until they are evicted, so that a caller can revalidate
+    them against the source (see `get_stale` and `touch`) instead of fetching them
+    again. The hit, miss, revalidation and eviction counters are those of the current
+    process.
+
+    Deleting entries invalidates them: it advances the generation of the cache and
+    records it as the generation of their keys. A caller which reads the generation
+    before reading values from the source, and passes it to `set_many`, does not store
+    the values of keys invalidated meanwhile, which could predate the invalidation.
+    Only the invalidations of the last `maxsize` keys invalidated are recorded; any
+    other key is assumed to be invalidated as recently as the last one forgotten.
+
+    Args:
+        maxsize: maximum number of entries
+        ttl: time to live of the entries, in seconds; None for entries which never
+            expire
+    """
+
+    # Whether the methods block on I/O, so that `Cache` runs them in a worker thread.
+    blocking = False
+    # Whether the entries, and their invalidations, are shared by the processes of the
+    # host.
+    shared = False
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[V]:
+        """Get an entry which has not expired, None if there is none."""
+
+    @abstractmethod
+    def get_stale(self, key: Hashable) -> Optional[V]:
+        """Get an entry whether it has expired or not, None if there is none."""
+
+    @abstractmethod
+    def set_many(self, entries: Dict[Hashable, V], generation: Optional[int] = None):
+        """Store entries.
+
+        Args:
+            entries: the values to store, by key
+            generation: the generation of the cache when the values were read from
+                the source; the entries of the keys invalidated since are not stored
+        """
+
+    @abstractmethod
+    def touch(self, key: Hashable):
+        """Restart the time to live of an entry found unchanged at the source."""
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[Hashable]):
+        """Invalidate the entries of some keys."""
+
+    @abstractmethod
+    def generation(self) -> int:
+        """Get the generation of the cache, which every invalidation advances."""
+
+    @abstractmethod
+    def clear(self):
+        """Drop all the entries, invalidating them."""
+
+    @abstractmethod
+    def values(self) -> List[V]:
+        """Get all the entries, expired or not."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, V]:
+        """Get the entries of some keys which have not expired, by key."""
+
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+
+        return found
+
+    def set(self, key: Hashable, value: V):
+        self.set_many({key: value})
+
+    def delete(self, key: Hashable):
+        self.delete_many([key])
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            revalidations=self.revalidations,
+            evictions=self.evictions,
+        )
+
+
+class LRUCache(CacheBackend[V]):
+    """Least-recently-used cache in the memory of the process."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        super().__init__(maxsize, ttl)
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._generation = 0
+        # The generation of the last invalidation of each recently invalidated key, and
+        # the latest generation of the invalidations no longer recorded.
+        self._invalidations: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._floor = 0
+
+    def _fresh(self, stored: float) -> bool:
+        return self.ttl is None or time.monotonic() - stored < self.ttl
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None or not self._fresh(entry[0]):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_stale(self, key: Hashable) -> Optional[V]:
+        entry = self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def set_many(self, entries: Dict[Hashable, V], generation: Optional[int] = None):
+        for key, value in entries.items():
+            if (
+                generation is None
+                or self._invalidations.get(key, self._floor) <= generation
+            ):
+                self._store(key, value)
+
+    def _store(self, key: Hashable, value: V):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, key: Hashable):
+        if key in self._entries:
+            self.revalidations += 1
+            self._store(key, self._entries[key][1])
+
+    def delete_many(self, keys: Iterable[Hashable]):
+        self._generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+            self._invalidations[key] = self._generation
+            self._invalidations.move_to_end(key)
+        while len(self._invalidations) > self.maxsize:
+            _, generation = self._invalidations.popitem(last=False)
+            self._floor = max(self._floor, generation)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def clear(self):
+        self._entries.clear()
+        self._invalidations.clear()
+        self._generation += 1
+        self._floor = self._generation
+
+    def values(self) -> List[V]:
+        return [value for _, value in self._entries.values()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(CacheBackend[V]):
+    """Cache in a SQLite file, shared by the processes which open the same file.
+
+    Entries are stored as JSON under the repr of their key, and validated as
+    `value_type` when read back. An entry which is no longer a valid `value_type`,
+    e.g. after a change of its model, is a miss. When the cache grows beyond
+    `maxsize`, the entries stored longest ago are evicted; eviction runs every
+    `EVICTION_INTERVAL` entries stored by a process, so the cache can briefly hold
+    more entries than `maxsize`.
+
+    Args:
+        path: path of the SQLite file, created if needed
+        name: name of the cache, separating its entries from those of the other caches
+            in the file
+        maxsize: maximum number of entries
+        ttl: time to live of the entries, in seconds; None for entries which never
+            expire
+        value_type: type of the entries, as a pydantic field type
+    """
+
+    EVICTION_INTERVAL = 100
+    # Maximum number of keys in a single statement.
+    CHUNK_SIZE = 500
+
+    blocking = True
+    shared = True
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        value_type: Any = Any,
+    ):
+        super().__init__(maxsize, ttl)
+        self.path = path
+        self.name = name
+        self.value_type = value_type
+        self._written = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                "name TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+                "stored REAL NOT NULL, PRIMARY KEY (name, key)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_entry_stored "
+                "ON cache_entry (name, stored)"
+            )
+            # The generation of each cache, and the latest generation of the
+            # invalidations no longer recorded in cache_invalidation.
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_generation ("
+                "name TEXT NOT NULL PRIMARY KEY, generation INTEGER NOT NULL, "
+                "floor INTEGER NOT NULL)"
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO cache_generation (name, generation, floor) "
+                "VALUES (?, 0, 0)",
+                (self.name,),
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_invalidation ("
+                "name TEXT NOT NULL, key TEXT NOT NULL, generation INTEGER NOT NULL, "
+                "PRIMARY KEY (name, key)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_invalidation_generation "
+                "ON cache_invalidation (name, generation)"
+            )
+
+    def _fresh(self, stored: float) -> bool:
+        return self.ttl is None or time.time() - stored < self.ttl
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the lock of the connection and a write transaction."""
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _load(self, value: bytes) -> Optional[V]:
+        try:
+            return parse_obj_as(self.value_type, orjson.loads(value))
+        except (orjson.JSONDecodeError, ValidationError):
+            return None
+
+    def _select(self, keys: List[Hashable]) -> Dict[str, Tuple[bytes, float]]:
+        rows = {}
+        with self._lock:
+            for chunk in chunked([repr(key) for key in keys], self.CHUNK_SIZE):
+                rows.update(
+                    (key, (value, stored))
+                    for key, value, stored in self._db.execute(
+                        "SELECT key, value, stored FROM cache_entry WHERE name = ? "
+                        f"AND key IN ({', '.join('?' * len(chunk))})",
+                        [self.name, *chunk],
+                    )
+                )
+
+        return rows
+
+    def _invalidated_since(self, keys: List[str], generation: int) -> Set[str]:
+        """Get the keys, as reprs, invalidated after a generation."""
+
+        (floor,) = self._db.execute(
+            "SELECT floor FROM cache_generation WHERE name = ?", (self.name,)
+        ).fetchone()
+        if floor > generation:
+            return set(keys)
+
+        invalidated = set()
+        for chunk in chunked(keys, self.CHUNK_SIZE):
+            invalidated.update(
+                key
+                for key, in self._db.execute(
+                    "SELECT key FROM cache_invalidation WHERE name = ? "
+                    f"AND generation > ? AND key IN ({', '.join('?' * len(chunk))})",
+                    [self.name, generation, *chunk],
+                )
+            )
+
+        return invalidated
+
+    def get(self, key: Hashable) -> Optional[V]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, V]:
+        keys = list(keys)
+        rows = self._select(keys)
+
+        found = {}
+        for key in keys:
+            row = rows.get(repr(key))
+            value = None
+            if row is not None and self._fresh(row[1]):
+                value = self._load(row[0])
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                found[key] = value
+
+        return found
+
+    def get_stale(self, key: Hashable) -> Optional[V]:
+        row = self._select([key]).get(repr(key))
+        return None if row is None else self._load(row[0])
+
+    def set_many(self, entries: Dict[Hashable, V], generation: Optional[int] = None):
+        now = time.time()
+        rows = [
+            (self.name, repr(key), dumps(value), now) for key, value in entries.items()
+        ]
+        with self._transaction():
+            if generation is not None:
+                invalidated = self._invalidated_since([r[1] for r in rows], generation)
+                rows = [row for row in rows if row[1] not in invalidated]
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cache_entry (name, key, value, stored) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+        self._count_writes(len(rows))
+
+    def _count_writes(self, count: int):
+        previous, self._written = self._written, self._written + count
+        if (
+            previous // self.EVICTION_INTERVAL
+            != self._written // self.EVICTION_INTERVAL
+        ):
+            self._evict()
+
+    def _evict(self):
+        with self._transaction():
+            evicted = self._db.execute(
+                "DELETE FROM cache_entry WHERE name = ? AND key IN ("
+                "SELECT key FROM cache_entry WHERE name = ? "
+                "ORDER BY stored DESC LIMIT -1 OFFSET ?)",
+                (self.name, self.name, self.maxsize),
+            ).rowcount
+            forgotten = self._db.execute(
+                "SELECT generation FROM cache_invalidation WHERE name = ? "
+                "ORDER BY generation DESC LIMIT 1 OFFSET ?",
+                (self.name, self.maxsize),
+            ).fetchone()
+            if forgotten is not None:
+                self._db.execute(
+                    "DELETE FROM cache_invalidation WHERE name = ? AND generation <= ?",
+                    (self.name, forgotten[0]),
+                )
+                self._db.execute(
+                    "UPDATE cache_generation SET floor = max(floor, ?) WHERE name = ?",
+                    (forgotten[0], self.name),
+                )
+        self.evictions += evicted
+
+    def touch(self, key: Hashable):
+        with self._lock:
+            touched = self._db.execute(
+                "UPDATE cache_entry SET stored = ? WHERE name = ? AND key = ?",
+                (time.time(), self.name, repr(key)),
+            ).rowcount
+        self.revalidations += touched
+
+    def delete_many(self, keys: Iterable[Hashable]):
+        keys = [repr(key) for key in keys]
+        with self._transaction():
+            self._db.execute(
+                "UPDATE cache_generation SET generation = generation + 1 "
+                "WHERE name = ?",
+                (self.name,),
+            )
+            generation = self._generation()
+            for chunk in chunked(keys, self.CHUNK_SIZE):
+                self._db.execute(
+                    "DELETE FROM cache_entry WHERE name = ? "
+                    f"AND key IN ({', '.join('?' * len(chunk))})",
+                    [self.name, *chunk],
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cache_invalidation (name, key, generation) "
+                "VALUES (?, ?, ?)",
+                [(self.name, key, generation) for key in keys],
+            )
+
+        self._count_writes(len(keys))
+
+    def _generation(self) -> int:
+        return self._db.execute(
+            "SELECT generation FROM cache_generation WHERE name = ?", (self.name,)
+        ).fetchone()[0]
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation()
+
+    def clear(self):
+        with self._transaction():
+            self._db.execute("DELETE FROM cache_entry WHERE name = ?", (self.name,))
+            self._db.execute(
+                "DELETE FROM cache_invalidation WHERE name = ?", (self.name,)
+            )
+            # The floor is set to the new generation.
+            self._db.execute(
+                "UPDATE cache_generation SET generation = generation + 1, "
+                "floor = generation + 1 WHERE name = ?",
+                (self.name,),
+            )
+
+    def values(self) -> List[V]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT value FROM cache_entry WHERE name = ?", (self.name,)
+            ).fetchall()
+
+        values = (self._load(value) for value, in rows)
+
+        return [value for value in values if value is not None]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT count(*) FROM cache_entry WHERE name = ?", (self.name,)
+            ).fetchone()[0]
+
+
+# URL of the backend of the caches, None for in-process caches.
+_backend_url: Optional[str] = None
+
+# The caches of the application, by name.
+_caches: Dict[str, "Cache"] = {}
+
+
+def create_backend(
+    url: Optional[str],
+    name: str,
+    maxsize: int,
+    ttl: Optional[float] = None,
+    value_type: Any = Any,
+) -> CacheBackend:
+    """Create the backend of a cache.
+
+    Args:
+        url: None for an in-process cache, or the URL of a SQLite file shared by the
+            processes of the host, e.g. sqlite:////var/run/lrqc/cache.db
+        name: name of the cache
+        maxsize: maximum number of entries
+        ttl: time to live of the entries, in seconds
+        value_type: type of the entries, to read them back from a shared cache
+
+    Raises:
+        ValueError: the URL is not a SQLite file URL
+    """
+
+    if url is None:
+        return LRUCache(maxsize, ttl)
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or not parsed.database:
+        raise ValueError(f"Unsupported cache URL {url}, expected sqlite:///<path>")
+
+    return SQLiteCache(parsed.database, name, maxsize, ttl, value_type)
+
+
+class Cache(Generic[V]):
+    """A named cache of the application, whose entries are stored in its backend.
+
+    The backend is the one configured by `configure_caches`; see `CacheBackend` for
+    the methods. They are coroutines, but for `clear`, which blocks and is meant for
+    scripts and tests.
+
+    Args:
+        name: name of the cache, unique in the application
+        maxsize: maximum number of entries
+        ttl: time to live of the entries, in seconds; None for entries which never
+            expire
+        value_type: type of the entries, as a pydantic field type
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        value_type: Any = Any,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.value_type = value_type
+        self.backend: CacheBackend[V] = create_backend(
+            _backend_url, name, maxsize, ttl, value_type
+        )
+        _caches[name] = self
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    async def _run(self, method: Callable[..., T], *args: Any) -> T:
+        if self.backend.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def get(self, key: Hashable) -> Optional[V]:
+        return await self._run(self.backend.get, key)
+
+    async def get_stale(self, key: Hashable) -> Optional[V]:
+        return await self._run(self.backend.get_stale, key)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, V]:
+        return await self._run(self.backend.get_many, list(keys))
+
+    async def set(self, key: Hashable, value: V):
+        await self._run(self.backend.set, key, value)
+
+    async def set_many(
+        self, entries: Dict[Hashable, V], generation: Optional[int] = None
+    ):
+        await self._run(self.backend.set_many, entries, generation)
+
+    async def touch(self, key: Hashable):
+        await self._run(self.backend.touch, key)
+
+    async def delete(self, key: Hashable):
+        await self._run(self.backend.delete, key)
+
+    async def delete_many(self, keys: Iterable[Hashable]):
+        await self._run(self.backend.delete_many, list(keys))
+
+    async def generation(self) -> int:
+        return await self._run(self.backend.generation)
+
+    async def values(self) -> List[V]:
+        return await self._run(self.backend.values)
+
+    async def stats(self) -> CacheStats:
+        return await self._run(self.backend.stats)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def configure_caches(url: Optional[str]):
+    """Store the entries of all the caches, existing and future, in a new backend.
+
+    Args:
+        url: None for in-process caches, or the URL of a SQLite file shared by the
+            processes of the host; see `create_backend`
+    """
+
+    global _backend_url
+
+    _backend_url = url
+    for cache in _caches.values():
+        cache.backend = create_backend(
+            url, cache.name, cache.maxsize, cache.ttl, cache.value_type
+        )
+
+
+def clear_caches():
+    """Drop the entries of all the caches."""
+
+    for cache in _caches.values():
+        cache.clear()
@@ -0,0 +1,12 @@
+"""Splitting of long key lists, so that each IN query binds a bounded number of
+parameters."""
+
+from typing import Iterator, Sequence
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    """Split a sequence into consecutive chunks of at most `size` items."""
+
+    for start in range(0, len(items), size):
+        end = start + size
+        yield items[start:end]
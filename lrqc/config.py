@@ -0,0 +1,43 @@
+"""Configuration of the application."""
+
+from typing import Optional
+
+from pydantic import BaseSettings, Field
+
+# LRQC DB used in test mode when no LRQC DB URL is configured.
+TEST_LRQC_DB_URL = "sqlite+aiosqlite:///test.db"
+
+
+class Settings(BaseSettings):
+    """Database and cache URLs of the application, read from the environment by default.
+
+    The URLs are only needed when a database is first used, so that the application
+    can be built without them, e.g. to generate its OpenAPI document.
+    """
+
+    mlwh_db_url: Optional[str] = Field(
+        default=None, env="DB_URL", description="URL of the MLWH DB"
+    )
+    lrqc_db_url: Optional[str] = Field(
+        default=None, env="LRQC_DB_URL", description="URL of the LRQC DB"
+    )
+    lrqc_mode: Optional[str] = Field(
+        default=None,
+        env="LRQC_MODE",
+        description=f"Test mode, using {TEST_LRQC_DB_URL} unless LRQC_DB_URL is set",
+    )
+    cache_url: Optional[str] = Field(
+        default=None,
+        env="LRQC_CACHE_URL",
+        description="URL of a SQLite file, e.g. sqlite:////var/run/lrqc/cache.db, for "
+        "caches shared by the worker processes of a host; in-process caches if unset",
+    )
+
+    def lrqc_url(self) -> Optional[str]:
+        """Get the URL of the LRQC DB, None if it is not configured."""
+
+        if self.lrqc_db_url:
+            return self.lrqc_db_url
+        if self.lrqc_mode:
+            return TEST_LRQC_DB_URL
+        return None
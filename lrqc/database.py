@@ -0,0 +1,217 @@
+"""Helpers shared by the MLWH and LRQC database connections."""
+
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Union
+
+from pydantic import BaseSettings, Field
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from lrqc.instrumentation import instrument_engine
+
+# asyncio drivers used for each database backend.
+ASYNC_DRIVERS = {
+    "mysql": "aiomysql",
+    "mariadb": "aiomysql",
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def to_async_url(url: Union[str, URL]) -> URL:
+    """Get the asyncio equivalent of a database URL.
+
+    A URL which names a synchronous driver (e.g. `mysql+pymysql://...`) is given the
+    asyncio driver for its backend; a URL which already names an asyncio driver is
+    returned as is.
+    """
+
+    url = make_url(url)
+    backend = url.get_backend_name()
+
+    if backend not in ASYNC_DRIVERS or url.get_driver_name() in ASYNC_DRIVERS.values():
+        return url
+
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+class EngineSettings(BaseSettings):
+    """Engine and connection pool settings, read from the environment.
+
+    Subclasses set `Config.env_prefix` to read the settings of one database, e.g.
+    `MLWH_POOL_SIZE` for the MLWH.
+    """
+
+    echo: bool = Field(default=False, description="Log every SQL statement")
+    pool_size: int = Field(
+        default=5, description="Number of connections kept open in the pool"
+    )
+    max_overflow: int = Field(
+        default=10, description="Connections opened beyond pool_size under load"
+    )
+    pool_timeout: float = Field(
+        default=30, description="Seconds to wait for a connection before giving up"
+    )
+    pool_recycle: int = Field(
+        default=3600,
+        description="Seconds after which a connection is replaced, -1 to never recycle",
+    )
+    pool_pre_ping: bool = Field(
+        default=True, description="Test connections for liveness on checkout"
+    )
+
+
+class PoolStats:
+    """Connection pool telemetry for an engine.
+
+    Checkouts are counted from the events of the pool. The checkout wait is recorded
+    by the sessions of a Database, from the start of a transaction to the checkout of
+    its connection, so a session which runs no statement checks out no connection.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.checkouts = 0
+        self.checkout_wait = 0.0
+        self.checkout_wait_max = 0.0
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def record_wait(self, wait: float):
+        """Record how long a session waited for its connection, in seconds."""
+
+        self.checkout_wait += wait
+        self.checkout_wait_max = max(self.checkout_wait_max, wait)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get the current state of the pool and the checkout counters."""
+
+        pool = self.engine.sync_engine.pool
+        stats = {
+            "checkouts": self.checkouts,
+            "checkout_wait_seconds": self.checkout_wait,
+            "checkout_wait_seconds_max": self.checkout_wait_max,
+        }
+        # Only queue pools have a fixed size; SQLite uses NullPool or StaticPool.
+        for name in ("size", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+
+        return stats
+
+
+# Pool telemetry of every engine created by create_engine, by database name.
+pool_stats: Dict[str, PoolStats] = {}
+
+
+def create_engine(
+    name: str, url: Union[str, URL], settings: EngineSettings
+) -> AsyncEngine:
+    """Create an asyncio engine, with pool telemetry and per-request SQL timings.
+
+    Args:
+        name: name of the database, used to report the telemetry
+        url: database URL, with a synchronous or asyncio driver
+        settings: engine and pool settings
+    """
+
+    url = to_async_url(url)
+
+    kwargs = {"echo": settings.echo, "pool_pre_ping": settings.pool_pre_ping}
+    if url.get_backend_name() != "sqlite":
+        kwargs.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+        )
+
+    engine = create_async_engine(url, future=True, **kwargs)
+    pool_stats[name] = PoolStats(engine)
+    instrument_engine(name, engine)
+
+    return engine
+
+
+class TimedSession(Session):
+    """Session recording the checkout wait of its transactions in the PoolStats
+    found in its `info`."""
+
+
+@event.listens_for(TimedSession, "after_transaction_create")
+def _on_transaction_create(session: Session, transaction):
+    if transaction.parent is None:
+        session.info["transaction_start"] = time.perf_counter()
+
+
+@event.listens_for(TimedSession, "after_begin")
+def _on_begin(session: Session, transaction, connection):
+    if transaction.parent is not None:
+        return
+    start = session.info.pop("transaction_start", None)
+    stats = session.info.get("pool_stats")
+    if start is not None and stats is not None:
+        stats.record_wait(time.perf_counter() - start)
+
+
+class Database:
+    """A database whose engine is created when it is first used.
+
+    Args:
+        name: name of the database, used to report the telemetry
+        url: database URL, None if it is not configured
+        settings: engine and pool settings
+    """
+
+    def __init__(
+        self, name: str, url: Optional[Union[str, URL]], settings: EngineSettings
+    ):
+        self.name = name
+        self.url = url
+        self.settings = settings
+        self._engine: Optional[AsyncEngine] = None
+        self._session_factory: Optional[sessionmaker] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        """The engine of the database, created on first access.
+
+        Raises:
+            RuntimeError: no URL is configured for the database
+        """
+
+        if self._engine is None:
+            if not self.url:
+                raise RuntimeError(f"No URL is configured for the {self.name} DB.")
+            self._engine = create_engine(self.name, self.url, self.settings)
+            self._session_factory = sessionmaker(
+                self._engine,
+                class_=AsyncSession,
+                sync_session_class=TimedSession,
+                expire_on_commit=False,
+                info={"pool_stats": pool_stats[self.name]},
+            )
+
+        return self._engine
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Open a session to the database.
+
+        The session checks out a connection when it runs its first statement.
+        """
+
+        self.engine
+        async with self._session_factory() as db:
+            yield db
+
+    async def dispose(self):
+        """Close the connections of the engine, if it was created."""
+
+        if self._engine is not None:
+            await self._engine.dispose()
@@ -0,0 +1,62 @@
+"""Weak ETags and conditional GET requests.
+
+An endpoint derives the tag of a response from a cheap summary of the data it is built
+from (e.g. a digest of the version columns of its rows, or the state of a cache it has
+just refreshed), before loading the data. When the tag matches the If-None-Match header
+of the request, it answers 304 Not Modified without loading or serializing anything.
+"""
+
+import hashlib
+from typing import Any
+
+from fastapi import Request
+from starlette.responses import Response
+
+from lrqc.serialization import FastJSONResponse
+
+ETAG_RESPONSES = {
+    200: {
+        "headers": {
+            "ETag": {
+                "description": "Weak tag of the response, for If-None-Match",
+                "schema": {"type": "string"},
+            }
+        }
+    },
+    304: {"description": "Not Modified. The If-None-Match header matches the data."},
+}
+
+
+def weak_etag(*parts: Any) -> str:
+    """Make a weak ETag from the values describing a version of a response."""
+
+    digest = hashlib.sha1(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+    return f'W/"{digest[:20]}"'
+
+
+def conditional(request: Request) -> bool:
+    """Whether the request has an If-None-Match header to check tags against."""
+
+    return "if-none-match" in request.headers
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether a tag matches the If-None-Match header of a request, weakly compared."""
+
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def tagged_response(content: Any, etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content, headers={"ETag": etag})
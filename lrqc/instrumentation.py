@@ -0,0 +1,79 @@
+"""Per-request accounting of the SQL statements run on each engine."""
+
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class EngineTiming:
+    """Number of statements run on an engine, and the time spent running them."""
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+class RequestTimings:
+    """SQL timings of a single request, by engine name."""
+
+    def __init__(self):
+        self.engines: Dict[str, EngineTiming] = {}
+
+    def record(self, engine_name: str, seconds: float):
+        timing = self.engines.setdefault(engine_name, EngineTiming())
+        timing.statements += 1
+        timing.seconds += seconds
+
+    def server_timing(self, total: float) -> str:
+        """Format the timings as a Server-Timing header value, durations in ms."""
+
+        metrics = [
+            f'{name}-sql;desc="{name} SQL ({timing.statements} statements)"'
+            f";dur={timing.seconds * 1000:.3f}"
+            for name, timing in self.engines.items()
+        ]
+        metrics.append(f"total;dur={total * 1000:.3f}")
+
+        return ", ".join(metrics)
+
+
+# Timings of the request being handled. The middleware sets a new RequestTimings for
+# each request; the engine listeners add to it. SQLAlchemy runs run_sync code in
+# greenlets sharing the context of the calling task, so statements run there count.
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def instrument_engine(name: str, engine: AsyncEngine):
+    """Record the statements run on an engine in the timings of the current request."""
+
+    sync_engine = engine.sync_engine
+
+    def record(conn):
+        elapsed = time.perf_counter() - conn.info["lrqc_query_start"].pop()
+        timings = request_timings.get()
+        if timings is not None:
+            timings.record(name, elapsed)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        start_times: List[float] = conn.info.setdefault("lrqc_query_start", [])
+        start_times.append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record(conn)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # A statement which fails gets no after_cursor_execute event. Errors raised
+        # before a statement was prepared, e.g. on connect, have no start time.
+        conn = context.connection
+        if context.execution_context is not None and conn.info.get("lrqc_query_start"):
+            record(conn)
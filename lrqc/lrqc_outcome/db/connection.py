@@ -1,27 +1,17 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import AsyncIterator
 
-config = {"LQRC_DB_URL": os.environ.get("DB_URL"), "TEST": os.environ.get("LRQC_MODE")}
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-if config["TEST"]:
-    # config["LRQC_DB_URL"] = "sqlite+pysqlite:///:memory:"
-    config["LRQC_DB_URL"] = "sqlite+pysqlite:///test.db"
+from lrqc.database import EngineSettings
 
-if config["LQRC_DB_URL"] is None or config["LQRC_DB_URL"] == "":
-    raise Exception(
-        "ENV['LRQC_DB_URL'] must be set with a database URL, or LRQC_MODE must be set for testing."
-    )
 
-# engine = create_engine(config["LQRC_DB_URL"])
-engine = create_engine("sqlite+pysqlite:///test.db")
-lrqc_session_factory: sessionmaker = sessionmaker(engine, expire_on_commit=False)
+class LrqcEngineSettings(EngineSettings):
+    class Config:
+        env_prefix = "LRQC_"
 
 
-def get_lrqc_db():
+async def get_lrqc_db(request: Request) -> AsyncIterator[AsyncSession]:
     """Get LRQC DB connection."""
-    db = lrqc_session_factory()
-    try:
+    async with request.app.state.lrqc_db.session() as db:
         yield db
-    finally:
-        db.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import JSON, Column, ForeignKey, Index, Integer, String, DateTime
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 
@@ -42,6 +42,13 @@ class Entity(Base):
 
 class PacbioEnt(Base):
     __tablename__ = "pacbio_ent"
+    __table_args__ = (
+        # A run name and cell label identify a single PacbioEnt, see misc.get_or_create.
+        # Also serves lookups by run name alone, or run name prefix.
+        Index(
+            "uq_pacbio_ent_run_name_cell_label", "run_name", "cell_label", unique=True
+        ),
+    )
 
     id_pacbio_ent = Column(Integer, primary_key=True)
     run_name = Column(String(64), comment="Traction LIMS run name")
@@ -63,6 +70,10 @@ class PacbioEnt(Base):
 
 class EntityPacbioEnt(Base):
     __tablename__ = "entity_pacbio_ent"
+    __table_args__ = (
+        Index("uq_entity_pacbio_ent_id_pacbio_ent", "id_pacbio_ent", unique=True),
+        Index("ix_entity_pacbio_ent_id_entity", "id_entity"),
+    )
 
     id_entity_pacbio_ent = Column(Integer, primary_key=True)
     id_entity = Column(
@@ -77,6 +88,10 @@ class EntityPacbioEnt(Base):
 
 class QcOutcome(Base):
     __tablename__ = "qc_outcome"
+    __table_args__ = (
+        Index("uq_qc_outcome_id_entity", "id_entity", unique=True),
+        Index("ix_qc_outcome_date_updated", "date_updated"),
+    )
 
     id_qc_outcome = Column(Integer, primary_key=True)
     id_entity = Column(
@@ -127,6 +142,7 @@ class QcOutcomeDict(Base):
 
 class QcOutcomeHistory(Base):
     __tablename__ = "qc_outcome_history"
+    __table_args__ = (Index("ix_qc_outcome_history_id_entity", "id_entity"),)
 
     id_qc_outcome_history = Column(Integer, primary_key=True)
     # TODO: make foreign key
@@ -187,6 +203,11 @@ class Annotation(Base):
 
 class EntityAnnotation(Base):
     __tablename__ = "entity_annotation"
+    __table_args__ = (
+        Index("ix_entity_annotation_id_entity", "id_entity", "id_annotation"),
+        Index("ix_entity_annotation_id_annotation", "id_annotation"),
+        Index("ix_entity_annotation_id_qc_outcome", "id_qc_outcome"),
+    )
 
     id_entity_annotation = Column(Integer, primary_key=True)
     id_entity = Column(
@@ -203,3 +224,45 @@ class EntityAnnotation(Base):
         nullable=True,
         comment="If defined, a foreign key, see 'qc_outcome'",
     )
+
+
+class QcSummary(Base):
+    __tablename__ = "qc_summary"
+    __table_args__ = (
+        Index(
+            "uq_qc_summary_run_name_cell_label", "run_name", "cell_label", unique=True
+        ),
+        Index("ix_qc_summary_id_entity", "id_entity"),
+    )
+
+    id_qc_summary = Column(Integer, primary_key=True)
+    run_name = Column(String(64), comment="Traction LIMS run name")
+    cell_label = Column(String(64), nullable=True, comment="PacBio cell label")
+    id_entity = Column(
+        Integer, ForeignKey("entity.id_entity"), comment="Foreign key, see 'entity'"
+    )
+    description = Column(
+        String(64), nullable=True, comment="Short description of the current outcome"
+    )
+    long_description = Column(
+        String(64), nullable=True, comment="Long description of the current outcome"
+    )
+    user_name = Column(
+        String(64), nullable=True, comment="User who set the current outcome"
+    )
+    created_by = Column(
+        String(64), nullable=True, comment="System which set the current outcome"
+    )
+    date_created = Column(DateTime, nullable=True)
+    date_updated = Column(DateTime, nullable=True)
+    annotation_count = Column(
+        Integer, nullable=False, default=0, comment="Number of annotations"
+    )
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, comment="Applied schema version")
+    description = Column(String(128), comment="Description of the migration")
+    date_applied = Column(DateTime, server_default=func.now())
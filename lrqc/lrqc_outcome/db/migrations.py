@@ -0,0 +1,194 @@
+"""Versioned migrations for the LRQC DB schema.
+
+The version applied to a database is recorded in the `schema_version` table. A database
+created before versioning was introduced has no such table and is treated as version 1.
+"""
+
+from typing import Callable, List, NamedTuple, Tuple
+
+from sqlalchemy import Index, and_, func, inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+from lrqc.lrqc_outcome.db.db_schema import Base, QcSummary, SchemaVersion
+from lrqc.lrqc_outcome.db.summary import rebuild_summaries
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+# Number of duplicate keys listed when a unique index cannot be created.
+DUPLICATES_SHOWN = 20
+
+
+def _duplicate_keys(connection: Connection, index: Index) -> List[Tuple]:
+    """Get the keys which occur more than once in the columns of a unique index.
+
+    Keys with a NULL are ignored, the index does not constrain them.
+    """
+
+    columns = list(index.columns)
+    stmt = (
+        select(*columns)
+        .where(and_(*(column.isnot(None) for column in columns)))
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .order_by(*columns)
+    )
+
+    return [tuple(row) for row in connection.execute(stmt)]
+
+
+def _check_unique(connection: Connection, index: Index):
+    """Raise an error listing the duplicate keys which would break a unique index."""
+
+    keys = _duplicate_keys(connection, index)
+    if not keys:
+        return
+
+    columns = ", ".join(column.name for column in index.columns)
+    shown = ", ".join(map(repr, keys[:DUPLICATES_SHOWN]))
+    if len(keys) > DUPLICATES_SHOWN:
+        shown += f" and {len(keys) - DUPLICATES_SHOWN} more"
+
+    raise RuntimeError(
+        f"Cannot create the unique index {index.name}: {len(keys)} duplicate "
+        f"({columns}) keys in {index.table.name}: {shown}. Remove the duplicates "
+        "and run the migration again."
+    )
+
+
+def _create_indexes(*names: str) -> Callable[[Connection], None]:
+    """Create the named indexes declared in db_schema, if they do not exist yet.
+
+    The data is checked for duplicates before any unique index is created, as MySQL
+    commits DDL statements straight away.
+    """
+
+    indexes = {
+        index.name: index
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+    }
+
+    def upgrade(connection: Connection):
+        existing = {
+            index["name"]
+            for index_table in {indexes[name].table for name in names}
+            for index in inspect(connection).get_indexes(index_table.name)
+        }
+        missing = [indexes[name] for name in names if name not in existing]
+        for index in missing:
+            if index.unique:
+                _check_unique(connection, index)
+        for index in missing:
+            index.create(connection)
+
+    return upgrade
+
+
+def _initial_schema(connection: Connection):
+    """The schema before versioning; created by create_all, nothing to upgrade."""
+
+
+def _create_qc_summary(connection: Connection):
+    """Create the qc_summary table and backfill it."""
+
+    QcSummary.__table__.create(connection, checkfirst=True)
+    rebuild_summaries(connection)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Initial schema", _initial_schema),
+    Migration(
+        2,
+        "Indexes and unique constraints for entity lookups",
+        _create_indexes(
+            "uq_pacbio_ent_run_name_cell_label",
+            "uq_entity_pacbio_ent_id_pacbio_ent",
+            "ix_entity_pacbio_ent_id_entity",
+            "uq_qc_outcome_id_entity",
+            "ix_qc_outcome_history_id_entity",
+            "ix_entity_annotation_id_entity",
+            "ix_entity_annotation_id_annotation",
+            "ix_entity_annotation_id_qc_outcome",
+        ),
+    ),
+    Migration(3, "QC summary table", _create_qc_summary),
+    Migration(
+        4,
+        "Index for searches by date of last update",
+        _create_indexes("ix_qc_outcome_date_updated"),
+    ),
+    Migration(
+        5,
+        "Index for refreshes of the QC summary by entity",
+        _create_indexes("ix_qc_summary_id_entity"),
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(connection: Connection) -> int:
+    """Get the schema version of a database, 0 if it has no LRQC tables."""
+
+    tables = inspect(connection).get_table_names()
+
+    if SchemaVersion.__tablename__ in tables:
+        version = connection.execute(
+            select(SchemaVersion.version).order_by(SchemaVersion.version.desc())
+        ).scalar()
+        if version is not None:
+            return version
+
+    if "entity" in tables:
+        return 1
+
+    return 0
+
+
+def upgrade(engine: Engine) -> List[int]:
+    """Create or upgrade the LRQC schema in place.
+
+    An empty database gets the full schema and is stamped with the latest version.
+    Otherwise the pending migrations are applied in order, each in its own transaction.
+
+    Args:
+        engine: engine connected to the LRQC DB
+
+    Returns:
+        the versions which were applied
+    """
+
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+        if version == 0:
+            Base.metadata.create_all(connection)
+            connection.execute(
+                SchemaVersion.__table__.insert(),
+                [
+                    {"version": m.version, "description": m.description}
+                    for m in MIGRATIONS
+                ],
+            )
+            return [m.version for m in MIGRATIONS]
+
+        SchemaVersion.__table__.create(connection, checkfirst=True)
+
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(
+                SchemaVersion.__table__.insert(),
+                {"version": migration.version, "description": migration.description},
+            )
+        applied.append(migration.version)
+
+    return applied
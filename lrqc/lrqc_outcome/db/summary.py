@@ -0,0 +1,113 @@
+"""Maintenance of the qc_summary table.
+
+qc_summary holds the current QC state of each PacBio entity, keyed by run name and cell
+label, so that it can be read without joining the entity, outcome and annotation
+tables. The writers refresh the rows of the entities they change in their own
+transaction; `rebuild_summaries` recomputes the whole table.
+"""
+
+from typing import Optional, Sequence, Union
+
+from sqlalchemy import delete, distinct, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from lrqc.chunking import chunked
+from lrqc.lrqc_outcome.db.db_schema import (
+    Entity,
+    EntityAnnotation,
+    EntityPacbioEnt,
+    PacbioEnt,
+    QcOutcome,
+    QcOutcomeDict,
+    QcSummary,
+)
+
+# Maximum number of entity ids in a single refresh statement.
+SUMMARY_CHUNK_SIZE = 500
+
+SUMMARY_COLUMNS = [
+    "run_name",
+    "cell_label",
+    "id_entity",
+    "description",
+    "long_description",
+    "user_name",
+    "created_by",
+    "date_created",
+    "date_updated",
+    "annotation_count",
+]
+
+
+def summary_select():
+    """Select the qc_summary rows, in the order of SUMMARY_COLUMNS, from the QC tables."""
+
+    annotation_count = (
+        select(func.count(distinct(EntityAnnotation.id_annotation)))
+        .filter(EntityAnnotation.id_entity == Entity.id_entity)
+        .scalar_subquery()
+    )
+
+    return (
+        select(
+            PacbioEnt.run_name,
+            PacbioEnt.cell_label,
+            Entity.id_entity,
+            QcOutcomeDict.description,
+            QcOutcomeDict.long_description,
+            QcOutcome.user_name,
+            QcOutcome.created_by,
+            QcOutcome.date_created,
+            QcOutcome.date_updated,
+            annotation_count,
+        )
+        .select_from(PacbioEnt)
+        .join(EntityPacbioEnt, EntityPacbioEnt.id_pacbio_ent == PacbioEnt.id_pacbio_ent)
+        .join(Entity, Entity.id_entity == EntityPacbioEnt.id_entity)
+        .outerjoin(QcOutcome, QcOutcome.id_entity == Entity.id_entity)
+        .outerjoin(
+            QcOutcomeDict,
+            QcOutcomeDict.id_qc_outcome_dict == QcOutcome.id_qc_outcome_dict,
+        )
+    )
+
+
+def refresh_summaries(db: Union[Session, Connection], entity_ids: Sequence[int]):
+    """Recompute the qc_summary rows of some entities.
+
+    Nothing is committed; the caller owns the transaction, so that the summary is
+    updated with the changes it reflects.
+
+    Args:
+        db: session or connection to the LRQC DB, with the changes flushed
+        entity_ids: ids of the entities whose QC state may have changed
+    """
+
+    for chunk in chunked(list(dict.fromkeys(entity_ids)), SUMMARY_CHUNK_SIZE):
+        db.execute(
+            delete(QcSummary)
+            .filter(QcSummary.id_entity.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            insert(QcSummary).from_select(
+                SUMMARY_COLUMNS,
+                summary_select().filter(Entity.id_entity.in_(chunk)),
+            )
+        )
+
+
+def rebuild_summaries(db: Union[Session, Connection]) -> Optional[int]:
+    """Recompute the whole qc_summary table, e.g. to backfill it.
+
+    Returns:
+        the number of rows inserted, if the DB driver reports it
+    """
+
+    db.execute(delete(QcSummary).execution_options(synchronize_session=False))
+    result = db.execute(
+        insert(QcSummary).from_select(SUMMARY_COLUMNS, summary_select())
+    )
+
+    return None if result.rowcount < 0 else result.rowcount
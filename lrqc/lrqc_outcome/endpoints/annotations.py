@@ -1,34 +1,77 @@
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, Request
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from lrqc.lrqc_outcome.db.db_schema import (
     Annotation as DBAnnotation,
+    Entity as DBEntity,
+    EntityAnnotation,
+    EntityPacbioEnt,
+    PacbioEnt,
 )
 
 from lrqc.lrqc_outcome.models import Annotation, AnnotationOut, PacBioSearch
 from lrqc.lrqc_outcome.db.connection import get_lrqc_db
-from lrqc.lrqc_outcome.endpoints.misc import get_or_create, get_entities_pacbio
+from lrqc.lrqc_outcome.db.summary import refresh_summaries
+from lrqc.lrqc_outcome.endpoints.misc import (
+    RETRIEVE_RESPONSES,
+    pacbio_filters,
+    get_or_create_many,
+    get_entities_pacbio,
+    stream_ndjson,
+    wants_ndjson,
+)
+from lrqc.lrqc_outcome.endpoints.summary import invalidate_summaries
+from lrqc.pagination import PageParams, after, page_response, paginate_merged
+from lrqc.serialization import FastJSONRoute, from_orm_trusted
+
+router = APIRouter(route_class=FastJSONRoute)
+
+
+@router.post(
+    "/retrieve", response_model=List[AnnotationOut], responses=RETRIEVE_RESPONSES
+)
+async def retrieve_annotations(
+    search_terms: List[PacBioSearch],
+    request: Request,
+    stream: bool = False,
+    page: PageParams = Depends(),
+    db_session: AsyncSession = Depends(get_lrqc_db),
+) -> List[AnnotationOut]:
+    """Retrieve annotations for a list of entitiy ids
+
+    With a limit or cursor, a page of the annotations is returned, ordered by run name,
+    well label and annotation.
+    """
+
+    if page.requested:
+        return page_response(
+            *await db_session.run_sync(_page_annotations, search_terms, page)
+        )
+
+    if wants_ndjson(request, stream):
+        return stream_ndjson(db_session, search_terms, _retrieve_annotations)
 
-router = APIRouter()
+    return await db_session.run_sync(_retrieve_annotations, search_terms)
 
 
-@router.post("/retrieve", response_model=List[AnnotationOut])
-def retrieve_annotations(
-    search_terms: List[PacBioSearch], db_session: Session = Depends(get_lrqc_db)
+def _retrieve_annotations(
+    db_session: Session, search_terms: List[PacBioSearch]
 ) -> List[AnnotationOut]:
-    """Retrieve annotations for a list of entitiy ids"""
 
-    entities = get_entities_pacbio(search_terms, db_session)
+    entities = get_entities_pacbio(
+        search_terms, db_session, [selectinload(DBEntity.annotations)]
+    )
     output = []
     for (terms, entity) in entities:
         for db_annot in entity.annotations:
-            annot = AnnotationOut(
+            annot = from_orm_trusted(
+                AnnotationOut,
+                db_annot,
                 run_name=terms.run_name,
                 well_label=terms.well_label,
-                annotation=db_annot.annotation,
-                user_name=db_annot.user_name,
-                date_created=db_annot.date_created,
             )
 
             output.append(annot)
@@ -36,11 +79,46 @@ def retrieve_annotations(
     return output
 
 
+def _page_annotations(
+    db_session: Session, search_terms: List[PacBioSearch], page: PageParams
+) -> Tuple[List[AnnotationOut], Optional[str]]:
+
+    key_columns = (PacbioEnt.run_name, PacbioEnt.cell_label, DBAnnotation.id_annotation)
+    stmt = (
+        select(PacbioEnt.run_name, PacbioEnt.cell_label, DBAnnotation)
+        .join(EntityPacbioEnt, EntityPacbioEnt.id_pacbio_ent == PacbioEnt.id_pacbio_ent)
+        .join(EntityAnnotation, EntityAnnotation.id_entity == EntityPacbioEnt.id_entity)
+        .join(
+            DBAnnotation, DBAnnotation.id_annotation == EntityAnnotation.id_annotation
+        )
+        .filter(after(key_columns, page.after((str, str, int))))
+        .order_by(*key_columns)
+        .limit(page.limit + 1)
+    )
+
+    # One query for each chunk of the search terms.
+    rows, next_cursor = paginate_merged(
+        [
+            db_session.execute(stmt.filter(f)).all()
+            for f in pacbio_filters(search_terms)
+        ],
+        lambda row: (row.run_name, row.cell_label, row.Annotation.id_annotation),
+        page.limit,
+    )
+
+    return [
+        from_orm_trusted(
+            AnnotationOut, db_annot, run_name=run_name, well_label=cell_label
+        )
+        for run_name, cell_label, db_annot in rows
+    ], next_cursor
+
+
 @router.post("/create")
-def create_annotation(
+async def create_annotation(
     pacbio_entities: List[PacBioSearch],
     annotation: Annotation,
-    db_session: Session = Depends(get_lrqc_db),
+    db_session: AsyncSession = Depends(get_lrqc_db),
 ):
     """Create an annotation for a list of entities.
 
@@ -50,11 +128,21 @@ def create_annotation(
         db_session: the DB session to the LRQC DB
     """
 
-    db_annotation: DBAnnotation = annotation.to_sqlalchemy()
+    await db_session.run_sync(_create_annotation, pacbio_entities, annotation)
+    await invalidate_summaries(pacbio_entities)
+
 
-    entities = [get_or_create(pacbio_ent, db_session) for pacbio_ent in pacbio_entities]
+def _create_annotation(
+    db_session: Session, pacbio_entities: List[PacBioSearch], annotation: Annotation
+):
+
+    db_annotation: DBAnnotation = annotation.to_sqlalchemy()
 
-    db_annotation.entities = entities
+    db_annotation.entities = list(
+        dict.fromkeys(get_or_create_many(pacbio_entities, db_session))
+    )
 
     db_session.add(db_annotation)
+    db_session.flush()
+    refresh_summaries(db_session, [e.id_entity for e in db_annotation.entities])
     db_session.commit()
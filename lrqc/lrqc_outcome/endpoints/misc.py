@@ -1,70 +1,187 @@
-from typing import List
-
-from sqlalchemy import select, and_
-from sqlalchemy.orm import Session
-
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, List, Sequence, Tuple
+
+from fastapi import Request
+from pydantic import BaseModel
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.interfaces import LoaderOption
+from starlette.responses import StreamingResponse
+
+from lrqc.chunking import chunked
 from lrqc.lrqc_outcome.db.db_schema import (
     Entity as DBEntity,
     PacbioEnt as PacbioEnt,
 )
 from lrqc.lrqc_outcome.models import PacBioSearch
+from lrqc.pagination import PAGE_RESPONSES
+from lrqc.serialization import dumps
 
+# Maximum number of (run_name, well_label) pairs sent in a single tuple-IN query.
+SEARCH_CHUNK_SIZE = 500
 
-def get_or_create(search_terms: PacBioSearch, db_session: Session) -> DBEntity:
-    """Get an instance of DBEntity for a run_name and well_label."""
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
-    run_name = search_terms.run_name
-    well_label = search_terms.well_label
+# OpenAPI description of the endpoints which can stream their results as NDJSON.
+NDJSON_RESPONSES = {
+    200: {
+        "content": {NDJSON_MEDIA_TYPE: {}},
+        "description": "The results, as a JSON array or, when streamed, as "
+        "newline-delimited JSON with one result per line.",
+    }
+}
 
-    pacbio_ent_results: List[PacbioEnt] = (
-        db_session.execute(
-            select(PacbioEnt).filter(
-                and_(PacbioEnt.run_name == run_name, PacbioEnt.cell_label == well_label)
-            )
-        )
-        .scalars()
-        .all()
-    )
+# Responses of the retrieve endpoints, which can stream or paginate their results.
+RETRIEVE_RESPONSES = {
+    200: NDJSON_RESPONSES[200] | PAGE_RESPONSES[200],
+    400: PAGE_RESPONSES[400],
+}
 
-    if len(pacbio_ent_results) == 1:
-        pacbio_ent = pacbio_ent_results[0]
 
-    elif len(pacbio_ent_results):
-        raise Exception(
-            "There should not be more than one PacbioEnt matching these search terms"
-        )
+def get_or_create(search_terms: PacBioSearch, db_session: Session) -> DBEntity:
+    """Get an instance of DBEntity for a run_name and well_label.
 
-    else:
-        pacbio_ent = PacbioEnt(run_name=run_name, cell_label=well_label)
-        pacbio_ent.entity = DBEntity(type_="cell", platform_name="pacbio")
-        db_session.add(pacbio_ent)
-        db_session.commit()
+    New entities are flushed, not committed; the caller owns the transaction.
+    """
 
-    return pacbio_ent.entity
+    return get_or_create_many([search_terms], db_session)[0]
 
 
-def get_entities_pacbio(search_terms: List[PacBioSearch], db_session: Session):
+def get_or_create_many(
+    search_terms: List[PacBioSearch], db_session: Session
+) -> List[DBEntity]:
+    """Get or create the DBEntity instances for a list of run_names and well_labels.
 
-    output = []
+    Existing PacbioEnt rows are resolved with chunked tuple-IN queries and all the
+    missing PacbioEnt, Entity and EntityPacbioEnt rows are inserted in a single flush.
+    Nothing is committed; the caller owns the transaction.
 
-    for term in search_terms:
-        run_name = term.run_name
-        well_label = term.well_label
-
-        results = (
-            db_session.execute(
-                select(PacbioEnt).filter(
-                    and_(
-                        PacbioEnt.run_name == run_name,
-                        PacbioEnt.cell_label == well_label,
-                    )
+    Args:
+        search_terms: run_name and well_label pairs to get or create entities for
+        db_session: the DB session to the LRQC DB
+
+    Returns:
+        the entities, in the order of the search terms
+    """
+
+    keys = list(dict.fromkeys((t.run_name, t.well_label) for t in search_terms))
+
+    pacbio_ents: Dict[Tuple[str, str], PacbioEnt] = {}
+    for chunk in chunked(keys, SEARCH_CHUNK_SIZE):
+        stmt = (
+            select(PacbioEnt)
+            .options(joinedload(PacbioEnt.entity))
+            .filter(tuple_(PacbioEnt.run_name, PacbioEnt.cell_label).in_(chunk))
+        )
+        for pacbio_ent in db_session.execute(stmt).scalars():
+            key = (pacbio_ent.run_name, pacbio_ent.cell_label)
+            if key in pacbio_ents:
+                raise Exception(
+                    "There should not be more than one PacbioEnt matching these search terms"
                 )
-            )
-            .scalars()
-            .all()
+            pacbio_ents[key] = pacbio_ent
+
+    created = []
+    for run_name, well_label in keys:
+        pacbio_ent = pacbio_ents.get((run_name, well_label))
+        if pacbio_ent is None:
+            pacbio_ent = PacbioEnt(run_name=run_name, cell_label=well_label)
+            pacbio_ents[(run_name, well_label)] = pacbio_ent
+            created.append(pacbio_ent)
+        if pacbio_ent.entity is None:
+            pacbio_ent.entity = DBEntity(type_="cell", platform_name="pacbio")
+
+    if created:
+        db_session.add_all(created)
+    db_session.flush()
+
+    return [pacbio_ents[(t.run_name, t.well_label)].entity for t in search_terms]
+
+
+def pacbio_filters(search_terms: List[PacBioSearch]) -> List:
+    """SQL filters selecting the PacBio entities matching search terms, one tuple-IN
+    filter for each chunk of SEARCH_CHUNK_SIZE terms."""
+
+    keys = list(dict.fromkeys((t.run_name, t.well_label) for t in search_terms))
+
+    return [
+        tuple_(PacbioEnt.run_name, PacbioEnt.cell_label).in_(chunk)
+        for chunk in chunked(keys, SEARCH_CHUNK_SIZE)
+    ]
+
+
+def get_entities_pacbio(
+    search_terms: List[PacBioSearch],
+    db_session: Session,
+    options: Sequence[LoaderOption] = (),
+) -> List[Tuple[PacBioSearch, DBEntity]]:
+    """Resolve the entities matching a list of PacBio search terms.
+
+    The search terms are resolved with chunked tuple-IN queries joining pacbio_ent,
+    entity_pacbio_ent and entity, rather than with one query per term.
+
+    Args:
+        search_terms: run_name and well_label pairs to look up
+        db_session: the DB session to the LRQC DB
+        options: loader options applied to the entities, e.g. to eagerly load the
+            relationships the caller is going to read
+
+    Returns:
+        a list of (search term, entity) pairs, in the order of the search terms. Terms
+        which do not match an entity are omitted.
+    """
+
+    keys = list(dict.fromkeys((t.run_name, t.well_label) for t in search_terms))
+
+    found: Dict[Tuple[str, str], List[DBEntity]] = defaultdict(list)
+    for chunk in chunked(keys, SEARCH_CHUNK_SIZE):
+        stmt = (
+            select(PacbioEnt.run_name, PacbioEnt.cell_label, DBEntity)
+            .join(PacbioEnt.entity)
+            .filter(tuple_(PacbioEnt.run_name, PacbioEnt.cell_label).in_(chunk))
+            .order_by(PacbioEnt.id_pacbio_ent)
+            .options(*options)
         )
+        for run_name, cell_label, entity in db_session.execute(stmt):
+            found[(run_name, cell_label)].append(entity)
 
-        for r in results:
-            output.append((term, r.entity))
+    output = []
+    for term in search_terms:
+        for entity in found.get((term.run_name, term.well_label), []):
+            output.append((term, entity))
 
     return output
+
+
+def wants_ndjson(request: Request, stream: bool) -> bool:
+    """Whether the client asked for results streamed as newline-delimited JSON."""
+
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def stream_ndjson(
+    db_session: AsyncSession,
+    search_terms: List[PacBioSearch],
+    hydrate: Callable[[Session, List[PacBioSearch]], List[BaseModel]],
+) -> StreamingResponse:
+    """Stream the results for a list of search terms as newline-delimited JSON.
+
+    The search terms are resolved and hydrated a chunk at a time, and each chunk is
+    dropped from the session once it has been sent, so memory use does not grow with
+    the number of search terms.
+
+    Args:
+        db_session: the DB session to the LRQC DB
+        search_terms: run_name and well_label pairs to look up
+        hydrate: builds the results for a chunk of search terms, as the non-streaming
+            endpoint does for all of them
+    """
+
+    async def records() -> AsyncIterator[bytes]:
+        for chunk in chunked(search_terms, SEARCH_CHUNK_SIZE):
+            for record in await db_session.run_sync(hydrate, chunk):
+                yield dumps(record) + b"\n"
+            db_session.expunge_all()
+
+    return StreamingResponse(records(), media_type=NDJSON_MEDIA_TYPE)
@@ -1,11 +1,17 @@
-from typing import List, Optional
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
 
 from lrqc.lrqc_outcome.models import (
+    Annotation,
+    QcOutcomeCreate,
+    QcOutcomeCreateStatus,
     QcOutcomeOut,
     QcOutcomeInit,
     QcOutcomeOutAnnotated,
@@ -13,33 +19,85 @@ from lrqc.lrqc_outcome.models import (
     PacBioSearch,
 )
 from lrqc.lrqc_outcome.db.db_schema import (
+    Entity as DBEntity,
+    EntityPacbioEnt,
+    PacbioEnt,
     QcOutcome as DBQcOutcome,
     QcOutcomeHistory as DBQcOutcomeHistory,
-    QcOutcomeDict as DBQcOutcomeDict,
     Annotation as DBAnnotation,
 )
+from lrqc.etag import (
+    ETAG_RESPONSES,
+    etag_matches,
+    not_modified,
+    tagged_response,
+    weak_etag,
+)
+from lrqc.chunking import chunked
 from lrqc.lrqc_outcome.db.connection import get_lrqc_db
-from lrqc.lrqc_outcome.endpoints.misc import get_or_create, get_entities_pacbio
+from lrqc.lrqc_outcome.db.summary import refresh_summaries
+from lrqc.lrqc_outcome.endpoints.misc import (
+    RETRIEVE_RESPONSES,
+    SEARCH_CHUNK_SIZE,
+    get_or_create_many,
+    pacbio_filters,
+    get_entities_pacbio,
+    stream_ndjson,
+    wants_ndjson,
+)
+from lrqc.lrqc_outcome.endpoints.summary import invalidate_summaries
+from lrqc.lrqc_outcome.qc_outcome_dict import qc_outcome_dict
+from lrqc.pagination import (
+    PAGE_RESPONSES,
+    PageParams,
+    after,
+    page_response,
+    paginate_merged,
+)
+from lrqc.serialization import FastJSONRoute, from_orm_trusted
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
+router = APIRouter(route_class=FastJSONRoute)
 
-@router.post(
-    "/create",
-    responses={
-        400: {
-            "description": "Bad Request. QC outcome probably violates DB constraints."
-        }
-    },
+# Columns copied from qc_outcome to qc_outcome_history when an outcome is replaced.
+HISTORY_COLUMNS = [
+    "id_entity",
+    "id_qc_outcome_dict",
+    "date_created",
+    "date_updated",
+    "user_name",
+    "created_by",
+]
+
+CREATE_RESPONSES = {
+    400: {"description": "Bad Request. QC outcome probably violates DB constraints."}
+}
+
+# Loading plans for the retrieve endpoints. Every relationship read while building the
+# responses is loaded up front, so the number of queries does not depend on the number
+# of entities retrieved.
+QC_OUTCOME_LOADING = (
+    selectinload(DBEntity.qc_outcome).joinedload(DBQcOutcome.qc_outcome_dict),
 )
-def create_qc_outcome(
+QC_OUTCOME_ANNOTATED_LOADING = QC_OUTCOME_LOADING + (
+    selectinload(DBEntity.annotations),
+)
+
+
+@router.post("/create", responses=CREATE_RESPONSES)
+async def create_qc_outcome(
     pacbio_entity: PacBioSearch,
     qc_outcome: QcOutcomeInit,
     annotation: Optional[AnnotationInit] = None,
-    db_session: Session = Depends(get_lrqc_db),
+    db_session: AsyncSession = Depends(get_lrqc_db),
 ):
     """Create a QC outcome for an entity
 
+    A description new to the QC outcome dictionary is added to it with the long
+    description given. For a description already in the dictionary, the long
+    description given is ignored and the stored one is kept.
+
     Args:
         pacbio_entity: run name and well label for PacBio run to create outcome for
         qc_outcome: the QC outcome to create
@@ -47,89 +105,234 @@ def create_qc_outcome(
         db_session: the DB session to the LRQC DB
     """
 
-    entity = get_or_create(pacbio_entity, db_session)
-
-    # Check for qc_outcome
-    db_qc_outcome = (
-        db_session.execute(
-            select(DBQcOutcome).filter(DBQcOutcome.id_entity == entity.id_entity)
-        )
-        .scalars()
-        .all()
+    (status,) = await _create(
+        db_session,
+        [
+            QcOutcomeCreate(
+                pacbio_entity=pacbio_entity,
+                qc_outcome=qc_outcome,
+                annotation=annotation,
+            )
+        ],
     )
-
-    assert len(db_qc_outcome) <= 1
-    if len(db_qc_outcome) == 1:
-        # There is an existing outcome, create the historical entry
-        db_qc_outcome: DBQcOutcome = db_qc_outcome[0]
-        historical_outcome = DBQcOutcomeHistory(
-            id_entity=db_qc_outcome.id_entity,
-            id_qc_outcome_dict=db_qc_outcome.id_qc_outcome_dict,
-            date_created=db_qc_outcome.date_created,
-            date_updated=db_qc_outcome.date_updated,
-            user_name=db_qc_outcome.user_name,
-            created_by=db_qc_outcome.created_by,
-        )
-        db_session.add(historical_outcome)
-        db_session.commit()
-        db_qc_outcome.id_qc_outcome = db_qc_outcome.id_qc_outcome
-    else:
-        # No existing outcome, create a new one
-        db_qc_outcome = DBQcOutcome(
-            entity=entity,
+    if status.status == "error":
+        raise HTTPException(
+            status_code=400,
+            detail="The new QC outcome violates a database constraint. "
+            "Most likely one of the fields provided is already present in the DB.",
         )
 
-    db_qc_outcome.user_name = qc_outcome.user_name
-    db_qc_outcome.created_by = qc_outcome.created_by
-    db_qc_outcome.qc_outcome_dict = DBQcOutcomeDict(
-        description=qc_outcome.description, long_description=qc_outcome.long_description
+
+@router.post(
+    "/create_bulk",
+    response_model=List[QcOutcomeCreateStatus],
+    responses=CREATE_RESPONSES,
+)
+async def create_qc_outcomes(
+    items: List[QcOutcomeCreate], db_session: AsyncSession = Depends(get_lrqc_db)
+) -> List[QcOutcomeCreateStatus]:
+    """Create QC outcomes for many entities in a single transaction
+
+    As for /create, the long description of a QC outcome is only stored with a
+    description new to the QC outcome dictionary.
+
+    Args:
+        items: the entities with the QC outcome, and optional linked annotation, to
+            create for each
+        db_session: the DB session to the LRQC DB
+
+    Returns:
+        the status of each item, in the order of the request. An item which violates
+        a DB constraint has the status "error" and nothing is written for it; the
+        other items are written.
+    """
+
+    return await _create(db_session, items)
+
+
+async def _create(
+    db_session: AsyncSession, items: List[QcOutcomeCreate]
+) -> List[QcOutcomeCreateStatus]:
+    """Create the QC outcomes of some items, then drop the cached QC summaries of the
+    entities written."""
+
+    statuses = await db_session.run_sync(_create_qc_outcomes, items)
+    await invalidate_summaries(
+        item.pacbio_entity
+        for item, status in zip(items, statuses)
+        if status.status in ("created", "updated")
     )
 
-    if annotation is not None:
+    return statuses
+
+
+def _create_qc_outcomes(
+    db_session: Session, items: List[QcOutcomeCreate]
+) -> List[QcOutcomeCreateStatus]:
 
-        db_qc_outcome.linked_annotation = DBAnnotation(
-            entities=[entity], **annotation.dict()
+    # The first item for an entity wins, the others are reported as duplicates.
+    firsts: Dict[PacBioSearch, QcOutcomeCreate] = {}
+    for item in items:
+        firsts.setdefault(item.pacbio_entity, item)
+
+    entities = dict(zip(firsts, get_or_create_many(list(firsts), db_session)))
+    dict_ids = {
+        item.qc_outcome.description: qc_outcome_dict.get_id(
+            db_session, item.qc_outcome.description, item.qc_outcome.long_description
         )
-    try:
-        db_session.merge(db_qc_outcome)
-        db_session.commit()
+        for item in firsts.values()
+    }
 
+    # All the items are written under one savepoint. If one of them violates a
+    # constraint, they are written again one savepoint each, to find which.
+    failed = set()
+    try:
+        with db_session.begin_nested():
+            existing = _write_qc_outcomes(db_session, firsts, entities, dict_ids)
     except IntegrityError as e:
-        print(e)
-        raise HTTPException(
-            status_code=400,
-            detail="The new QC outcome violates a database constraint. "
-            "Most likely one of the fields provided is already present in the DB.",
+        logger.info("Writing the QC outcomes item by item after: %s", e)
+        existing = {}
+        for terms, item in firsts.items():
+            try:
+                with db_session.begin_nested():
+                    existing |= _write_qc_outcomes(
+                        db_session, {terms: item}, entities, dict_ids
+                    )
+            except IntegrityError as e:
+                logger.warning("QC outcome of %s not written: %s", terms, e)
+                failed.add(terms)
+
+    written = [terms for terms in firsts if terms not in failed]
+    refresh_summaries(db_session, [entities[terms].id_entity for terms in written])
+    db_session.commit()
+
+    statuses = []
+    for item in items:
+        terms = item.pacbio_entity
+        if firsts.get(terms) is not item:
+            status = "duplicate"
+        elif terms in failed:
+            status = "error"
+        elif entities[terms].id_entity in existing:
+            status = "updated"
+        else:
+            status = "created"
+        statuses.append(
+            QcOutcomeCreateStatus(
+                run_name=terms.run_name, well_label=terms.well_label, status=status
+            )
         )
 
+    return statuses
+
 
-@router.post("/retrieve", response_model=List[QcOutcomeOut])
-def retrieve_qc_outcomes(
-    search_terms: List[PacBioSearch], db_session: Session = Depends(get_lrqc_db)
+def _write_qc_outcomes(
+    db_session: Session,
+    items: Dict[PacBioSearch, QcOutcomeCreate],
+    entities: Dict[PacBioSearch, DBEntity],
+    dict_ids: Dict[str, int],
+) -> Dict[int, DBQcOutcome]:
+    """Archive the current QC outcomes of some entities and write the new ones.
+
+    Returns:
+        the outcomes which were replaced, by id_entity
+    """
+
+    existing: Dict[int, DBQcOutcome] = {}
+    entity_ids = [entities[terms].id_entity for terms in items]
+    for chunk in chunked(entity_ids, SEARCH_CHUNK_SIZE):
+        outcomes = select(DBQcOutcome).filter(DBQcOutcome.id_entity.in_(chunk))
+        for db_qc_outcome in db_session.execute(outcomes).scalars():
+            existing[db_qc_outcome.id_entity] = db_qc_outcome
+
+        # Archive the outcomes about to be replaced
+        db_session.execute(
+            insert(DBQcOutcomeHistory).from_select(
+                HISTORY_COLUMNS,
+                select(*(getattr(DBQcOutcome, c) for c in HISTORY_COLUMNS)).filter(
+                    DBQcOutcome.id_entity.in_(chunk)
+                ),
+            )
+        )
+
+    for terms, item in items.items():
+        entity = entities[terms]
+        db_qc_outcome = existing.get(entity.id_entity)
+        if db_qc_outcome is None:
+            db_qc_outcome = DBQcOutcome(entity=entity)
+            db_session.add(db_qc_outcome)
+
+        db_qc_outcome.user_name = item.qc_outcome.user_name
+        db_qc_outcome.created_by = item.qc_outcome.created_by
+        db_qc_outcome.id_qc_outcome_dict = dict_ids[item.qc_outcome.description]
+
+        if item.annotation is not None:
+            db_qc_outcome.linked_annotation = DBAnnotation(
+                entities=[entity], **item.annotation.dict()
+            )
+
+    db_session.flush()
+
+    return existing
+
+
+@router.post(
+    "/retrieve", response_model=List[QcOutcomeOut], responses=RETRIEVE_RESPONSES
+)
+async def retrieve_qc_outcomes(
+    search_terms: List[PacBioSearch],
+    request: Request,
+    stream: bool = False,
+    page: PageParams = Depends(),
+    db_session: AsyncSession = Depends(get_lrqc_db),
 ) -> List[QcOutcomeOut]:
     """Get QC outcomes for entities
 
     Args:
         search_terms: run_name and well_labels of the entities for which to fetch the outcomes
+        stream: stream the outcomes as newline-delimited JSON, as does an Accept header
+            of application/x-ndjson
+        page: when a limit or cursor is given, return a page of the outcomes ordered by
+            run name and well label, instead of all of them in the order of the search
+            terms
         db_session: DB session to the LRQC DB.
 
     Returns:
         a dictionary where the keys are the entity_ids and values are the QC outcomes
     """
 
+    if page.requested:
+        return page_response(
+            *await db_session.run_sync(
+                _page_qc_outcomes,
+                [[f] for f in pacbio_filters(search_terms)],
+                page,
+                False,
+            )
+        )
+
+    if wants_ndjson(request, stream):
+        return stream_ndjson(db_session, search_terms, _retrieve_qc_outcomes)
+
+    return await db_session.run_sync(_retrieve_qc_outcomes, search_terms)
+
+
+def _retrieve_qc_outcomes(
+    db_session: Session, search_terms: List[PacBioSearch]
+) -> List[QcOutcomeOut]:
+
     output = []
-    entities = get_entities_pacbio(search_terms, db_session)
+    entities = get_entities_pacbio(search_terms, db_session, QC_OUTCOME_LOADING)
 
     for (terms, entity) in entities:
         db_qc_outcome = entity.qc_outcome
-        qc_outcome = QcOutcomeOut(
-            date_created=db_qc_outcome.date_created,
-            date_updated=db_qc_outcome.date_updated,
-            user_name=db_qc_outcome.user_name,
-            created_by=db_qc_outcome.created_by,
+        if db_qc_outcome is None:
+            continue
+        qc_outcome = from_orm_trusted(
+            QcOutcomeOut,
+            db_qc_outcome,
             description=db_qc_outcome.qc_outcome_dict.description,
             long_description=db_qc_outcome.qc_outcome_dict.long_description,
-            annotations=entity.annotations,
             run_name=terms.run_name,
             well_label=terms.well_label,
         )
@@ -138,30 +341,229 @@ def retrieve_qc_outcomes(
     return output
 
 
+@router.get(
+    "/search",
+    response_model=List[QcOutcomeOut],
+    responses=PAGE_RESPONSES
+    | ETAG_RESPONSES
+    | {
+        400: {
+            "description": "Bad Request. No search criteria given, or invalid cursor."
+        }
+    },
+)
+async def search_qc_outcomes(
+    request: Request,
+    run_name: Optional[str] = None,
+    run_name_prefix: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    page: PageParams = Depends(),
+    db_session: AsyncSession = Depends(get_lrqc_db),
+) -> List[QcOutcomeOut]:
+    """Find QC outcomes by run name, run name prefix and date of last update
+
+    The criteria given are combined, at least one is needed. Unless paginated, the
+    response has a weak ETag derived from the number of outcomes found, their latest
+    date_updated and their dictionary entries; a request whose If-None-Match header
+    matches it gets a 304.
+
+    Args:
+        run_name: the exact run name of the wells
+        run_name_prefix: the start of the run names of the wells, e.g. TRACTION-RUN-12
+        updated_since: earliest date and time the outcomes were last updated
+        updated_before: date and time before which the outcomes were last updated
+        page: when a limit or cursor is given, return a page of the outcomes
+        db_session: DB session to the LRQC DB.
+
+    Returns:
+        the QC outcomes of all the matching wells, ordered by run name and well label
+    """
+
+    criteria = []
+    if run_name is not None:
+        criteria.append(PacbioEnt.run_name == run_name)
+    if run_name_prefix is not None:
+        criteria.append(PacbioEnt.run_name.startswith(run_name_prefix, autoescape=True))
+    if updated_since is not None:
+        criteria.append(DBQcOutcome.date_updated >= updated_since)
+    if updated_before is not None:
+        criteria.append(DBQcOutcome.date_updated < updated_before)
+    if not criteria:
+        raise HTTPException(
+            status_code=400,
+            detail="At least one of run_name, run_name_prefix, updated_since and "
+            "updated_before is needed.",
+        )
+
+    if page.requested:
+        return page_response(
+            *await db_session.run_sync(_page_qc_outcomes, [criteria], page, False)
+        )
+
+    version = (await db_session.execute(select_qc_outcomes_version(*criteria))).one()
+    etag = weak_etag("qc_outcomes", str(request.query_params), *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return tagged_response(
+        [
+            qc_outcome_out(*row)
+            for row in (await db_session.execute(select_qc_outcomes(*criteria))).all()
+        ],
+        etag,
+    )
+
+
+def select_qc_outcomes_version(*criteria):
+    """Select the version of the QC outcomes of the matching PacBio entities: their
+    number, latest date_updated and sum of dictionary ids.
+
+    It is a single aggregate row, read to compute the ETag of a response. The sum tells
+    apart outcomes changed within the one second resolution of date_updated.
+    """
+
+    return (
+        select(
+            func.count(),
+            func.max(DBQcOutcome.date_updated),
+            func.sum(DBQcOutcome.id_qc_outcome_dict),
+        )
+        .select_from(PacbioEnt)
+        .join(EntityPacbioEnt, EntityPacbioEnt.id_pacbio_ent == PacbioEnt.id_pacbio_ent)
+        .join(DBQcOutcome, DBQcOutcome.id_entity == EntityPacbioEnt.id_entity)
+        .filter(*criteria)
+    )
+
+
+def select_qc_outcomes(*criteria, annotated: bool = False):
+    """Select the run name, cell label and QC outcome of the matching PacBio entities,
+    ordered by run name and cell label."""
+
+    stmt = (
+        select(PacbioEnt.run_name, PacbioEnt.cell_label, DBQcOutcome)
+        .join(EntityPacbioEnt, EntityPacbioEnt.id_pacbio_ent == PacbioEnt.id_pacbio_ent)
+        .join(DBQcOutcome, DBQcOutcome.id_entity == EntityPacbioEnt.id_entity)
+        .options(joinedload(DBQcOutcome.qc_outcome_dict))
+        .filter(*criteria)
+        .order_by(PacbioEnt.run_name, PacbioEnt.cell_label)
+    )
+    if annotated:
+        stmt = stmt.options(
+            selectinload(DBQcOutcome.entity).selectinload(DBEntity.annotations)
+        )
+
+    return stmt
+
+
+def qc_outcome_out(
+    run_name: str, cell_label: str, db_qc_outcome: DBQcOutcome, annotated: bool = False
+) -> QcOutcomeOut:
+    """Build the response for a row selected by select_qc_outcomes."""
+
+    if annotated:
+        return from_orm_trusted(
+            QcOutcomeOutAnnotated,
+            db_qc_outcome,
+            description=db_qc_outcome.qc_outcome_dict.description,
+            long_description=db_qc_outcome.qc_outcome_dict.long_description,
+            annotations=[
+                from_orm_trusted(Annotation, a)
+                for a in db_qc_outcome.entity.annotations
+            ],
+            run_name=run_name,
+            well_label=cell_label,
+        )
+
+    return from_orm_trusted(
+        QcOutcomeOut,
+        db_qc_outcome,
+        description=db_qc_outcome.qc_outcome_dict.description,
+        long_description=db_qc_outcome.qc_outcome_dict.long_description,
+        run_name=run_name,
+        well_label=cell_label,
+    )
+
+
+def _page_qc_outcomes(
+    db_session: Session, criteria_sets: List[List], page: PageParams, annotated: bool
+) -> Tuple[List[QcOutcomeOut], Optional[str]]:
+    # One query is run for each set of criteria, e.g. each chunk of search terms.
+
+    key_columns = (PacbioEnt.run_name, PacbioEnt.cell_label)
+    results = [
+        db_session.execute(
+            select_qc_outcomes(
+                *criteria,
+                after(key_columns, page.after((str, str))),
+                annotated=annotated,
+            ).limit(page.limit + 1)
+        ).all()
+        for criteria in criteria_sets
+    ]
+
+    rows, next_cursor = paginate_merged(
+        results, lambda row: (row.run_name, row.cell_label), page.limit
+    )
+
+    return [qc_outcome_out(*row, annotated=annotated) for row in rows], next_cursor
+
+
 @router.post(
     "/retrieve_with_annotations",
     response_model=List[QcOutcomeOutAnnotated],
+    responses=RETRIEVE_RESPONSES,
 )
-def retrieve_qc_outcome_with_annotations(
-    search_terms: List[PacBioSearch], db_session: Session = Depends(get_lrqc_db)
+async def retrieve_qc_outcome_with_annotations(
+    search_terms: List[PacBioSearch],
+    request: Request,
+    stream: bool = False,
+    page: PageParams = Depends(),
+    db_session: AsyncSession = Depends(get_lrqc_db),
 ):
 
+    if page.requested:
+        return page_response(
+            *await db_session.run_sync(
+                _page_qc_outcomes,
+                [[f] for f in pacbio_filters(search_terms)],
+                page,
+                True,
+            )
+        )
+
+    if wants_ndjson(request, stream):
+        return stream_ndjson(
+            db_session, search_terms, _retrieve_qc_outcome_with_annotations
+        )
+
+    return await db_session.run_sync(
+        _retrieve_qc_outcome_with_annotations, search_terms
+    )
+
+
+def _retrieve_qc_outcome_with_annotations(
+    db_session: Session, search_terms: List[PacBioSearch]
+) -> List[QcOutcomeOutAnnotated]:
+
     output = []
 
-    entities = get_entities_pacbio(search_terms, db_session)
+    entities = get_entities_pacbio(
+        search_terms, db_session, QC_OUTCOME_ANNOTATED_LOADING
+    )
 
     for (terms, entity) in entities:
         if 1 == 1:
             db_qc_outcome: DBQcOutcome = entity.qc_outcome
             if db_qc_outcome is not None:
-                outcome = QcOutcomeOutAnnotated(
-                    date_created=db_qc_outcome.date_created,
-                    date_updated=db_qc_outcome.date_updated,
-                    user_name=db_qc_outcome.user_name,
-                    created_by=db_qc_outcome.created_by,
+                outcome = from_orm_trusted(
+                    QcOutcomeOutAnnotated,
+                    db_qc_outcome,
                     description=db_qc_outcome.qc_outcome_dict.description,
                     long_description=db_qc_outcome.qc_outcome_dict.long_description,
-                    annotations=entity.annotations,
+                    annotations=[
+                        from_orm_trusted(Annotation, a) for a in entity.annotations
+                    ],
                     run_name=terms.run_name,
                     well_label=terms.well_label,
                 )
@@ -0,0 +1,103 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from lrqc.cache import Cache
+from lrqc.chunking import chunked
+from lrqc.lrqc_outcome.db.connection import get_lrqc_db
+from lrqc.lrqc_outcome.db.db_schema import QcSummary as DBQcSummary
+from lrqc.lrqc_outcome.endpoints.misc import SEARCH_CHUNK_SIZE
+from lrqc.lrqc_outcome.models import PacBioSearch, QcSummaryOut
+from lrqc.serialization import FastJSONRoute, from_orm_trusted
+
+router = APIRouter(route_class=FastJSONRoute)
+
+# The QC summary of each entity, by run name and well label, as a 1-tuple holding None
+# for entities without a summary. The writers of the QC tables invalidate the entries
+# of the entities they change once committed, and a summary read before an
+# invalidation is not stored after it. The summaries are only cached in a shared
+# backend: the writers of a worker process could not invalidate the in-process entries
+# of the others.
+qc_summary_cache: Cache[Tuple[Optional[QcSummaryOut]]] = Cache(
+    "qc_summaries",
+    maxsize=100_000,
+    ttl=300,
+    value_type=Tuple[Optional[QcSummaryOut]],
+)
+
+
+@router.post("/retrieve", response_model=List[QcSummaryOut])
+async def retrieve_summaries(
+    search_terms: List[PacBioSearch], db_session: AsyncSession = Depends(get_lrqc_db)
+) -> List[QcSummaryOut]:
+    """Get the current QC state of entities
+
+    Args:
+        search_terms: run_name and well_labels of the entities
+        db_session: DB session to the LRQC DB
+
+    Returns:
+        the current QC outcome and the number of annotations of each entity, in the
+        order of the search terms. Entities unknown to the LRQC DB are omitted.
+    """
+
+    return await get_summaries(db_session, search_terms)
+
+
+async def get_summaries(
+    db_session: AsyncSession, search_terms: List[PacBioSearch]
+) -> List[QcSummaryOut]:
+    """Look up the QC summaries of entities, in the order of the search terms.
+
+    The summaries are read from the QC summary cache when possible.
+    """
+
+    keys = list(dict.fromkeys((t.run_name, t.well_label) for t in search_terms))
+
+    summaries: Dict[Tuple[str, str], Optional[QcSummaryOut]] = {}
+    if qc_summary_cache.shared:
+        cached = await qc_summary_cache.get_many(keys)
+        summaries = {key: summary for key, (summary,) in cached.items()}
+    missing = [key for key in keys if key not in summaries]
+    if missing:
+        generation = await qc_summary_cache.generation()
+        summaries |= await db_session.run_sync(_select_summaries, missing)
+        if qc_summary_cache.shared:
+            await qc_summary_cache.set_many(
+                {key: (summaries.get(key),) for key in missing}, generation
+            )
+
+    return [
+        summaries[(t.run_name, t.well_label)]
+        for t in search_terms
+        if summaries.get((t.run_name, t.well_label)) is not None
+    ]
+
+
+def _select_summaries(
+    db_session: Session, keys: List[Tuple[str, str]]
+) -> Dict[Tuple[str, str], QcSummaryOut]:
+
+    summaries = {}
+    for chunk in chunked(keys, SEARCH_CHUNK_SIZE):
+        stmt = select(DBQcSummary).filter(
+            tuple_(DBQcSummary.run_name, DBQcSummary.cell_label).in_(chunk)
+        )
+        for row in db_session.execute(stmt).scalars():
+            summaries[(row.run_name, row.cell_label)] = from_orm_trusted(
+                QcSummaryOut, row, well_label=row.cell_label
+            )
+
+    return summaries
+
+
+async def invalidate_summaries(search_terms: Iterable[PacBioSearch]):
+    """Drop the cached QC summaries of entities whose QC state was changed."""
+
+    if qc_summary_cache.shared:
+        await qc_summary_cache.delete_many(
+            {(t.run_name, t.well_label) for t in search_terms}
+        )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -222,3 +222,89 @@ class QcOutcomeOutAnnotated(QcOutcomeOut):
                 "annotations": [Annotation.Config.schema_extra["example"]],
             }
         }
+
+
+class QcOutcomeCreate(BaseModel):
+
+    pacbio_entity: PacBioSearch = Field(title="Entity to create the outcome for")
+    qc_outcome: QcOutcomeInit = Field(title="The QC outcome to create")
+    annotation: Optional[AnnotationInit] = Field(
+        default=None,
+        title="Linked annotation",
+        description="Optional annotation linked to the outcome",
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "pacbio_entity": PacBioSearch.Config.schema_extra["example"],
+                "qc_outcome": QcOutcomeInit.Config.schema_extra["example"],
+                "annotation": AnnotationInit.Config.schema_extra["example"],
+            }
+        }
+
+
+class QcOutcomeCreateStatus(BaseModel):
+
+    run_name: str = Field(
+        default=None, title="PacBio run name", description="PacBio run name"
+    )
+    well_label: str = Field(
+        default=None, title="PacBio well label", description="PacBio well label"
+    )
+    status: Literal["created", "updated", "duplicate", "error"] = Field(
+        title="Outcome of the item",
+        description="created: the entity had no QC outcome; updated: the previous "
+        "outcome was archived and replaced; duplicate: the entity is set by an "
+        "earlier item of the request, this item was ignored; error: the item "
+        "violates a DB constraint, nothing was written for it",
+    )
+
+    class Config:
+        schema_extra = {
+            "example": PacBioSearch.Config.schema_extra["example"]
+            | {"status": "updated"}
+        }
+
+
+class QcSummaryOut(BaseModel):
+
+    run_name: str = Field(
+        default=None, title="PacBio run name", description="PacBio run name"
+    )
+    well_label: str = Field(
+        default=None, title="PacBio well label", description="PacBio well label"
+    )
+    description: Optional[str] = Field(
+        default=None,
+        title="Short description",
+        description="Short description of the current QC outcome, if any",
+    )
+    long_description: Optional[str] = Field(
+        default=None, title="Long description", description="Long description"
+    )
+    user_name: Optional[str] = Field(
+        default=None,
+        title="User name",
+        description="User who set the current QC outcome",
+    )
+    created_by: Optional[str] = Field(
+        default=None,
+        title="System which created the outcome.",
+        description="Application or script name, RT ticket, etc.",
+    )
+    date_created: Optional[datetime] = Field(default=None, title="Date created")
+    date_updated: Optional[datetime] = Field(default=None, title="Date updated")
+    annotation_count: int = Field(
+        default=0,
+        title="Annotation count",
+        description="Number of annotations of the entity",
+    )
+
+    class Config:
+        orm_mode = True
+
+        schema_extra = {
+            "example": QcOutcomeOut.Config.schema_extra["example"]
+            | {"annotation_count": 2}
+        }
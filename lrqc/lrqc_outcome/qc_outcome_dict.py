@@ -0,0 +1,108 @@
+"""In-process lookup table of the QC outcome dictionary.
+
+QC outcomes refer to a small set of qc_outcome_dict rows, unique by description. The
+lookup table maps descriptions to dictionary ids, so that writing an outcome does not
+need to load or insert a dictionary row. It is reloaded from the DB when a description
+is missing from it, or once it is older than `max_age`.
+"""
+
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from lrqc.lrqc_outcome.db.db_schema import QcOutcomeDict as DBQcOutcomeDict
+
+
+class _Table:
+    def __init__(self, ids: Dict[str, int]):
+        self.ids = ids
+        self.loaded = time.monotonic()
+
+
+class QcOutcomeDictLookup:
+    """Description to id lookup of qc_outcome_dict, for each database used.
+
+    Args:
+        max_age: age after which a table is reloaded from the DB
+    """
+
+    def __init__(self, max_age: timedelta = timedelta(minutes=10)):
+        self.max_age = max_age
+        self._tables: Dict[str, _Table] = {}
+
+    def refresh(self, db_session: Session) -> Dict[str, int]:
+        """Reload the dictionary from the DB of a session."""
+
+        ids = dict(
+            db_session.execute(
+                select(DBQcOutcomeDict.description, DBQcOutcomeDict.id_qc_outcome_dict)
+            ).all()
+        )
+        self._tables[str(db_session.get_bind().url)] = _Table(ids)
+
+        return ids
+
+    def _ids(self, db_session: Session) -> Dict[str, int]:
+        table = self._tables.get(str(db_session.get_bind().url))
+        if table is None or time.monotonic() - table.loaded > (
+            self.max_age.total_seconds()
+        ):
+            return self.refresh(db_session)
+
+        return table.ids
+
+    def get_id(
+        self,
+        db_session: Session,
+        description: str,
+        long_description: Optional[str] = None,
+    ) -> int:
+        """Get the id of the dictionary entry with a description, creating it if needed.
+
+        A new entry is flushed but not committed. It is picked up by the lookup table
+        when it is next reloaded, so that an entry rolled back with its transaction is
+        never used. If a concurrent transaction creates the same entry first, that
+        entry is used.
+
+        Args:
+            db_session: DB session to the LRQC DB
+            description: the short description of the QC outcome
+            long_description: long description given to a new entry; the long
+                description of an existing entry is left as it is
+
+        Returns:
+            the id_qc_outcome_dict of the entry
+        """
+
+        ids = self._ids(db_session)
+        if description not in ids:
+            ids = self.refresh(db_session)
+        if description in ids:
+            return ids[description]
+
+        entry = DBQcOutcomeDict(
+            description=description, long_description=long_description
+        )
+        try:
+            with db_session.begin_nested():
+                db_session.add(entry)
+        except IntegrityError:
+            # A locking read sees the entry committed by the other transaction, even
+            # under repeatable read.
+            return db_session.execute(
+                select(DBQcOutcomeDict.id_qc_outcome_dict)
+                .filter(DBQcOutcomeDict.description == description)
+                .with_for_update(read=True)
+            ).scalar_one()
+
+        return entry.id_qc_outcome_dict
+
+    def clear(self):
+        self._tables.clear()
+
+
+qc_outcome_dict = QcOutcomeDictLookup()
@@ -1,15 +1,148 @@
-from fastapi import FastAPI
-from starlette.responses import RedirectResponse
-from lrqc.lrqc_outcome.router import router as lrqc_router
-from lrqc.mlwh.router import router as mlwh_router
+"""The LRQC application.
 
+`create_app` builds the application from explicit settings; `app`, the application
+configured from the environment, is built on first access so that importing this
+module is cheap:
 
-app = FastAPI(title="LRQC")
-app.include_router(lrqc_router, prefix="/qc")
-app.include_router(mlwh_router, prefix="/mlwh")
+    uvicorn lrqc.main:app
+    uvicorn --factory lrqc.main:create_app
+"""
 
+import logging
+import time
+from typing import AsyncIterator, Optional
 
-@app.get("/")
+from fastapi import APIRouter, FastAPI, Request
+from starlette.responses import PlainTextResponse, RedirectResponse
+from starlette.routing import Match
+
+from lrqc.cache import configure_caches
+from lrqc.config import Settings
+from lrqc.database import Database
+from lrqc.instrumentation import RequestTimings, request_timings
+from lrqc.lrqc_outcome.db.connection import LrqcEngineSettings
+from lrqc.metrics import record_request, render_metrics
+from lrqc.mlwh.connection import MlwhEngineSettings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the application.
+
+    No database is connected to until a request needs it. The caches of the
+    application are configured with the cache URL of the settings.
+
+    Args:
+        settings: database and cache URLs, read from the environment by default
+
+    Returns:
+        the application
+    """
+
+    # The endpoint modules, and the ml_warehouse schema they import, are only loaded
+    # when an application is built.
+    from lrqc.lrqc_outcome.router import router as lrqc_router
+    from lrqc.mlwh.router import router as mlwh_router
+
+    if settings is None:
+        settings = Settings()
+
+    configure_caches(settings.cache_url)
+
+    app = FastAPI(title="LRQC")
+    app.state.mlwh_db = Database("mlwh", settings.mlwh_db_url, MlwhEngineSettings())
+    app.state.lrqc_db = Database("lrqc", settings.lrqc_url(), LrqcEngineSettings())
+
+    app.include_router(lrqc_router, prefix="/qc")
+    app.include_router(mlwh_router, prefix="/mlwh")
+    app.include_router(router)
+    app.middleware("http")(instrument_requests)
+
+    @app.on_event("shutdown")
+    async def dispose_engines():
+        await app.state.mlwh_db.dispose()
+        await app.state.lrqc_db.dispose()
+
+    return app
+
+
+def __getattr__(name: str):
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def route_path(request: Request) -> str:
+    """Get the path template of the route which handled a request."""
+
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+
+    return "unmatched"
+
+
+async def instrument_requests(request: Request, call_next):
+    """Time requests and the SQL they run, and report it in Server-Timing headers.
+
+    The body of a streamed response, e.g. NDJSON, is produced after its headers are
+    sent, so its Server-Timing header only covers the time to the headers. Its full
+    timings go to the metrics and to the `lrqc.main` log, at INFO level, once the body
+    has been sent.
+    """
+
+    timings = RequestTimings()
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    total = time.perf_counter() - start
+
+    response.headers["Server-Timing"] = timings.server_timing(total)
+
+    if "content-length" in response.headers:
+        record_request(request.method, route_path(request), total, timings)
+    else:
+        response.body_iterator = _timed_stream(
+            response.body_iterator, request, start, timings
+        )
+
+    return response
+
+
+async def _timed_stream(
+    body: AsyncIterator[bytes], request: Request, start: float, timings: RequestTimings
+) -> AsyncIterator[bytes]:
+    # The statements run while streaming are recorded in `timings` too: the endpoint
+    # runs in a task which inherited the context of the request.
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        total = time.perf_counter() - start
+        record_request(request.method, route_path(request), total, timings)
+        logger.info(
+            "%s %s streamed, Server-Timing: %s",
+            request.method,
+            request.url.path,
+            timings.server_timing(total),
+        )
+
+
+@router.get("/")
 async def root():
     """Redirect from root to docs."""
     return RedirectResponse(url="/docs")
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Database pool and request metrics in the Prometheus text format."""
+    return render_metrics()
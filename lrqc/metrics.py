@@ -0,0 +1,177 @@
+"""Application metrics in the Prometheus text exposition format."""
+
+import bisect
+import math
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from lrqc.database import pool_stats
+from lrqc.instrumentation import RequestTimings
+
+Sample = Tuple[Dict[str, str], float]
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+
+class Histogram:
+    """Cumulative histogram of observations, as a Prometheus histogram."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, labels: Dict[str, str]) -> Iterable[Tuple[str, Sample]]:
+        """Get the bucket, sum and count samples, with their metric name suffix."""
+
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else str(bound)
+            yield "_bucket", (labels | {"le": le}, cumulative)
+        yield "_sum", (labels, self.sum)
+        yield "_count", (labels, self.count)
+
+
+# Request latency, SQL time and SQL statements, by (method, route) and engine.
+request_duration: Dict[Tuple[str, str], Histogram] = {}
+request_sql_duration: Dict[Tuple[str, str, str], Histogram] = {}
+request_sql_statements: Dict[Tuple[str, str, str], int] = {}
+
+
+def record_request(method: str, route: str, seconds: float, timings: RequestTimings):
+    """Add the latency and SQL timings of a request to the per-route metrics."""
+
+    request_duration.setdefault((method, route), Histogram()).observe(seconds)
+    for engine, timing in timings.engines.items():
+        key = (method, route, engine)
+        request_sql_duration.setdefault(key, Histogram()).observe(timing.seconds)
+        request_sql_statements[key] = (
+            request_sql_statements.get(key, 0) + timing.statements
+        )
+
+
+# Name, type, help text and PoolStats.snapshot key of the pool metrics.
+POOL_METRICS = [
+    ("lrqc_db_pool_size", "gauge", "Connections kept open in the pool.", "size"),
+    (
+        "lrqc_db_pool_checked_out",
+        "gauge",
+        "Connections currently checked out of the pool.",
+        "checkedout",
+    ),
+    (
+        "lrqc_db_pool_overflow",
+        "gauge",
+        "Connections currently open beyond the pool size.",
+        "overflow",
+    ),
+    (
+        "lrqc_db_pool_checkouts_total",
+        "counter",
+        "Connections checked out for requests.",
+        "checkouts",
+    ),
+    (
+        "lrqc_db_pool_checkout_wait_seconds_total",
+        "counter",
+        "Time spent by requests waiting for a connection.",
+        "checkout_wait_seconds",
+    ),
+    (
+        "lrqc_db_pool_checkout_wait_seconds_max",
+        "gauge",
+        "Longest time a request waited for a connection.",
+        "checkout_wait_seconds_max",
+    ),
+]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def format_metric(
+    name: str, type_: str, help_: str, samples: Iterable[Sample]
+) -> List[str]:
+    """Format the samples of a metric as lines of Prometheus text."""
+
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} {type_}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    return lines
+
+
+def format_histogram(
+    name: str, help_: str, histograms: Iterable[Tuple[Dict[str, str], Histogram]]
+) -> List[str]:
+    """Format labelled histograms as lines of Prometheus text."""
+
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} histogram"]
+    for labels, histogram in histograms:
+        for suffix, (sample_labels, value) in histogram.samples(labels):
+            lines.append(f"{name}{suffix}{_format_labels(sample_labels)} {value}")
+
+    return lines
+
+
+def render_metrics() -> str:
+    """Render all the application metrics."""
+
+    snapshots = {name: stats.snapshot() for name, stats in pool_stats.items()}
+
+    lines = []
+    for name, type_, help_, key in POOL_METRICS:
+        samples = [
+            ({"engine": engine}, snapshot[key])
+            for engine, snapshot in snapshots.items()
+            if key in snapshot
+        ]
+        lines.extend(format_metric(name, type_, help_, samples))
+
+    lines.extend(
+        format_histogram(
+            "lrqc_request_duration_seconds",
+            "Time taken to handle requests.",
+            (
+                ({"method": method, "route": route}, histogram)
+                for (method, route), histogram in request_duration.items()
+            ),
+        )
+    )
+    lines.extend(
+        format_histogram(
+            "lrqc_request_sql_duration_seconds",
+            "Time spent running SQL statements per request.",
+            (
+                ({"method": method, "route": route, "engine": engine}, histogram)
+                for (method, route, engine), histogram in request_sql_duration.items()
+            ),
+        )
+    )
+    lines.extend(
+        format_metric(
+            "lrqc_request_sql_statements_total",
+            "counter",
+            "SQL statements run while handling requests.",
+            (
+                ({"method": method, "route": route, "engine": engine}, count)
+                for (method, route, engine), count in request_sql_statements.items()
+            ),
+        )
+    )
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,143 @@
+"""Summary statistics of PacBio well metrics, by instrument, chip type and period.
+
+Wells are grouped by instrument name, chip type and the bucket (day, week starting on
+Monday, or month) their well_complete falls in. The metrics of each group are
+summarised with NumPy: the number of values, mean, extremes and percentiles, ignoring
+the wells without a value.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Literal, Sequence, Tuple
+
+import numpy as np
+
+from lrqc.mlwh.models import MetricStats, MetricSummary
+
+Bucket = Literal["day", "week", "month"]
+
+# Percentiles of each metric, in the order of the MetricStats fields.
+PERCENTILES = (0, 10, 25, 50, 75, 90, 100)
+PERCENTILE_FIELDS = ("min", "p10", "p25", "median", "p75", "p90", "max")
+
+
+def bucket_start(day: date, bucket: Bucket) -> date:
+    """Get the first day of the bucket of a day."""
+
+    if isinstance(day, datetime):
+        day = day.date()
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, bucket: Bucket) -> date:
+    """Get the first day of the bucket after the one starting on `start`."""
+
+    if bucket == "week":
+        return start + timedelta(weeks=1)
+    if bucket == "month":
+        return (start.replace(day=1) + timedelta(days=31)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_starts(times: Sequence[datetime], bucket: Bucket) -> np.ndarray:
+    """Get the first day of the bucket of each time, as datetime64[D]."""
+
+    days = np.array(times, dtype="datetime64[D]")
+    if bucket == "week":
+        # 1970-01-01, day 0, was a Thursday.
+        return days - (days.astype("int64") + 3) % 7
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    return days
+
+
+def metric_stats(values: np.ndarray) -> MetricStats:
+    """Summarise the values of a metric, ignoring NaNs."""
+
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return MetricStats.construct(count=0)
+
+    percentiles = np.percentile(values, PERCENTILES)
+
+    return MetricStats.construct(
+        count=len(values),
+        mean=float(values.mean()),
+        **dict(zip(PERCENTILE_FIELDS, percentiles.tolist())),
+    )
+
+
+def factorize(values: Sequence) -> Tuple[np.ndarray, list]:
+    """Encode values as integer codes which sort like the values, None first.
+
+    Returns:
+        the code of each value and the value of each code
+    """
+
+    values = np.array(values, dtype=object)
+    missing = np.equal(values, None)
+    labels, codes = np.unique(
+        np.where(missing, "", values).astype(str), return_inverse=True
+    )
+    codes = np.where(missing, 0, codes.reshape(-1) + 1)
+
+    return codes, [None, *labels.tolist()]
+
+
+def summarise(
+    instrument_names: Sequence[str],
+    chip_types: Sequence[str],
+    starts: np.ndarray,
+    metrics: Dict[str, Sequence],
+) -> List[MetricSummary]:
+    """Summarise metrics by instrument name, chip type and bucket.
+
+    Args:
+        instrument_names: instrument name of each well
+        chip_types: chip type of each well
+        starts: first day of the bucket of each well, from `bucket_starts`
+        metrics: values of each metric for each well, None where missing
+
+    Returns:
+        the summaries of the groups, ordered by bucket, instrument name and chip type
+    """
+
+    if not len(starts):
+        return []
+
+    instrument_codes, instrument_labels = factorize(instrument_names)
+    chip_codes, chip_labels = factorize(chip_types)
+    days = starts.astype("datetime64[D]").astype("int64")
+
+    # Sort the wells by bucket, instrument name and chip type, so that each group is a
+    # slice of the sorted columns.
+    order = np.lexsort((chip_codes, instrument_codes, days))
+    keys = (days[order], instrument_codes[order], chip_codes[order])
+    changed = np.zeros(len(order) - 1, dtype=bool)
+    for key in keys:
+        changed |= key[1:] != key[:-1]
+    bounds = [0, *(np.flatnonzero(changed) + 1).tolist(), len(order)]
+    values = {
+        name: np.array(column, dtype=float)[order] for name, column in metrics.items()
+    }
+    bucket_days = keys[0].astype("datetime64[D]").tolist()
+
+    summaries = []
+    for first, end in zip(bounds[:-1], bounds[1:]):
+        summaries.append(
+            MetricSummary.construct(
+                bucket_start=bucket_days[first],
+                instrument_name=instrument_labels[keys[1][first]],
+                chip_type=chip_labels[keys[2][first]],
+                wells=end - first,
+                metrics={
+                    name: metric_stats(column[first:end])
+                    for name, column in values.items()
+                },
+            )
+        )
+
+    return summaries
@@ -1,23 +1,17 @@
-import os
-from sqlalchemy import create_engine
+from typing import AsyncIterator
 
-from sqlalchemy.orm import sessionmaker, Session
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-config = {"DB_URL": os.environ.get("DB_URL"), "TEST": os.environ.get("LRQC_MODE")}
+from lrqc.database import EngineSettings
 
-if config["DB_URL"] is None or config["DB_URL"] == "":
-    raise Exception(
-        "ENV['DB_URL'] must be set with a database URL, or LRQC_MODE must be set for testing."
-    )
 
-engine = create_engine(config["DB_URL"], future=True, echo=True)
-session_factory: sessionmaker = sessionmaker(engine, expire_on_commit=False)
+class MlwhEngineSettings(EngineSettings):
+    class Config:
+        env_prefix = "MLWH_"
 
 
-def get_mlwh_db() -> Session:
+async def get_mlwh_db(request: Request) -> AsyncIterator[AsyncSession]:
     """Get MLWH DB connection"""
-    db = session_factory()
-    try:
+    async with request.app.state.mlwh_db.session() as db:
         yield db
-    finally:
-        db.close()
@@ -1,49 +1,158 @@
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from ml_warehouse.schema import PacBioRunWellMetrics
-from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from lrqc.etag import (
+    ETAG_RESPONSES,
+    etag_matches,
+    not_modified,
+    tagged_response,
+    weak_etag,
+)
+from lrqc.lrqc_outcome.db.connection import get_lrqc_db
+from lrqc.lrqc_outcome.endpoints.summary import get_summaries
+from lrqc.lrqc_outcome.models import PacBioSearch
 from lrqc.mlwh.connection import get_mlwh_db
-from lrqc.mlwh.models import InboxResults
-
-router = APIRouter()
-
-
-@router.get("/inbox", response_model=InboxResults)
-def get_inbox(weeks: int, db_session: Session = Depends(get_mlwh_db)) -> InboxResults:
-    """Get inbox of PacBio runs"""
-
-    stmt = select(PacBioRunWellMetrics).filter(
-        and_(
-            PacBioRunWellMetrics.polymerase_num_reads is not None,
-            or_(
-                and_(
-                    PacBioRunWellMetrics.ccs_execution_mode.in_(
-                        ("OffInstrument", "OnInstrument")
-                    ),
-                    PacBioRunWellMetrics.hifi_num_reads is not None,
-                ),
-                PacBioRunWellMetrics.ccs_execution_mode == "None",
-            ),
-            PacBioRunWellMetrics.well_status == "Complete",
+from lrqc.mlwh.inbox_cache import InboxCache, inbox_filter
+from lrqc.mlwh.models import InboxCacheStats, InboxResults, InboxWellQcStatus
+from lrqc.pagination import PAGE_RESPONSES, PageParams, after, page_response, paginate
+from lrqc.serialization import FastJSONRoute
+
+router = APIRouter(route_class=FastJSONRoute)
+
+inbox_cache = InboxCache()
+
+
+@router.get(
+    "/inbox", response_model=InboxResults, responses=PAGE_RESPONSES | ETAG_RESPONSES
+)
+async def get_inbox(
+    weeks: int,
+    request: Request,
+    page: PageParams = Depends(),
+    db_session: AsyncSession = Depends(get_mlwh_db),
+) -> InboxResults:
+    """Get inbox of PacBio runs
+
+    With a limit or cursor, a page of the wells is returned, ordered by well_complete,
+    run name and well label. Pages are read from the MLWH, not from the inbox cache.
+
+    The whole inbox has a weak ETag derived from the number of wells and the range of
+    their well_complete, as refreshed in the inbox cache; a request whose If-None-Match
+    header matches it gets a 304.
+    """
+
+    if page.requested:
+        return page_response(*await inbox_page(weeks, page, db_session))
+
+    window = await inbox_cache.refresh(weeks, db_session)
+    etag = weak_etag("inbox", weeks, *window.version())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return tagged_response(window.inbox(), etag)
+
+
+async def inbox_page(
+    weeks: int, page: PageParams, db_session: AsyncSession
+) -> Tuple[Dict[str, List[str]], Optional[str]]:
+    """Get a page of the inbox for the last `weeks` weeks.
+
+    Returns:
+        the well labels of each run in the page and the cursor of the next page
+    """
+
+    key_columns = (
+        PacBioRunWellMetrics.well_complete,
+        PacBioRunWellMetrics.pac_bio_run_name,
+        PacBioRunWellMetrics.well_label,
+    )
+    now = datetime.now()
+    stmt = (
+        select(*key_columns)
+        .filter(
+            inbox_filter(),
             PacBioRunWellMetrics.well_complete.between(
-                datetime.now() - timedelta(weeks=weeks), datetime.now()
+                now - timedelta(weeks=weeks), now
             ),
+            after(key_columns, page.after((datetime, str, str))),
         )
+        .order_by(*key_columns)
+        .limit(page.limit + 1)
+    )
+
+    rows, next_cursor = paginate(
+        (await db_session.execute(stmt)).all(), tuple, page.limit
     )
 
-    results = db_session.execute(stmt).scalars().all()
+    wells: Dict[str, List[str]] = {}
+    for _, run_name, well_label in rows:
+        wells.setdefault(run_name, []).append(well_label)
+
+    return wells, next_cursor
+
 
-    output = {}
-    for res in results:
-        run_name = res.pac_bio_run_name
-        well_label = res.well_label
+@router.get("/inbox/qc_status", response_model=List[InboxWellQcStatus])
+async def get_inbox_qc_status(
+    weeks: int,
+    pending_only: bool = False,
+    db_session: AsyncSession = Depends(get_mlwh_db),
+    lrqc_session: AsyncSession = Depends(get_lrqc_db),
+) -> List[InboxWellQcStatus]:
+    """Get the inbox of PacBio wells with their QC status
 
-        if run_name in output:
-            output[run_name].append(well_label)
+    Args:
+        weeks: number of weeks to look back for completed wells
+        pending_only: only return the wells which have no QC outcome yet
+        db_session: DB session to the MLWH
+        lrqc_session: DB session to the LRQC DB
+
+    Returns:
+        the wells of the inbox, ordered by run name and well label, with the current QC
+        outcome of each from the QC summary
+    """
+
+    inbox = await inbox_cache.get(weeks, db_session)
+    terms = [
+        PacBioSearch(run_name=run_name, well_label=well_label)
+        for run_name, well_labels in inbox.items()
+        for well_label in well_labels
+    ]
+    summaries = {
+        (s.run_name, s.well_label): s for s in await get_summaries(lrqc_session, terms)
+    }
+
+    wells = []
+    for term in terms:
+        summary = summaries.get((term.run_name, term.well_label))
+        if summary is None or summary.description is None:
+            well = InboxWellQcStatus.construct(
+                run_name=term.run_name,
+                well_label=term.well_label,
+                annotation_count=summary.annotation_count if summary else 0,
+            )
+        elif pending_only:
+            continue
         else:
-            output[run_name] = [well_label]
+            well = InboxWellQcStatus.construct(
+                run_name=term.run_name,
+                well_label=term.well_label,
+                qc_outcome=summary.description,
+                user_name=summary.user_name,
+                date_updated=summary.date_updated,
+                annotation_count=summary.annotation_count,
+            )
+        wells.append(well)
+
+    return wells
+
+
+@router.get("/inbox/cache", response_model=InboxCacheStats)
+async def get_inbox_cache_stats() -> InboxCacheStats:
+    """Get hit and miss counters of the inbox cache"""
 
-    return output
+    return await inbox_cache.stats()
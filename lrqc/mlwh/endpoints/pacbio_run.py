@@ -1,28 +1,220 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import select, and_
-from ml_warehouse.schema import PacBioRun
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select, and_, tuple_
+from ml_warehouse.schema import (
+    PacBioProductMetrics,
+    PacBioRun,
+    PacBioRunWellMetrics as DBPacBioRunWellMetrics,
+)
 
 
+from lrqc.cache import Cache, CacheStats
+from lrqc.chunking import chunked
+from lrqc.etag import (
+    ETAG_RESPONSES,
+    conditional,
+    etag_matches,
+    not_modified,
+    tagged_response,
+    weak_etag,
+)
+from lrqc.lrqc_outcome.endpoints.misc import SEARCH_CHUNK_SIZE
 from lrqc.mlwh.connection import get_mlwh_db
-from lrqc.mlwh.models import PacBioRunResponse, Study, Sample
+from lrqc.mlwh.models import (
+    PacBioLibraryTube,
+    PacBioRunInfo,
+    PacBioRunResponse,
+    PacBioRunWellMetrics,
+    RunWell,
+    Sample,
+    Study,
+    Well,
+)
+from lrqc.serialization import FastJSONRoute, from_orm_trusted
 
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
+# Everything read by run_response, loaded with the runs in a single joined query.
+RUN_LOADING = (
+    joinedload(PacBioRun.pac_bio_product_metrics).joinedload(
+        PacBioProductMetrics.pac_bio_run_well_metrics
+    ),
+    joinedload(PacBioRun.study),
+    joinedload(PacBioRun.sample),
+)
 
-@router.get("/run", response_model=PacBioRunResponse)
-def get_pacbio_run(
-    run_name: str, well_label: str, db_session: Session = Depends(get_mlwh_db)
+# The latest last_updated and recorded_at of the runs of a well, and last_changed of
+# its metrics.
+RunVersion = Tuple[Optional[datetime], Optional[datetime], Optional[datetime]]
+
+
+class CachedRun(NamedTuple):
+    version: RunVersion
+    response: PacBioRunResponse
+
+
+# Details of completed wells, by (run_name, well_label). Once expired, an entry is
+# kept if its version has not changed in the MLWH.
+run_cache: Cache[CachedRun] = Cache(
+    "runs", maxsize=10_000, ttl=3600, value_type=CachedRun
+)
+
+
+def cacheable(response: PacBioRunResponse) -> bool:
+    """Whether the details of a well are final enough to be cached."""
+
+    return response.metrics.well_status == "Complete"
+
+
+def merge_versions(version: Optional[RunVersion], run: PacBioRun) -> RunVersion:
+    """Fold a run, with its loaded metrics, into the version of its well, as computed
+    by run_version_query."""
+
+    last_changed = max(
+        filter(
+            None,
+            (
+                product.pac_bio_run_well_metrics.last_changed
+                for product in run.pac_bio_product_metrics
+                if product.pac_bio_run_well_metrics is not None
+            ),
+        ),
+        default=None,
+    )
+    run_version = (run.last_updated, run.recorded_at, last_changed)
+    if version is None:
+        return run_version
+
+    return tuple(
+        max(filter(None, (a, b)), default=None) for a, b in zip(version, run_version)
+    )
+
+
+def run_version_query(run_name: str, well_label: str):
+    """Select the version of a well. The metrics are joined in, as they change after
+    their run is recorded, e.g. when off-instrument CCS results arrive."""
+
+    return (
+        select(
+            func.max(PacBioRun.last_updated),
+            func.max(PacBioRun.recorded_at),
+            func.max(DBPacBioRunWellMetrics.last_changed),
+        )
+        .select_from(PacBioRun)
+        .outerjoin(PacBioRun.pac_bio_product_metrics)
+        .outerjoin(PacBioProductMetrics.pac_bio_run_well_metrics)
+        .filter(
+            PacBioRun.pac_bio_run_name == run_name, PacBioRun.well_label == well_label
+        )
+    )
+
+
+def run_response(run: PacBioRun) -> PacBioRunResponse:
+    """Build the response for a PacBioRun row."""
+
+    return PacBioRunResponse.construct(
+        run_info=from_orm_trusted(
+            PacBioRunInfo,
+            run,
+            well=Well.construct(
+                label=getattr(run, "well_label", None),
+                uuid_lims=getattr(run, "well_uuid_lims", None),
+            ),
+            pac_bio_library_tube=PacBioLibraryTube.construct(
+                id_lims=getattr(run, "pac_bio_library_tube_id_lims", None),
+                uuid=getattr(run, "pac_bio_library_tube_uuid", None),
+                name=getattr(run, "pac_bio_library_tube_name", None),
+            ),
+        ),
+        metrics=from_orm_trusted(
+            PacBioRunWellMetrics,
+            run.pac_bio_product_metrics[0].pac_bio_run_well_metrics,
+        ),
+        study=Study.construct(id=run.study.id_study_lims),
+        sample=Sample.construct(id=run.sample.id_sample_lims),
+    )
+
+
+@router.get("/run", response_model=PacBioRunResponse, responses=ETAG_RESPONSES)
+async def get_pacbio_run(
+    run_name: str,
+    well_label: str,
+    request: Request,
+    db_session: AsyncSession = Depends(get_mlwh_db),
 ) -> PacBioRunResponse:
+    """Get the details of a PacBio well, from the run cache when possible
+
+    The response has a weak ETag derived from the last_updated and recorded_at of the
+    runs of the well, and the last_changed of its metrics. A request whose
+    If-None-Match header matches it gets a 304.
+    """
+
+    key = (run_name, well_label)
+    cached = await run_cache.get(key)
 
-    stmt = select(PacBioRun).filter(
-        and_(PacBioRun.well_label == well_label, PacBioRun.pac_bio_run_name == run_name)
+    if cached is None:
+        stale = await run_cache.get_stale(key)
+        version = None
+        if stale is not None or conditional(request):
+            version = tuple(
+                (
+                    await db_session.execute(run_version_query(run_name, well_label))
+                ).one()
+            )
+
+        if stale is not None and version == stale.version:
+            await run_cache.touch(key)
+            cached = stale
+        elif version and any(version) and etag_matches(request, run_etag(key, version)):
+            return not_modified(run_etag(key, version))
+        else:
+            if stale is not None:
+                await run_cache.delete(key)
+            cached = CachedRun(
+                *await db_session.run_sync(_get_pacbio_run, run_name, well_label)
+            )
+            if cacheable(cached.response):
+                await run_cache.set(key, cached)
+
+    etag = run_etag(key, cached.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return tagged_response(cached.response, etag)
+
+
+def run_etag(key: Tuple[str, str], version: RunVersion) -> str:
+    return weak_etag("run", *key, *version)
+
+
+@router.get("/run/cache", response_model=CacheStats)
+async def get_run_cache_stats() -> CacheStats:
+    """Get hit, miss and eviction counters of the run cache"""
+
+    return await run_cache.stats()
+
+
+def _get_pacbio_run(
+    db_session: Session, run_name: str, well_label: str
+) -> Tuple[RunVersion, PacBioRunResponse]:
+
+    stmt = (
+        select(PacBioRun)
+        .filter(
+            and_(
+                PacBioRun.well_label == well_label,
+                PacBioRun.pac_bio_run_name == run_name,
+            )
+        )
+        .options(*RUN_LOADING)
     )
 
-    results: List = db_session.execute(stmt).scalars().all()
+    results: List = db_session.execute(stmt).unique().scalars().all()
 
     if len(results) == 0:
         raise HTTPException(404, detail="Not PacBio run found matching criteria.")
@@ -30,11 +222,73 @@ def get_pacbio_run(
         print("WARNING! THERE IS MORE THAN ONE RESULT! RETURING THE FIRST ONE")
 
     run: PacBioRun = results[0]
+    version = None
+    for result in results:
+        version = merge_versions(version, result)
 
-    response = PacBioRunResponse(
-        run_info=run,
-        metrics=run.pac_bio_product_metrics[0].pac_bio_run_well_metrics,
-        study=Study(id=run.study.id_study_lims),
-        sample=Sample(id=run.sample.id_sample_lims),
-    )
-    return response
+    return version, run_response(run)
+
+
+@router.post("/runs", response_model=List[PacBioRunResponse])
+async def get_pacbio_runs(
+    run_wells: List[RunWell], db_session: AsyncSession = Depends(get_mlwh_db)
+) -> List[PacBioRunResponse]:
+    """Get the details of many PacBio wells at once
+
+    Args:
+        run_wells: run names and well labels of the wells
+        db_session: DB session to the MLWH
+
+    Returns:
+        the details of the wells found in the MLWH, in the order they were requested.
+        Wells which are not found are omitted.
+    """
+
+    keys = list(dict.fromkeys((w.run_name, w.well_label) for w in run_wells))
+
+    found: Dict[Tuple[str, str], PacBioRunResponse] = {
+        key: cached.response for key, cached in (await run_cache.get_many(keys)).items()
+    }
+    missing = [key for key in keys if key not in found]
+
+    if missing:
+        fetched = await db_session.run_sync(_get_pacbio_runs, missing)
+        await run_cache.set_many(
+            {
+                key: fetched_run
+                for key, fetched_run in fetched.items()
+                if cacheable(fetched_run.response)
+            }
+        )
+        for key, fetched_run in fetched.items():
+            found[key] = fetched_run.response
+
+    return [
+        found[(w.run_name, w.well_label)]
+        for w in run_wells
+        if (w.run_name, w.well_label) in found
+    ]
+
+
+def _get_pacbio_runs(
+    db_session: Session, keys: List[Tuple[str, str]]
+) -> Dict[Tuple[str, str], CachedRun]:
+
+    # As for a single well, the first run found for a well is the one returned.
+    runs: Dict[Tuple[str, str], PacBioRun] = {}
+    versions: Dict[Tuple[str, str], RunVersion] = {}
+    for chunk in chunked(keys, SEARCH_CHUNK_SIZE):
+        stmt = (
+            select(PacBioRun)
+            .filter(tuple_(PacBioRun.pac_bio_run_name, PacBioRun.well_label).in_(chunk))
+            .options(*RUN_LOADING)
+            .order_by(*PacBioRun.__table__.primary_key.columns)
+        )
+        for run in db_session.execute(stmt).unique().scalars():
+            key = (run.pac_bio_run_name, run.well_label)
+            runs.setdefault(key, run)
+            versions[key] = merge_versions(versions.get(key), run)
+
+    return {
+        key: CachedRun(versions[key], run_response(run)) for key, run in runs.items()
+    }
@@ -0,0 +1,223 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from ml_warehouse.schema import PacBioRunWellMetrics
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from lrqc.cache import Cache, CacheStats
+from lrqc.mlwh.aggregation import (
+    Bucket,
+    bucket_start,
+    bucket_starts,
+    next_bucket,
+    summarise,
+)
+from lrqc.mlwh.connection import get_mlwh_db
+from lrqc.mlwh.models import MetricSummary
+from lrqc.mlwh.models import PacBioRunWellMetrics as PacBioRunWellMetricsModel
+from lrqc.mlwh.models import (
+    SUMMARY_METRIC_NAMES,
+    WELL_METRIC_NAMES,
+    WellMetricsColumns,
+)
+from lrqc.serialization import FastJSONRoute, coerce_column
+
+router = APIRouter(route_class=FastJSONRoute)
+
+# Summaries of the buckets which have ended, by bucket, bucket start and metric names.
+# The wells of a bucket are all complete by the time it ends, but their metrics can
+# still be corrected in the MLWH, so the summaries expire after an hour.
+summary_cache: Cache[List[MetricSummary]] = Cache(
+    "well_metric_summaries",
+    maxsize=10_000,
+    ttl=3600,
+    value_type=List[MetricSummary],
+)
+
+
+@router.get(
+    "/well_metrics",
+    response_model=WellMetricsColumns,
+    responses={400: {"description": "Bad Request. Unknown metric name."}},
+)
+async def get_well_metrics(
+    since: datetime,
+    metrics: List[str] = Query(
+        ..., description="Names of the fields of the run metrics to return"
+    ),
+    until: Optional[datetime] = None,
+    db_session: AsyncSession = Depends(get_mlwh_db),
+) -> WellMetricsColumns:
+    """Get some metrics of the PacBio wells completed in a period, by column
+
+    Only the columns of the requested metrics are read from the MLWH. The response has
+    one list per metric, plus the run name, well label and well complete lists which
+    identify the wells, all in the order of well complete.
+
+    Args:
+        since: earliest well complete date and time
+        metrics: names of the metrics, as in the metrics of a run
+        until: well complete date and time before which wells are included, none for
+            all the wells completed since `since`
+        db_session: DB session to the MLWH
+
+    Returns:
+        the metrics of the wells, by column
+    """
+
+    unknown = [name for name in metrics if name not in WELL_METRIC_NAMES]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}."
+        )
+    names = list(dict.fromkeys(metrics))
+
+    criteria = [PacBioRunWellMetrics.well_complete >= since]
+    if until is not None:
+        criteria.append(PacBioRunWellMetrics.well_complete < until)
+    stmt = (
+        select(
+            PacBioRunWellMetrics.pac_bio_run_name,
+            PacBioRunWellMetrics.well_label,
+            PacBioRunWellMetrics.well_complete,
+            *(getattr(PacBioRunWellMetrics, name) for name in names),
+        )
+        .filter(*criteria)
+        .order_by(
+            PacBioRunWellMetrics.well_complete,
+            PacBioRunWellMetrics.pac_bio_run_name,
+            PacBioRunWellMetrics.well_label,
+        )
+    )
+
+    rows = (await db_session.execute(stmt)).all()
+    columns = list(zip(*rows)) if rows else [()] * (3 + len(names))
+
+    return WellMetricsColumns.construct(
+        run_name=list(columns[0]),
+        well_label=list(columns[1]),
+        well_complete=list(columns[2]),
+        metrics={
+            name: coerce_column(PacBioRunWellMetricsModel, name, values)
+            for name, values in zip(names, columns[3:])
+        },
+    )
+
+
+@router.get(
+    "/well_metrics/summary",
+    response_model=List[MetricSummary],
+    responses={400: {"description": "Bad Request. Unknown or non-numeric metric."}},
+)
+async def get_well_metric_summaries(
+    since: date,
+    metrics: List[str] = Query(
+        ..., description="Names of the numeric fields of the run metrics to summarise"
+    ),
+    until: Optional[date] = None,
+    bucket: Bucket = "week",
+    db_session: AsyncSession = Depends(get_mlwh_db),
+) -> List[MetricSummary]:
+    """Get statistics of some metrics of the PacBio wells, by instrument name, chip type
+    and day, week or month of well complete
+
+    Buckets are whole: all the wells of the buckets which overlap the period are
+    summarised. The summaries of the buckets which have ended are cached for an hour.
+
+    Args:
+        since: first day of the period
+        metrics: names of the metrics, as in the metrics of a run
+        until: day after the period, none for a period up to now
+        bucket: the length of the buckets, weeks start on Monday
+        db_session: DB session to the MLWH
+
+    Returns:
+        the summaries of the groups with wells, ordered by bucket start, instrument name
+        and chip type
+    """
+
+    unknown = [name for name in metrics if name not in SUMMARY_METRIC_NAMES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown or non-numeric metrics: {', '.join(unknown)}.",
+        )
+    names = tuple(dict.fromkeys(metrics))
+
+    now = datetime.now()
+    end = now.date() + timedelta(days=1)
+    if until is not None:
+        end = min(until, end)
+    starts = []
+    start = bucket_start(since, bucket)
+    while start < end:
+        starts.append(start)
+        start = next_bucket(start, bucket)
+
+    summaries: Dict[date, List[MetricSummary]] = {
+        start: cached
+        for (_, start, _), cached in (
+            await summary_cache.get_many((bucket, start, names) for start in starts)
+        ).items()
+    }
+
+    missing = [start for start in starts if start not in summaries]
+    if missing:
+        fetched = await _summarise_buckets(
+            db_session, bucket, missing[0], next_bucket(missing[-1], bucket), names
+        )
+        ended = {}
+        for start in missing:
+            summaries[start] = fetched.get(start, [])
+            if datetime.combine(next_bucket(start, bucket), time()) <= now:
+                ended[(bucket, start, names)] = summaries[start]
+        await summary_cache.set_many(ended)
+
+    return [summary for start in starts for summary in summaries[start]]
+
+
+async def _summarise_buckets(
+    db_session: AsyncSession,
+    bucket: Bucket,
+    first: date,
+    end: date,
+    names: Tuple[str, ...],
+) -> Dict[date, List[MetricSummary]]:
+    """Summarise the metrics of the wells completed from `first` to before `end`.
+
+    Returns:
+        the summaries of each bucket with wells, by bucket start
+    """
+
+    stmt = select(
+        PacBioRunWellMetrics.instrument_name,
+        PacBioRunWellMetrics.chip_type,
+        PacBioRunWellMetrics.well_complete,
+        *(getattr(PacBioRunWellMetrics, name) for name in names),
+    ).filter(
+        PacBioRunWellMetrics.well_complete >= datetime.combine(first, time()),
+        PacBioRunWellMetrics.well_complete < datetime.combine(end, time()),
+    )
+
+    rows = (await db_session.execute(stmt)).all()
+    columns = list(zip(*rows)) if rows else [()] * (3 + len(names))
+
+    summaries: Dict[date, List[MetricSummary]] = {}
+    for summary in summarise(
+        columns[0],
+        columns[1],
+        bucket_starts(columns[2], bucket),
+        dict(zip(names, columns[3:])),
+    ):
+        summaries.setdefault(summary.bucket_start, []).append(summary)
+
+    return summaries
+
+
+@router.get("/well_metrics/summary/cache", response_model=CacheStats)
+async def get_well_metric_summary_cache_stats() -> CacheStats:
+    """Get the statistics of the cache of well metric summaries"""
+
+    return await summary_cache.stats()
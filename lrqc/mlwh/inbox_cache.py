@@ -0,0 +1,207 @@
+"""Incremental cache of the PacBio inbox.
+
+The inbox is the set of completed wells whose well_complete falls within the last N
+weeks. For each N, the cache keeps the wells it has seen with their well_complete, and
+the latest well_complete seen so far (the high-water mark). A refresh then only fetches
+the wells completed since the mark and drops the wells which have left the window.
+
+Wells which start qualifying for the inbox after their well_complete has passed the
+mark (e.g. when off-instrument CCS data arrives late) are picked up by a full rescan,
+which happens once a window is older than `max_age`.
+
+The windows are entries of the "inbox" cache, so that the worker processes sharing a
+cache backend share their windows.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from ml_warehouse.schema import PacBioRunWellMetrics
+from pydantic import BaseModel, Field
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from lrqc.cache import Cache
+from lrqc.mlwh.models import InboxCacheStats
+
+# Number of rows fetched from the MLWH at a time while building the inbox.
+INBOX_FETCH_SIZE = 1000
+
+
+def inbox_filter():
+    """SQL filter selecting the wells which are ready for QC."""
+
+    return and_(
+        PacBioRunWellMetrics.polymerase_num_reads.isnot(None),
+        or_(
+            and_(
+                PacBioRunWellMetrics.ccs_execution_mode.in_(
+                    ("OffInstrument", "OnInstrument")
+                ),
+                PacBioRunWellMetrics.hifi_num_reads.isnot(None),
+            ),
+            PacBioRunWellMetrics.ccs_execution_mode == "None",
+        ),
+        PacBioRunWellMetrics.well_status == "Complete",
+    )
+
+
+class InboxWindow(BaseModel):
+    """The wells of the inbox for a number of weeks, with their well_complete."""
+
+    weeks: int
+    # Wall clock time of the last full scan, comparable between the processes sharing
+    # the window.
+    created: float = Field(default_factory=time.time)
+    high_water_mark: Optional[datetime] = None
+    # The well_complete of each well, by run name and well label.
+    wells: Dict[str, Dict[str, datetime]] = {}
+
+    def add(self, run_name: str, well_label: str, well_complete: datetime):
+        self.wells.setdefault(run_name, {})[well_label] = well_complete
+        if self.high_water_mark is None or well_complete > self.high_water_mark:
+            self.high_water_mark = well_complete
+
+    def merge(self, other: "InboxWindow", start: datetime) -> "InboxWindow":
+        """Get the union of two refreshes of the window, without the wells completed
+        before `start`."""
+
+        merged = InboxWindow(weeks=self.weeks, created=max(self.created, other.created))
+        for window in (self, other):
+            for run_name, run_wells in window.wells.items():
+                for well_label, complete in run_wells.items():
+                    if complete >= start:
+                        merged.wells.setdefault(run_name, {})[well_label] = complete
+        marks = [m for m in (self.high_water_mark, other.high_water_mark) if m]
+        merged.high_water_mark = max(marks, default=None)
+
+        return merged
+
+    def inbox(self) -> Dict[str, List[str]]:
+        """Get the well labels of each run, ordered by run name and well label."""
+
+        return {
+            run_name: sorted(self.wells[run_name]) for run_name in sorted(self.wells)
+        }
+
+    def well_count(self) -> int:
+        return sum(map(len, self.wells.values()))
+
+    def version(self) -> Tuple:
+        """Get a summary of the wells which changes when a well enters or leaves."""
+
+        completes = (c for run_wells in self.wells.values() for c in run_wells.values())
+
+        return self.well_count(), min(completes, default=None), self.high_water_mark
+
+
+class InboxCache:
+    """Cache of the inbox for each requested number of weeks.
+
+    Args:
+        max_age: age after which a window is rebuilt with a full rescan
+        max_windows: maximum number of different `weeks` values kept
+    """
+
+    def __init__(
+        self, max_age: timedelta = timedelta(minutes=10), max_windows: int = 8
+    ):
+        self.max_age = max_age
+        self.max_windows = max_windows
+        self.hits = 0
+        self.misses = 0
+        self.rows_fetched = 0
+        self._windows: Cache[InboxWindow] = Cache(
+            "inbox", maxsize=max_windows, value_type=InboxWindow
+        )
+        self._lock = asyncio.Lock()
+
+    async def get(self, weeks: int, db_session: AsyncSession) -> Dict[str, List[str]]:
+        """Get the inbox for the last `weeks` weeks, refreshing it from the MLWH.
+
+        Returns:
+            the well labels of each run in the inbox, ordered by run name and well label
+        """
+
+        return (await self.refresh(weeks, db_session)).inbox()
+
+    async def refresh(self, weeks: int, db_session: AsyncSession) -> InboxWindow:
+        """Refresh the window of the last `weeks` weeks from the MLWH."""
+
+        now = datetime.now()
+        start = now - timedelta(weeks=weeks)
+
+        window = await self._windows.get(weeks)
+        if (
+            window is None
+            or time.time() - window.created > self.max_age.total_seconds()
+        ):
+            self.misses += 1
+            fetched = InboxWindow(weeks=weeks)
+            since = start
+        else:
+            self.hits += 1
+            fetched = InboxWindow(weeks=weeks, created=window.created)
+            since = max(start, window.high_water_mark or start)
+
+        # The MLWH is queried without holding the lock, only the update of the window
+        # is serialised.
+        await self._fetch(fetched, since, now, db_session)
+
+        async with self._lock:
+            # A full scan replaces an older window. The wells of an incremental refresh
+            # are merged into the window as it is now, as concurrent requests may have
+            # refreshed it meanwhile.
+            current = await self._windows.get(weeks) or window
+            if current is None or current.created < fetched.created:
+                window = fetched
+            else:
+                window = current.merge(fetched, start)
+            await self._windows.set(weeks, window)
+
+        return window
+
+    async def _fetch(
+        self, window: InboxWindow, since: datetime, until: datetime, db_session
+    ):
+        # The lower bound is inclusive, so that wells completed at the same time as the
+        # high-water mark but committed after the last refresh are not missed.
+        stmt = (
+            select(
+                PacBioRunWellMetrics.pac_bio_run_name,
+                PacBioRunWellMetrics.well_label,
+                PacBioRunWellMetrics.well_complete,
+            )
+            .filter(
+                and_(
+                    inbox_filter(),
+                    PacBioRunWellMetrics.well_complete.between(since, until),
+                )
+            )
+            .execution_options(max_row_buffer=INBOX_FETCH_SIZE)
+        )
+
+        result = await db_session.stream(stmt)
+        async for run_name, well_label, well_complete in result:
+            self.rows_fetched += 1
+            window.add(run_name, well_label, well_complete)
+
+    async def stats(self) -> InboxCacheStats:
+        """Get the hit and miss counters of the cache."""
+
+        return InboxCacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            rows_fetched=self.rows_fetched,
+            windows={
+                window.weeks: window.well_count()
+                for window in await self._windows.values()
+            },
+        )
+
+    def clear(self):
+        """Drop all the cached windows."""
+
+        self._windows.clear()
@@ -1,5 +1,5 @@
-from datetime import date
-from typing import Any, Dict, List
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -27,6 +27,24 @@ RunName = str
 WellLabel = str
 
 
+class RunWell(BaseModel):
+    run_name: str = Field(
+        default=None, title="PacBio run name", description="PacBio run name"
+    )
+    well_label: str = Field(
+        default=None, title="PacBio well label", description="PacBio well label"
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "run_name": "MY-RUN-100",
+                "well_label": "A1",
+            }
+        }
+        frozen = True
+
+
 class InboxResults(BaseModel):
 
     __root__: Dict[RunName, List[WellLabel]]
@@ -40,6 +58,65 @@ class InboxResults(BaseModel):
         }
 
 
+class InboxWellQcStatus(BaseModel):
+    run_name: str = Field(
+        default=None, title="PacBio run name", description="PacBio run name"
+    )
+    well_label: str = Field(
+        default=None, title="PacBio well label", description="PacBio well label"
+    )
+    qc_outcome: Optional[str] = Field(
+        default=None,
+        title="QC outcome",
+        description="Short description of the current QC outcome, none if QC is pending",
+    )
+    user_name: Optional[str] = Field(
+        default=None, title="User name", description="User who set the QC outcome"
+    )
+    date_updated: Optional[datetime] = Field(
+        default=None, title="Date updated", description="Last update of the QC outcome"
+    )
+    annotation_count: int = Field(
+        default=0, title="Annotation count", description="Number of annotations"
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "run_name": "MY-RUN-100",
+                "well_label": "A1",
+                "qc_outcome": "Passed",
+                "user_name": "ab123",
+                "date_updated": "2022-05-03T12:35:35.566Z",
+                "annotation_count": 1,
+            }
+        }
+
+
+class InboxCacheStats(BaseModel):
+
+    hits: int = Field(
+        default=0,
+        title="Cache hits",
+        description="Number of inbox requests answered with an incremental refresh",
+    )
+    misses: int = Field(
+        default=0,
+        title="Cache misses",
+        description="Number of inbox requests which needed a full rescan of the window",
+    )
+    rows_fetched: int = Field(
+        default=0,
+        title="Rows fetched",
+        description="Total number of well rows fetched from the MLWH by the cache",
+    )
+    windows: Dict[int, int] = Field(
+        default={},
+        title="Cached windows",
+        description="Number of cached wells for each cached number of weeks",
+    )
+
+
 class Study(BaseModel):
 
     id: str = Field(default=None, title="Study ID.")
@@ -286,3 +363,96 @@ class PacBioRunResponse(BaseModel):
     study: Study
     sample: Sample
     metrics: PacBioRunWellMetrics
+
+
+# Fields of PacBioRunWellMetrics which the well metrics endpoint can select.
+WELL_METRIC_NAMES = tuple(PacBioRunWellMetrics.__fields__)
+
+
+class WellMetricsColumns(BaseModel):
+    run_name: List[str] = Field(
+        default=[], title="PacBio run names", description="Run name of each well"
+    )
+    well_label: List[str] = Field(
+        default=[], title="PacBio well labels", description="Label of each well"
+    )
+    well_complete: List[datetime] = Field(
+        default=[], title="Well complete", description="Timestamp of each well complete"
+    )
+    metrics: Dict[str, List[Any]] = Field(
+        default={},
+        title="Metrics",
+        description="For each requested metric, its value for each well",
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "run_name": ["MY-RUN-100", "MY-RUN-100"],
+                "well_label": ["A1", "B1"],
+                "well_complete": ["2022-05-03T12:35:35", "2022-05-04T02:11:08"],
+                "metrics": {
+                    "hifi_read_bases": [25876493425, 31765043281],
+                    "local_base_rate": [2.51, 2.74],
+                },
+            }
+        }
+
+
+# Numeric fields of PacBioRunWellMetrics which can be summarised.
+SUMMARY_METRIC_NAMES = tuple(
+    name
+    for name, field in PacBioRunWellMetrics.__fields__.items()
+    if field.outer_type_ in (int, float)
+)
+
+
+class MetricStats(BaseModel):
+    count: int = Field(
+        default=0, title="Count", description="Number of wells with a value"
+    )
+    mean: float = Field(default=None, title="Mean")
+    min: float = Field(default=None, title="Minimum")
+    p10: float = Field(default=None, title="10th percentile")
+    p25: float = Field(default=None, title="First quartile")
+    median: float = Field(default=None, title="Median")
+    p75: float = Field(default=None, title="Third quartile")
+    p90: float = Field(default=None, title="90th percentile")
+    max: float = Field(default=None, title="Maximum")
+
+
+class MetricSummary(BaseModel):
+    bucket_start: date = Field(
+        default=None,
+        title="Bucket start",
+        description="First day of the day, week or month of the wells",
+    )
+    instrument_name: Optional[str] = Field(default=None, title="Instrument name")
+    chip_type: Optional[str] = Field(default=None, title="Chip type")
+    wells: int = Field(default=0, title="Wells", description="Number of wells")
+    metrics: Dict[str, MetricStats] = Field(
+        default={}, title="Metrics", description="Statistics of each requested metric"
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "bucket_start": "2022-05-02",
+                "instrument_name": "64222E",
+                "chip_type": "8mChip",
+                "wells": 12,
+                "metrics": {
+                    "hifi_read_bases": {
+                        "count": 12,
+                        "mean": 25876493425.5,
+                        "min": 10254788127.0,
+                        "p10": 15788120334.2,
+                        "p25": 21876493425.0,
+                        "median": 26765043281.5,
+                        "p75": 30110255410.25,
+                        "p90": 33870112040.9,
+                        "max": 38270455201.0,
+                    }
+                },
+            }
+        }
@@ -2,7 +2,9 @@ from fastapi import APIRouter
 
 from lrqc.mlwh.endpoints.pacbio_run import router as pacbio_run_router
 from lrqc.mlwh.endpoints.inbox import router as inbox_router
+from lrqc.mlwh.endpoints.well_metrics import router as well_metrics_router
 
 router = APIRouter()
 router.include_router(pacbio_run_router, prefix="/pacbio")
 router.include_router(inbox_router, prefix="/pacbio")
+router.include_router(well_metrics_router, prefix="/pacbio")
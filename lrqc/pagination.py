@@ -0,0 +1,154 @@
+"""Keyset pagination.
+
+A page is the first `limit` rows, in the order of a unique key, whose key is after the
+key of the last row of the previous page. The key of that row is handed to the client
+as an opaque cursor, in the X-Next-Cursor header, so that fetching a deep page costs
+the same as fetching the first one.
+"""
+
+import base64
+import binascii
+import heapq
+import json
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query
+from sqlalchemy import and_, or_, true
+
+from lrqc.serialization import FastJSONResponse, dumps
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+PAGE_RESPONSES = {
+    200: {
+        "headers": {
+            NEXT_CURSOR_HEADER: {
+                "description": "Cursor of the next page, absent on the last page",
+                "schema": {"type": "string"},
+            }
+        }
+    },
+    400: {"description": "Bad Request. Invalid cursor."},
+}
+
+Key = Tuple[Any, ...]
+
+
+class PageParams:
+    """Query parameters of a paginated endpoint.
+
+    Without either parameter, the endpoint returns all its results at once.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(
+            None,
+            ge=1,
+            le=MAX_PAGE_SIZE,
+            description="Maximum number of results in the page, "
+            f"{DEFAULT_PAGE_SIZE} if only a cursor is given",
+        ),
+        cursor: Optional[str] = Query(
+            None,
+            description=f"The {NEXT_CURSOR_HEADER} header of the previous page, "
+            "none for the first page",
+        ),
+    ):
+        self.limit = limit if limit is not None else DEFAULT_PAGE_SIZE
+        self.cursor = cursor
+        self.requested = limit is not None or cursor is not None
+
+    def after(self, types: Sequence[type]) -> Optional[Key]:
+        """The key of the last result of the previous page, None for the first page."""
+
+        return None if self.cursor is None else decode_cursor(self.cursor, types)
+
+
+def encode_cursor(key: Key) -> str:
+    return base64.urlsafe_b64encode(dumps(list(key))).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Key:
+    """Decode a cursor made by encode_cursor, for a key of the given types.
+
+    Raises:
+        HTTPException: the cursor is not valid for the key
+    """
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        key = []
+        for value, type_ in zip(values, types):
+            if type_ in (date, datetime):
+                value = type_.fromisoformat(value)
+            elif not isinstance(value, type_):
+                raise ValueError(cursor)
+            key.append(value)
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    return tuple(key)
+
+
+def after(columns: Sequence, key: Optional[Key]):
+    """SQL filter selecting the rows whose columns sort after a key, if any.
+
+    The row-value comparison is spelt out, (a > x) OR (a = x AND b > y) ..., so that
+    all the databases can use an index on the columns.
+    """
+
+    if key is None:
+        return true()
+
+    return or_(
+        *(
+            and_(*(c == v for c, v in zip(columns[:n], key)), columns[n] > key[n])
+            for n in range(len(columns))
+        )
+    )
+
+
+def paginate(
+    rows: Iterable[Any], key: Callable[[Any], Key], limit: int
+) -> Tuple[List[Any], Optional[str]]:
+    """Take a page from rows sorted by key, e.g. the result of a query limited to
+    `limit` + 1 rows.
+
+    Returns:
+        the rows of the page and the cursor of the next page, None if it is the last
+    """
+
+    rows = list(islice(rows, limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+
+    return rows[:limit], encode_cursor(key(rows[limit - 1]))
+
+
+def paginate_merged(
+    results: Iterable[Iterable[Any]], key: Callable[[Any], Key], limit: int
+) -> Tuple[List[Any], Optional[str]]:
+    """Take a page from several results sorted by key, e.g. the results of a query run
+    for each chunk of a long list of search terms, each limited to `limit` + 1 rows.
+
+    The results are merged by comparing their keys in Python, so the key columns must
+    sort in the database as they do in Python, as ASCII strings and numbers do.
+
+    Returns:
+        the rows of the page and the cursor of the next page, None if it is the last
+    """
+
+    return paginate(heapq.merge(*results, key=key), key, limit)
+
+
+def page_response(content: Any, next_cursor: Optional[str]) -> FastJSONResponse:
+    headers = {} if next_cursor is None else {NEXT_CURSOR_HEADER: next_cursor}
+
+    return FastJSONResponse(content, headers=headers)
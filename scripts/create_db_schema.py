@@ -1,15 +1,25 @@
 #!/usr/bin/env python3
+"""Create the LRQC DB, or upgrade an existing one to the latest schema version.
+
+Usage: create_db_schema.py DB_URL
+"""
 
 import sys
-from sqlalchemy_utils import create_database
+from sqlalchemy_utils import create_database, database_exists
 from sqlalchemy import create_engine
 
-from lrqc.lrqc_outcome.db.db_schema import Base
+from lrqc.lrqc_outcome.db.migrations import LATEST_VERSION, upgrade
 
 url = sys.argv[1]
 
 engine = create_engine(url)
 
-create_database(engine.url)
+if not database_exists(engine.url):
+    create_database(engine.url)
+
+applied = upgrade(engine)
 
-Base.metadata.create_all(engine)
+if applied:
+    print(f"Applied schema versions {applied}, now at version {LATEST_VERSION}")
+else:
+    print(f"Schema already at version {LATEST_VERSION}")
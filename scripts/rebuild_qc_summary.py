@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""Rebuild the qc_summary table of the LRQC DB from the QC outcome and annotation tables.
+
+Usage: rebuild_qc_summary.py DB_URL
+
+When LRQC_CACHE_URL is set, the QC summaries cached by the application in that shared
+cache are dropped.
+"""
+
+import sys
+from sqlalchemy import create_engine
+
+from lrqc.cache import configure_caches
+from lrqc.config import Settings
+from lrqc.lrqc_outcome.db.summary import rebuild_summaries
+from lrqc.lrqc_outcome.endpoints.summary import qc_summary_cache
+
+url = sys.argv[1]
+
+engine = create_engine(url, future=True)
+
+with engine.begin() as connection:
+    rows = rebuild_summaries(connection)
+
+settings = Settings()
+if settings.cache_url:
+    configure_caches(settings.cache_url)
+    qc_summary_cache.clear()
+
+print(f"Rebuilt qc_summary with {rows if rows is not None else 'all'} entities")
@@ -0,0 +1,146 @@
+import asyncio
+import inspect
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from lrqc.cache import clear_caches
+from lrqc.database import to_async_url
+from lrqc.lrqc_outcome.db.db_schema import (
+    Annotation,
+    Base,
+    Entity,
+    PacbioEnt,
+    QcOutcome,
+    QcOutcomeDict,
+)
+from lrqc.lrqc_outcome.models import PacBioSearch
+from lrqc.pagination import PageParams
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    """Start each test with empty caches."""
+
+    clear_caches()
+
+
+@pytest.fixture
+def lrqc_engine(tmp_path):
+    """An LRQC database with the full schema."""
+
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'lrqc.db'}", future=True)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def lrqc_session(lrqc_engine):
+    """A session to the LRQC database."""
+
+    session = sessionmaker(lrqc_engine, expire_on_commit=False, future=True)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def lrqc_async_engine(lrqc_engine):
+    """An asyncio engine to the LRQC database."""
+
+    # Every call runs in its own event loop, so connections cannot be pooled.
+    return create_async_engine(to_async_url(str(lrqc_engine.url)), poolclass=NullPool)
+
+
+@pytest.fixture
+def call_lrqc(lrqc_async_engine):
+    """Call an LRQC endpoint with a new session to the LRQC database."""
+
+    def call(endpoint, *args, **kwargs):
+        if "request" in inspect.signature(endpoint).parameters:
+            kwargs.setdefault("request", Request({"type": "http", "headers": []}))
+        if "page" in inspect.signature(endpoint).parameters:
+            kwargs.setdefault("page", PageParams(limit=None, cursor=None))
+
+        async def run():
+            async with AsyncSession(
+                lrqc_async_engine, expire_on_commit=False
+            ) as session:
+                return await endpoint(*args, db_session=session, **kwargs)
+
+        return asyncio.run(run())
+
+    return call
+
+
+@pytest.fixture
+def lrqc_client(lrqc_async_engine):
+    """A test client for the LRQC router, using the LRQC database."""
+
+    from lrqc.lrqc_outcome.db.connection import get_lrqc_db
+    from lrqc.lrqc_outcome.router import router
+
+    async def get_test_db():
+        async with AsyncSession(lrqc_async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router, prefix="/qc")
+    app.dependency_overrides[get_lrqc_db] = get_test_db
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def mlwh_engine(tmp_path):
+    """An MLWH database with forty synthetic wells, see benchmarks.fixtures."""
+
+    pytest.importorskip("ml_warehouse")
+    from benchmarks.fixtures import create_mlwh
+
+    engine = create_mlwh(f"sqlite+pysqlite:///{tmp_path / 'mlwh.db'}", 40)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def app_client(mlwh_engine, lrqc_engine):
+    """A test client for the whole application, using the MLWH and LRQC databases."""
+
+    from lrqc.config import Settings
+    from lrqc.main import create_app
+
+    settings = Settings(
+        mlwh_db_url=str(mlwh_engine.url), lrqc_db_url=str(lrqc_engine.url)
+    )
+    with TestClient(create_app(settings)) as client:
+        yield client
+
+
+@pytest.fixture
+def outcomes(lrqc_session):
+    """Forty wells, each with a QC outcome and two annotations."""
+
+    passed = QcOutcomeDict(description="Passed", long_description="Passed QC")
+    terms = []
+    for i in range(40):
+        entity = Entity(type_="cell", platform_name="pacbio")
+        entity.qc_outcome = QcOutcome(qc_outcome_dict=passed, user_name="ab123")
+        entity.annotations = [
+            Annotation(annotation=f"note {i}.{n}", user_name="ab123") for n in range(2)
+        ]
+        pacbio_ent = PacbioEnt(run_name="RUN-1", cell_label=f"W{i}", entity=entity)
+        lrqc_session.add(pacbio_ent)
+        terms.append(PacBioSearch(run_name="RUN-1", well_label=f"W{i}"))
+    lrqc_session.commit()
+    lrqc_session.expunge_all()
+
+    return terms
@@ -0,0 +1,68 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from lrqc.mlwh.aggregation import bucket_start, bucket_starts, next_bucket, summarise
+
+
+@pytest.mark.parametrize(
+    "bucket,start,following",
+    [
+        ("day", date(2022, 5, 4), date(2022, 5, 5)),
+        ("week", date(2022, 5, 2), date(2022, 5, 9)),
+        ("month", date(2022, 5, 1), date(2022, 6, 1)),
+    ],
+)
+def test_buckets(bucket, start, following):
+    times = [datetime(2022, 5, 4, 13, 5), datetime(2022, 5, 4, 23, 59)]
+
+    assert bucket_start(times[0], bucket) == start
+    assert next_bucket(start, bucket) == following
+    assert bucket_starts(times, bucket).tolist() == [start, start]
+
+
+def test_summarise():
+    times = [datetime(2022, 5, day, 12) for day in (2, 3, 4, 9, 3)]
+    instruments = ["64222E", "64222E", "64222E", "64222E", "84047"]
+
+    summaries = summarise(
+        instruments,
+        ["8mChip"] * 5,
+        bucket_starts(times, "week"),
+        {"hifi_read_bases": [10, 20, None, 40, 50], "p1_num": [None] * 5},
+    )
+
+    assert [(s.bucket_start, s.instrument_name, s.wells) for s in summaries] == [
+        (date(2022, 5, 2), "64222E", 3),
+        (date(2022, 5, 2), "84047", 1),
+        (date(2022, 5, 9), "64222E", 1),
+    ]
+    stats = summaries[0].metrics["hifi_read_bases"]
+    assert (stats.count, stats.mean, stats.min, stats.median, stats.max) == (
+        2,
+        15.0,
+        10.0,
+        15.0,
+        20.0,
+    )
+    assert summaries[0].metrics["p1_num"].count == 0
+    assert summarise([], [], np.array([], dtype="datetime64[D]"), {"p1_num": []}) == []
+
+
+def test_summarise_missing_keys():
+    times = [datetime(2022, 5, 2, 12)] * 4
+
+    summaries = summarise(
+        [None, "84047", None, "64222E"],
+        ["8mChip", None, "8mChip", "8mChip"],
+        bucket_starts(times, "day"),
+        {"hifi_read_bases": [10, 20, 30, 40]},
+    )
+
+    assert [(s.instrument_name, s.chip_type, s.wells) for s in summaries] == [
+        (None, "8mChip", 2),
+        ("64222E", "8mChip", 1),
+        ("84047", None, 1),
+    ]
+    assert summaries[0].metrics["hifi_read_bases"].mean == 20.0
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("ml_warehouse")
+
+from benchmarks import endpoints, serialization, startup  # noqa: E402
+from benchmarks.fixtures import SCALES  # noqa: E402
+
+
+def test_endpoint_benchmarks(tmp_path, monkeypatch):
+    monkeypatch.setitem(SCALES, "tiny", 40)
+
+    report = endpoints.run_benchmarks("tiny", tmp_path, repeat=2, batch=8)
+
+    assert report["wells"] == 40
+    assert set(report["results"]) == set(endpoints.cases(40, 8))
+    for name, result in report["results"].items():
+        assert result["errors"] == 0, name
+        assert result["wall_ms"]["median"] > 0
+
+
+def test_serialization_benchmarks():
+    report = serialization.run_benchmarks(records=20, repeat=1)
+
+    for name, result in report["results"].items():
+        assert result["fast_cpu_ms_per_1000"] >= 0, name
+
+
+def test_startup_benchmarks(tmp_path, monkeypatch):
+    monkeypatch.setitem(SCALES, "tiny", 40)
+
+    report = startup.run_benchmarks("tiny", tmp_path, repeat=1, importtime=3)
+
+    assert set(report["cold_start"]) == {
+        "process_ms",
+        "import_ms",
+        "create_app_ms",
+        "first_requests_ms",
+    }
+    assert len(report["slowest_imports"]) == 3
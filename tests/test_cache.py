@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+import pytest
+
+from lrqc.cache import Cache, CacheStats, LRUCache, SQLiteCache, configure_caches
+
+
+class Entry(NamedTuple):
+    version: Tuple[Optional[datetime], Optional[datetime]]
+    stats: List[CacheStats]
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats.size, stats.hits, stats.misses, stats.evictions) == (2, 3, 1, 1)
+
+
+def test_ttl_expiry_and_revalidation(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("lrqc.cache.time.monotonic", lambda: now[0])
+
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    now[0] += 61
+
+    assert cache.get("a") is None
+    assert cache.get_stale("a") == 1
+
+    cache.touch("a")
+    assert cache.get("a") == 1
+    assert cache.stats().revalidations == 1
+
+
+def test_sqlite_cache_is_shared(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.db")
+    one, other = SQLiteCache(path, "runs", 2, ttl=60), SQLiteCache(path, "runs", 2)
+
+    one.set_many({("RUN-1", "A1"): {"a": 1}, ("RUN-1", "B1"): {"b": 2}})
+    assert other.get_many([("RUN-1", "A1"), ("RUN-1", "C1")]) == {
+        ("RUN-1", "A1"): {"a": 1}
+    }
+    assert SQLiteCache(path, "inbox", 2).get(("RUN-1", "A1")) is None
+
+    other.delete(("RUN-1", "A1"))
+    assert one.get(("RUN-1", "A1")) is None
+
+    now = time.time()
+    monkeypatch.setattr("lrqc.cache.time.time", lambda: now + 61)
+    assert one.get(("RUN-1", "B1")) is None
+    assert one.get_stale(("RUN-1", "B1")) == {"b": 2}
+    one.touch(("RUN-1", "B1"))
+    assert one.get(("RUN-1", "B1")) == {"b": 2}
+
+
+def test_sqlite_cache_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteCache, "EVICTION_INTERVAL", 1)
+    now = [1000.0]
+    monkeypatch.setattr("lrqc.cache.time.time", lambda: now[0])
+
+    cache = SQLiteCache(str(tmp_path / "cache.db"), "evicted", 2)
+    for value in range(3):
+        cache.set(value, value)
+        now[0] += 1
+
+    assert sorted(cache.values()) == [1, 2]
+    assert cache.stats().evictions == 1
+
+
+def test_sqlite_cache_values_are_json(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, "entries", 2, value_type=Entry)
+    entry = Entry((datetime(2022, 5, 4, 13, 5, 1, 25), None), [CacheStats(hits=3)])
+
+    cache.set("a", entry)
+    assert cache.get("a") == entry
+    assert isinstance(cache.get("a").stats[0], CacheStats)
+
+    # Entries which are not valid values, e.g. of an older model, are misses.
+    SQLiteCache(path, "entries", 2).set("b", {"version": "none"})
+    assert cache.get("b") is None
+    assert cache.stats().misses == 1
+
+
+def test_cache_runs_blocking_backend_in_thread(tmp_path):
+    threads = []
+    cache = Cache("threads", maxsize=10)
+
+    async def run():
+        get = cache.backend.get
+
+        def recording_get(key):
+            threads.append(threading.get_ident())
+            return get(key)
+
+        cache.backend.get = recording_get
+        await cache.set("a", 1)
+        return await cache.get("a")
+
+    assert asyncio.run(run()) == 1
+    try:
+        configure_caches(f"sqlite:///{tmp_path / 'cache.db'}")
+        assert asyncio.run(run()) == 1
+    finally:
+        configure_caches(None)
+
+    assert threads[0] == threading.get_ident()
+    assert threads[1] != threading.get_ident()
+
+
+@pytest.fixture(params=["lru", "sqlite"])
+def backend(request, tmp_path, monkeypatch):
+    """An empty cache backend of at most two entries."""
+
+    monkeypatch.setattr(SQLiteCache, "EVICTION_INTERVAL", 1)
+    if request.param == "lru":
+        return LRUCache(maxsize=2)
+    return SQLiteCache(str(tmp_path / "cache.db"), "invalidated", 2)
+
+
+def test_set_after_invalidation(backend):
+    backend.set("a", 1)
+    generation = backend.generation()
+    backend.delete_many(["a"])
+
+    # A value read from the source before the invalidation is not stored after it.
+    backend.set_many({"a": 1, "b": 2}, generation)
+    assert backend.get("a") is None
+    assert backend.get("b") == 2
+
+    backend.set_many({"a": 3}, backend.generation())
+    assert backend.get("a") == 3
+
+
+def test_forgotten_invalidations(backend):
+    generation = backend.generation()
+    backend.delete_many(["a"])
+    backend.delete_many(["b", "c"])
+
+    # The invalidation of a is no longer recorded, so it is assumed to be recent.
+    backend.set_many({"a": 1, "d": 4}, generation)
+    assert backend.get_many(["a", "d"]) == {}
+
+    generation = backend.generation()
+    backend.clear()
+    backend.set_many({"d": 4}, generation)
+    assert backend.get("d") is None
+
+
+def test_configure_caches(tmp_path):
+    cache = Cache("configured", maxsize=10)
+    assert isinstance(cache.backend, LRUCache)
+
+    try:
+        configure_caches(f"sqlite:///{tmp_path / 'cache.db'}")
+        assert isinstance(cache.backend, SQLiteCache)
+        assert isinstance(Cache("created later", maxsize=10).backend, SQLiteCache)
+    finally:
+        configure_caches(None)
+    assert isinstance(cache.backend, LRUCache)
+
+    with pytest.raises(ValueError):
+        configure_caches("redis://localhost")
@@ -0,0 +1,34 @@
+from lrqc.database import EngineSettings, create_engine, pool_stats, to_async_url
+from lrqc.metrics import render_metrics
+
+
+class ExampleSettings(EngineSettings):
+    class Config:
+        env_prefix = "EXAMPLE_"
+
+
+def test_to_async_url():
+    assert str(to_async_url("mysql+pymysql://u:p@host/mlwh")) == (
+        "mysql+aiomysql://u:p@host/mlwh"
+    )
+    assert str(to_async_url("sqlite:///test.db")) == "sqlite+aiosqlite:///test.db"
+    assert str(to_async_url("sqlite+aiosqlite://")) == "sqlite+aiosqlite://"
+
+
+def test_engine_settings_from_env(monkeypatch):
+    monkeypatch.setenv("EXAMPLE_POOL_SIZE", "20")
+    monkeypatch.setenv("EXAMPLE_ECHO", "true")
+    settings = ExampleSettings()
+
+    assert settings.pool_size == 20
+    assert settings.echo
+    assert not EngineSettings().echo
+
+
+def test_pool_metrics():
+    create_engine("example", "sqlite://", ExampleSettings())
+
+    try:
+        assert 'lrqc_db_pool_checkouts_total{engine="example"} 0' in render_metrics()
+    finally:
+        del pool_stats["example"]
@@ -0,0 +1,53 @@
+from lrqc.lrqc_outcome.db.db_schema import Entity, PacbioEnt
+from lrqc.lrqc_outcome.endpoints import misc
+from lrqc.lrqc_outcome.models import PacBioSearch
+
+
+def add_pacbio_entity(session, run_name, well_label):
+    pacbio_ent = PacbioEnt(run_name=run_name, cell_label=well_label)
+    pacbio_ent.entity = Entity(type_="cell", platform_name="pacbio")
+    session.add(pacbio_ent)
+    return pacbio_ent
+
+
+def test_get_entities_pacbio_keeps_order(lrqc_session, monkeypatch):
+    monkeypatch.setattr(misc, "SEARCH_CHUNK_SIZE", 2)
+    for well in ("A1", "B1", "C1"):
+        add_pacbio_entity(lrqc_session, "RUN-1", well)
+    add_pacbio_entity(lrqc_session, "RUN-2", "A1")
+    lrqc_session.commit()
+
+    terms = [
+        PacBioSearch(run_name="RUN-2", well_label="A1"),
+        PacBioSearch(run_name="RUN-1", well_label="C1"),
+        PacBioSearch(run_name="RUN-9", well_label="A1"),
+        PacBioSearch(run_name="RUN-1", well_label="A1"),
+        PacBioSearch(run_name="RUN-2", well_label="A1"),
+    ]
+    results = misc.get_entities_pacbio(terms, lrqc_session)
+
+    assert [term for term, _ in results] == [terms[0], terms[1], terms[3], terms[4]]
+    for term, entity in results:
+        pacbio_ent = entity.pacbio_entities[0]
+        assert (pacbio_ent.run_name, pacbio_ent.cell_label) == (
+            term.run_name,
+            term.well_label,
+        )
+
+
+def test_get_or_create_many(lrqc_session):
+    existing = add_pacbio_entity(lrqc_session, "RUN-1", "A1")
+    lrqc_session.commit()
+
+    terms = [
+        PacBioSearch(run_name="RUN-1", well_label="B1"),
+        PacBioSearch(run_name="RUN-1", well_label="A1"),
+        PacBioSearch(run_name="RUN-1", well_label="B1"),
+    ]
+    entities = misc.get_or_create_many(terms, lrqc_session)
+
+    assert entities[1] is existing.entity
+    assert entities[0] is entities[2]
+    assert entities[0].id_entity is not None
+    assert lrqc_session.query(PacbioEnt).count() == 2
+    assert lrqc_session.query(Entity).count() == 2
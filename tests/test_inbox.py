@@ -0,0 +1,212 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("ml_warehouse")
+
+from ml_warehouse.schema import PacBioRunWellMetrics  # noqa: E402
+from sqlalchemy import select, update  # noqa: E402
+
+from lrqc.mlwh.endpoints.inbox import inbox_cache  # noqa: E402
+from lrqc.mlwh.inbox_cache import inbox_filter  # noqa: E402
+from lrqc.pagination import NEXT_CURSOR_HEADER  # noqa: E402
+
+
+def expected_inbox(mlwh_engine, weeks):
+    """Get the inbox straight from the MLWH."""
+
+    now = datetime.now()
+    stmt = select(
+        PacBioRunWellMetrics.pac_bio_run_name, PacBioRunWellMetrics.well_label
+    ).filter(
+        inbox_filter(),
+        PacBioRunWellMetrics.well_complete.between(now - timedelta(weeks=weeks), now),
+    )
+    inbox = {}
+    with mlwh_engine.connect() as connection:
+        for run_name, well_label in sorted(connection.execute(stmt)):
+            inbox.setdefault(run_name, []).append(well_label)
+
+    return inbox
+
+
+def inbox_wells(client, weeks):
+    """Get the run name and well label of the wells in the inbox."""
+
+    response = client.get("/mlwh/pacbio/inbox", params={"weeks": weeks})
+    assert response.status_code == 200
+    return [
+        (run_name, w) for run_name, labels in response.json().items() for w in labels
+    ]
+
+
+def set_well(mlwh_engine, key, **values):
+    """Update the metrics of a well in the MLWH."""
+
+    with mlwh_engine.begin() as connection:
+        connection.execute(
+            update(PacBioRunWellMetrics)
+            .filter(
+                PacBioRunWellMetrics.pac_bio_run_name == key[0],
+                PacBioRunWellMetrics.well_label == key[1],
+            )
+            .values(**values)
+        )
+
+
+def test_inbox_filter(app_client, mlwh_engine):
+    weeks = 12
+    wells = inbox_wells(app_client, weeks)
+
+    # The inbox has the complete wells with reads, and HiFi reads unless CCS is off.
+    set_well(mlwh_engine, wells[0], well_status="Aborted")
+    set_well(
+        mlwh_engine, wells[1], ccs_execution_mode="OffInstrument", hifi_num_reads=None
+    )
+    set_well(mlwh_engine, wells[2], ccs_execution_mode="None", hifi_num_reads=None)
+    set_well(mlwh_engine, wells[3], polymerase_num_reads=None)
+    inbox_cache.clear()
+
+    inbox = inbox_wells(app_client, weeks)
+    assert [key in inbox for key in wells[:4]] == [False, False, True, False]
+
+
+def test_inbox_pages(app_client, mlwh_engine):
+    weeks = 12
+    inbox = inbox_wells(app_client, weeks)
+
+    wells, cursor = [], None
+    while True:
+        params = {"weeks": weeks, "limit": 3} | ({"cursor": cursor} if cursor else {})
+        response = app_client.get("/mlwh/pacbio/inbox", params=params)
+        assert response.status_code == 200
+        page = [
+            (run_name, w)
+            for run_name, labels in response.json().items()
+            for w in labels
+        ]
+        assert 0 < len(page) <= 3
+        wells.extend(page)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    assert sorted(wells) == sorted(inbox)
+
+    response = app_client.get(
+        "/mlwh/pacbio/inbox", params={"weeks": weeks, "cursor": "not a cursor"}
+    )
+    assert response.status_code == 400
+
+
+def test_inbox_qc_status(app_client, mlwh_engine):
+    weeks = 12
+    wells = sorted(inbox_wells(app_client, weeks))
+    (run_name, well_label), pending = wells[0], wells[1:]
+
+    def set_outcome(description):
+        item = {
+            "pacbio_entity": {"run_name": run_name, "well_label": well_label},
+            "qc_outcome": {"user_name": "ab123", "description": description},
+            "annotation": {"annotation": description, "user_name": "ab123"},
+        }
+        response = app_client.post("/qc/qc_outcome/create_bulk", json=[item])
+        assert response.status_code == 200
+
+    def qc_status(**params):
+        response = app_client.get(
+            "/mlwh/pacbio/inbox/qc_status", params={"weeks": weeks} | params
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    set_outcome("Passed")
+    statuses = qc_status()
+    assert [(s["run_name"], s["well_label"]) for s in statuses] == wells
+    assert (statuses[0]["qc_outcome"], statuses[0]["user_name"]) == ("Passed", "ab123")
+    assert statuses[0]["annotation_count"] == 1
+    assert {s["qc_outcome"] for s in statuses[1:]} == {None}
+
+    pending_statuses = qc_status(pending_only=True)
+    assert [(s["run_name"], s["well_label"]) for s in pending_statuses] == pending
+
+    set_outcome("Failed")
+    statuses = qc_status()
+    assert statuses[0]["qc_outcome"] == "Failed"
+    assert statuses[0]["annotation_count"] == 2
+
+
+def test_inbox_refresh(app_client, mlwh_engine):
+    weeks = 12
+    inbox = expected_inbox(mlwh_engine, weeks)
+    assert inbox
+
+    stats = asyncio.run(inbox_cache.stats())
+    assert app_client.get("/mlwh/pacbio/inbox", params={"weeks": weeks}).json() == inbox
+    assert inbox_cache.misses == stats.misses + 1
+    assert inbox_cache.rows_fetched - stats.rows_fetched == sum(
+        map(len, inbox.values())
+    )
+
+    # A refresh only fetches the wells completed since the high-water mark.
+    stats = asyncio.run(inbox_cache.stats())
+    assert app_client.get("/mlwh/pacbio/inbox", params={"weeks": weeks}).json() == inbox
+    assert inbox_cache.hits == stats.hits + 1
+    assert inbox_cache.rows_fetched - stats.rows_fetched <= 1
+
+    # Complete an older well, which then enters the inbox.
+    with mlwh_engine.begin() as connection:
+        run_name, well_label = connection.execute(
+            select(
+                PacBioRunWellMetrics.pac_bio_run_name, PacBioRunWellMetrics.well_label
+            )
+            .filter(
+                inbox_filter(),
+                PacBioRunWellMetrics.well_complete
+                < datetime.now() - timedelta(weeks=weeks),
+            )
+            .limit(1)
+        ).one()
+        connection.execute(
+            update(PacBioRunWellMetrics)
+            .filter(
+                PacBioRunWellMetrics.pac_bio_run_name == run_name,
+                PacBioRunWellMetrics.well_label == well_label,
+            )
+            .values(well_complete=datetime.now() - timedelta(seconds=1))
+        )
+
+    stats = asyncio.run(inbox_cache.stats())
+    refreshed = app_client.get("/mlwh/pacbio/inbox", params={"weeks": weeks}).json()
+    assert refreshed == expected_inbox(mlwh_engine, weeks)
+    assert well_label in refreshed[run_name]
+    assert inbox_cache.hits == stats.hits + 1
+    assert inbox_cache.rows_fetched - stats.rows_fetched <= 2
+
+
+def test_inbox_etag(app_client, mlwh_engine):
+    def get_inbox(**headers):
+        return app_client.get(
+            "/mlwh/pacbio/inbox", params={"weeks": 12}, headers=headers
+        )
+
+    response = get_inbox()
+    etag = response.headers["ETag"]
+
+    not_modified = get_inbox(**{"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+    with mlwh_engine.begin() as connection:
+        connection.execute(
+            update(PacBioRunWellMetrics)
+            .filter(PacBioRunWellMetrics.well_complete < datetime.now())
+            .values(well_complete=datetime.now() - timedelta(seconds=1))
+            .execution_options(synchronize_session=False)
+        )
+
+    response = get_inbox(**{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json() == expected_inbox(mlwh_engine, 12)
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import text
+
+from lrqc.config import TEST_LRQC_DB_URL, Settings
+from lrqc.database import Database, EngineSettings, pool_stats
+
+
+def test_import_without_database_urls():
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("DB_URL", "LRQC_DB_URL", "LRQC_MODE")
+    }
+    check = (
+        "import sys, lrqc.main; from lrqc.database import pool_stats; "
+        "assert not pool_stats; assert 'ml_warehouse' not in sys.modules"
+    )
+
+    subprocess.run([sys.executable, "-c", check], env=env, check=True)
+
+
+def test_lrqc_url():
+    assert Settings(lrqc_db_url="mysql://lrqc", lrqc_mode="1").lrqc_url() == (
+        "mysql://lrqc"
+    )
+    assert Settings(lrqc_db_url=None, lrqc_mode="1").lrqc_url() == TEST_LRQC_DB_URL
+    assert Settings(lrqc_db_url=None, lrqc_mode=None).lrqc_url() is None
+
+
+def test_database_is_lazy(tmp_path):
+    database = Database("lazy", f"sqlite:///{tmp_path / 'lazy.db'}", EngineSettings())
+    assert "lazy" not in pool_stats
+
+    async def query():
+        async with database.session():
+            pass
+        checkouts = pool_stats["lazy"].checkouts
+        async with database.session() as session:
+            result = (await session.execute(text("SELECT 1"))).scalar()
+        await database.dispose()
+        return checkouts, result
+
+    try:
+        # A session checks out a connection only when it runs a statement.
+        assert asyncio.run(query()) == (0, 1)
+        assert pool_stats["lazy"].checkouts == 1
+        assert pool_stats["lazy"].checkout_wait > 0
+    finally:
+        del pool_stats["lazy"]
+
+    with pytest.raises(RuntimeError, match="No URL"):
+        Database("none", None, EngineSettings()).engine
+
+
+def test_create_app_without_database_urls():
+    pytest.importorskip("ml_warehouse")
+
+    from lrqc.main import create_app
+
+    app = create_app(Settings(mlwh_db_url=None, lrqc_db_url=None, lrqc_mode=None))
+
+    assert "/qc/qc_outcome/search" in app.openapi()["paths"]
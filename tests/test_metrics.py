@@ -0,0 +1,99 @@
+import asyncio
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from lrqc import main
+from lrqc.database import Database, EngineSettings, create_engine, pool_stats
+from lrqc.instrumentation import RequestTimings, request_timings
+from lrqc.metrics import Histogram, format_histogram
+
+
+def test_server_timing():
+    timings = RequestTimings()
+    timings.record("lrqc", 0.002)
+    timings.record("lrqc", 0.003)
+
+    assert timings.server_timing(0.01) == (
+        'lrqc-sql;desc="lrqc SQL (2 statements)";dur=5.000, total;dur=10.000'
+    )
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1, float("inf")))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    lines = format_histogram("latency", "Latency.", [({"route": "/a"}, histogram)])
+
+    assert lines[2:] == [
+        'latency_bucket{route="/a",le="0.1"} 2',
+        'latency_bucket{route="/a",le="1"} 3',
+        'latency_bucket{route="/a",le="+Inf"} 4',
+        'latency_sum{route="/a"} 3.65',
+        'latency_count{route="/a"} 4',
+    ]
+
+
+def test_failed_statement_timing():
+    engine = create_engine("failing", "sqlite://", EngineSettings())
+
+    async def run():
+        async with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                await connection.execute(text("SELECT * FROM missing"))
+            await connection.execute(text("SELECT 1"))
+            start_times = connection.sync_connection.info["lrqc_query_start"]
+        await engine.dispose()
+        return start_times
+
+    timings = RequestTimings()
+    token = request_timings.set(timings)
+    try:
+        assert asyncio.run(run()) == []
+    finally:
+        request_timings.reset(token)
+        del pool_stats["failing"]
+
+    assert timings.engines["failing"].statements == 2
+
+
+def test_streamed_response_timing(lrqc_engine, outcomes, caplog):
+    from lrqc.lrqc_outcome.db.connection import get_lrqc_db
+    from lrqc.lrqc_outcome.router import router
+
+    database = Database("timed", str(lrqc_engine.url), EngineSettings())
+
+    async def get_test_db():
+        async with database.session() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router, prefix="/qc")
+    app.include_router(main.router)
+    app.dependency_overrides[get_lrqc_db] = get_test_db
+    app.middleware("http")(main.instrument_requests)
+    terms = [term.dict() for term in outcomes]
+
+    try:
+        with TestClient(app) as client:
+            with caplog.at_level(logging.INFO, logger="lrqc.main"):
+                response = client.post(
+                    "/qc/qc_outcome/retrieve", json=terms, params={"stream": True}
+                )
+            metrics = client.get("/metrics").text
+            client.portal.call(database.dispose)
+    finally:
+        del pool_stats["timed"]
+
+    assert len(response.text.splitlines()) == len(outcomes)
+    assert response.headers["Server-Timing"].startswith("total;dur=")
+    assert "timed-sql;" in caplog.records[-1].getMessage()
+    assert (
+        'lrqc_request_sql_statements_total{method="POST",'
+        'route="/qc/qc_outcome/retrieve",engine="timed"}' in metrics
+    )
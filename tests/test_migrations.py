@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from lrqc.lrqc_outcome.db.db_schema import Base, PacbioEnt, SchemaVersion
+from lrqc.lrqc_outcome.db.migrations import LATEST_VERSION, current_version, upgrade
+
+
+def test_upgrade_empty_database():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+
+    assert upgrade(engine) == list(range(1, LATEST_VERSION + 1))
+    assert upgrade(engine) == []
+    with engine.connect() as connection:
+        assert current_version(connection) == LATEST_VERSION
+
+
+def create_unversioned_database():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name != SchemaVersion.__tablename__:
+                table.create(connection)
+                for index in table.indexes:
+                    index.drop(connection)
+        assert current_version(connection) == 1
+
+    return engine
+
+
+def test_upgrade_unversioned_database():
+    engine = create_unversioned_database()
+
+    assert upgrade(engine) == list(range(2, LATEST_VERSION + 1))
+
+    indexes = {
+        index["name"]: index["unique"]
+        for table in Base.metadata.tables
+        for index in inspect(engine).get_indexes(table)
+    }
+    assert indexes["uq_pacbio_ent_run_name_cell_label"]
+    assert indexes["uq_qc_outcome_id_entity"]
+    assert not indexes["ix_qc_outcome_history_id_entity"]
+    assert not indexes["ix_qc_summary_id_entity"]
+
+
+def test_upgrade_with_duplicates():
+    engine = create_unversioned_database()
+    with engine.begin() as connection:
+        connection.execute(
+            PacbioEnt.__table__.insert(),
+            [
+                {"run_name": "RUN-1", "cell_label": "A1"},
+                {"run_name": "RUN-1", "cell_label": "A1"},
+                {"run_name": "RUN-1", "cell_label": "B1"},
+                {"run_name": "RUN-1", "cell_label": None},
+                {"run_name": "RUN-1", "cell_label": None},
+            ],
+        )
+
+    with pytest.raises(RuntimeError, match=r"1 duplicate .* \('RUN-1', 'A1'\)\."):
+        upgrade(engine)
+
+    with engine.connect() as connection:
+        assert current_version(connection) == 1
+    assert not inspect(engine).get_indexes(PacbioEnt.__tablename__)
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("ml_warehouse")
+
+from ml_warehouse.schema import PacBioRun, PacBioRunWellMetrics  # noqa: E402
+from sqlalchemy import select, update  # noqa: E402
+
+from lrqc.mlwh.endpoints.pacbio_run import run_cache  # noqa: E402
+
+
+def complete_wells(mlwh_engine, complete=True):
+    """Get the run name and well label of the wells whose details are cacheable, or
+    of the others."""
+
+    is_complete = PacBioRunWellMetrics.well_status == "Complete"
+    stmt = (
+        select(PacBioRunWellMetrics.pac_bio_run_name, PacBioRunWellMetrics.well_label)
+        .filter(is_complete if complete else ~is_complete)
+        .order_by(PacBioRunWellMetrics.id_pac_bio_rw_metrics_tmp)
+    )
+    with mlwh_engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(stmt)]
+
+
+def touch_run(mlwh_engine, run_name, well_label):
+    """Update the last_updated of the run of a well in the MLWH."""
+
+    with mlwh_engine.begin() as connection:
+        connection.execute(
+            update(PacBioRun)
+            .filter(
+                PacBioRun.pac_bio_run_name == run_name,
+                PacBioRun.well_label == well_label,
+            )
+            .values(last_updated=datetime.now())
+        )
+
+
+def change_metrics(mlwh_engine, run_name, well_label, **values):
+    """Update the metrics of a well in the MLWH, but not its run."""
+
+    with mlwh_engine.begin() as connection:
+        connection.execute(
+            update(PacBioRunWellMetrics)
+            .filter(
+                PacBioRunWellMetrics.pac_bio_run_name == run_name,
+                PacBioRunWellMetrics.well_label == well_label,
+            )
+            .values(last_changed=datetime.now(), **values)
+        )
+
+
+def get_run(client, key, etag=None):
+    return client.get(
+        "/mlwh/pacbio/run",
+        params={"run_name": key[0], "well_label": key[1]},
+        headers={"If-None-Match": etag} if etag else {},
+    )
+
+
+def test_run_etag(app_client, mlwh_engine):
+    key = complete_wells(mlwh_engine)[0]
+
+    response = get_run(app_client, key)
+    assert response.status_code == 200
+    assert response.json()["run_info"]["pac_bio_run_name"] == key[0]
+    etag = response.headers["ETag"]
+
+    not_modified = get_run(app_client, key, etag)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+    # Without a cached entry, the tag is checked against the version of the run.
+    run_cache.clear()
+    assert get_run(app_client, key, etag).status_code == 304
+
+    touch_run(mlwh_engine, *key)
+    run_cache.clear()
+    response = get_run(app_client, key, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_get_runs(app_client, mlwh_engine):
+    keys = complete_wells(mlwh_engine)[:3] + complete_wells(mlwh_engine, False)[:1]
+    # One well is already cached.
+    get_run(app_client, keys[1])
+    requested = [keys[2], ("NO-SUCH-RUN", "A1"), keys[0], keys[3], keys[2], keys[1]]
+
+    response = app_client.post(
+        "/mlwh/pacbio/runs",
+        json=[{"run_name": run_name, "well_label": w} for run_name, w in requested],
+    )
+
+    assert response.status_code == 200
+    found = [key for key in requested if key[0] != "NO-SUCH-RUN"]
+    assert response.json() == [get_run(app_client, key).json() for key in found]
+
+
+def test_run_cache_revalidation(app_client, mlwh_engine, monkeypatch):
+    # Entries expire at once, so that every request revalidates them.
+    monkeypatch.setattr(run_cache.backend, "ttl", 0)
+    key = complete_wells(mlwh_engine)[0]
+
+    def cache_stats():
+        return app_client.get("/mlwh/pacbio/run/cache").json()
+
+    response = get_run(app_client, key)
+    assert cache_stats()["size"] == 1
+    revalidations = cache_stats()["revalidations"]
+
+    # The runs of the well are unchanged, so the expired entry is kept.
+    assert get_run(app_client, key).json() == response.json()
+    assert cache_stats()["revalidations"] == revalidations + 1
+
+    touch_run(mlwh_engine, *key)
+    assert get_run(app_client, key).json() != response.json()
+    assert cache_stats()["revalidations"] == revalidations + 1
+    assert cache_stats()["size"] == 1
+
+
+def test_run_etag_follows_metrics(app_client, mlwh_engine, monkeypatch):
+    monkeypatch.setattr(run_cache.backend, "ttl", 0)
+    key = complete_wells(mlwh_engine)[0]
+    response = get_run(app_client, key)
+    etag = response.headers["ETag"]
+
+    # Off-instrument CCS results arrive after the run is recorded.
+    hifi_num_reads = response.json()["metrics"]["hifi_num_reads"] + 1
+    change_metrics(mlwh_engine, *key, hifi_num_reads=hifi_num_reads)
+
+    changed = get_run(app_client, key, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["metrics"]["hifi_num_reads"] == hifi_num_reads
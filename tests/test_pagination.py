@@ -0,0 +1,70 @@
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from lrqc.lrqc_outcome.endpoints import misc
+from lrqc.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def fetch_pages(client, path, terms, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit} | ({"cursor": cursor} if cursor else {})
+        response = client.post(path, json=terms, params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize(
+    "path,per_well",
+    [
+        ("/qc/qc_outcome/retrieve", 1),
+        ("/qc/qc_outcome/retrieve_with_annotations", 1),
+        ("/qc/annotations/retrieve", 2),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [500, 3])
+def test_retrieve_pages(lrqc_client, outcomes, monkeypatch, path, per_well, chunk_size):
+    # Each chunk of the search terms is queried separately and the results merged.
+    monkeypatch.setattr(misc, "SEARCH_CHUNK_SIZE", chunk_size)
+    terms = [term.dict() for term in outcomes]
+    random.Random(0).shuffle(terms)
+
+    pages = fetch_pages(lrqc_client, path, terms, limit=7)
+
+    results = [result for page in pages for result in page]
+    assert [len(page) for page in pages[:-1]] == [7] * (len(pages) - 1)
+    assert len(results) == len(outcomes) * per_well
+    keys = [(r["run_name"], r["well_label"]) for r in results]
+    assert keys == sorted(keys)
+    assert sorted(results, key=str) == sorted(
+        lrqc_client.post(path, json=terms).json(), key=str
+    )
+
+
+def test_search_pages(lrqc_client, outcomes):
+    response = lrqc_client.get(
+        "/qc/qc_outcome/search", params={"run_name": "RUN-1", "limit": 30}
+    )
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+    response = lrqc_client.get(
+        "/qc/qc_outcome/search", params={"run_name": "RUN-1", "cursor": cursor}
+    )
+
+    assert len(response.json()) == 10
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_cursor():
+    assert decode_cursor(encode_cursor(("RUN-1", "A1", 3)), (str, str, int)) == (
+        "RUN-1",
+        "A1",
+        3,
+    )
+    for cursor, types in (("not a cursor", (str,)), (encode_cursor((1,)), (str,))):
+        with pytest.raises(HTTPException):
+            decode_cursor(cursor, types)
@@ -0,0 +1,321 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func, select, text
+
+from lrqc.lrqc_outcome.db.db_schema import (
+    Entity,
+    PacbioEnt,
+    QcOutcomeDict,
+    QcOutcomeHistory,
+)
+from lrqc.lrqc_outcome.endpoints import misc
+from lrqc.lrqc_outcome.endpoints.annotations import retrieve_annotations
+from lrqc.lrqc_outcome.endpoints.qc_outcomes import (
+    create_qc_outcome,
+    retrieve_qc_outcome_with_annotations,
+    retrieve_qc_outcomes,
+)
+from lrqc.lrqc_outcome.models import PacBioSearch, QcOutcomeInit
+from lrqc.lrqc_outcome.qc_outcome_dict import qc_outcome_dict
+
+
+def count_queries(engine, call, endpoint, terms):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        results = call(endpoint, terms)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    return len(statements), results
+
+
+@pytest.mark.parametrize(
+    "retrieve",
+    [retrieve_qc_outcomes, retrieve_qc_outcome_with_annotations, retrieve_annotations],
+)
+def test_retrieve_query_count_is_constant(
+    lrqc_async_engine, call_lrqc, outcomes, retrieve
+):
+    engine = lrqc_async_engine
+    one, results_one = count_queries(engine, call_lrqc, retrieve, outcomes[:1])
+    many, results_many = count_queries(engine, call_lrqc, retrieve, outcomes)
+
+    assert len(results_many) == len(outcomes) * len(results_one)
+    assert one == many
+    assert many <= 3
+
+
+def test_retrieve_with_annotations(call_lrqc, outcomes):
+    results = call_lrqc(retrieve_qc_outcome_with_annotations, outcomes[:2])
+
+    assert [r.well_label for r in results] == ["W0", "W1"]
+    assert results[1].description == "Passed"
+    assert sorted(a.annotation for a in results[1].annotations) == [
+        "note 1.0",
+        "note 1.1",
+    ]
+
+
+def test_retrieve_without_qc_outcome(lrqc_session, call_lrqc, outcomes):
+    entity = Entity(type_="cell", platform_name="pacbio")
+    lrqc_session.add(PacbioEnt(run_name="RUN-2", cell_label="A1", entity=entity))
+    lrqc_session.commit()
+
+    terms = [PacBioSearch(run_name="RUN-2", well_label="A1"), outcomes[0]]
+
+    assert [r.well_label for r in call_lrqc(retrieve_qc_outcomes, terms)] == ["W0"]
+
+
+@pytest.mark.parametrize(
+    "params,headers",
+    [({"stream": True}, {}), ({}, {"Accept": "application/x-ndjson"})],
+)
+def test_retrieve_ndjson(lrqc_client, outcomes, monkeypatch, params, headers):
+    monkeypatch.setattr(misc, "SEARCH_CHUNK_SIZE", 7)
+    terms = [term.dict() for term in outcomes]
+
+    response = lrqc_client.post(
+        "/qc/qc_outcome/retrieve_with_annotations",
+        json=terms,
+        params=params,
+        headers=headers,
+    )
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert (
+        records
+        == lrqc_client.post(
+            "/qc/qc_outcome/retrieve_with_annotations", json=terms
+        ).json()
+    )
+
+
+def test_create_reuses_qc_outcome_dict(lrqc_session, call_lrqc, outcomes):
+    for i in range(3):
+        call_lrqc(
+            create_qc_outcome,
+            PacBioSearch(run_name="RUN-2", well_label=f"W{i}"),
+            QcOutcomeInit(user_name="ab123", description="Passed"),
+        )
+    call_lrqc(
+        create_qc_outcome,
+        outcomes[0],
+        QcOutcomeInit(user_name="ab123", description="Failed"),
+    )
+
+    assert (
+        lrqc_session.execute(select(func.count(QcOutcomeDict.description))).scalar()
+        == 2
+    )
+    results = call_lrqc(
+        retrieve_qc_outcomes,
+        [PacBioSearch(run_name="RUN-2", well_label="W2"), outcomes[0]],
+    )
+    assert [r.description for r in results] == ["Passed", "Failed"]
+
+
+def test_create_with_concurrent_qc_outcome_dict(
+    lrqc_engine, call_lrqc, outcomes, monkeypatch
+):
+    # Another writer adds the description after the lookup table was reloaded.
+    monkeypatch.setattr(qc_outcome_dict, "refresh", lambda db_session: {})
+    with lrqc_engine.begin() as connection:
+        connection.execute(
+            QcOutcomeDict.__table__.insert(),
+            {"description": "Failed", "long_description": "Failed QC"},
+        )
+
+    call_lrqc(
+        create_qc_outcome,
+        outcomes[0],
+        QcOutcomeInit(user_name="ab123", description="Failed", long_description="x"),
+    )
+
+    (result,) = call_lrqc(retrieve_qc_outcomes, [outcomes[0]])
+    assert (result.description, result.long_description) == ("Failed", "Failed QC")
+
+
+def test_create_bulk(lrqc_session, lrqc_client, outcomes):
+    def item(terms, description):
+        return {
+            "pacbio_entity": terms.dict(),
+            "qc_outcome": {"user_name": "ab123", "description": description},
+        }
+
+    new = PacBioSearch(run_name="RUN-2", well_label="W0")
+    items = [item(outcomes[0], "Failed"), item(new, "Passed")]
+    items += [item(outcomes[1], "Failed"), item(outcomes[0], "Passed")]
+    items[1]["annotation"] = {"annotation": "New well", "user_name": "ab123"}
+
+    response = lrqc_client.post("/qc/qc_outcome/create_bulk", json=items)
+
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()] == [
+        "updated",
+        "created",
+        "updated",
+        "duplicate",
+    ]
+    history = lrqc_session.execute(select(QcOutcomeHistory)).scalars().all()
+    assert len(history) == 2
+    assert {h.qc_outcome_dict.description for h in history} == {"Passed"}
+
+    results = lrqc_client.post(
+        "/qc/qc_outcome/retrieve_with_annotations",
+        json=[t.dict() for t in (outcomes[0], new, outcomes[1])],
+    ).json()
+    assert [r["description"] for r in results] == ["Failed", "Passed", "Failed"]
+    assert [a["annotation"] for a in results[1]["annotations"]] == ["New well"]
+
+
+def test_create_bulk_errors(lrqc_session, lrqc_client, outcomes):
+    # Stands in for a constraint violated by some items only.
+    for event_name in ("INSERT", "UPDATE"):
+        lrqc_session.execute(
+            text(
+                f"CREATE TRIGGER reject_{event_name} BEFORE {event_name} ON qc_outcome "
+                "WHEN NEW.user_name = 'rejected' "
+                "BEGIN SELECT RAISE(ABORT, 'rejected user'); END"
+            )
+        )
+    lrqc_session.commit()
+
+    def item(terms, user_name):
+        return {
+            "pacbio_entity": terms.dict(),
+            "qc_outcome": {"user_name": user_name, "description": "Failed"},
+        }
+
+    new = [PacBioSearch(run_name="RUN-2", well_label=f"W{i}") for i in range(2)]
+    items = [item(outcomes[0], "ab123"), item(outcomes[1], "rejected")]
+    items += [item(new[0], "rejected"), item(new[1], "ab123")]
+
+    response = lrqc_client.post("/qc/qc_outcome/create_bulk", json=items)
+
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()] == [
+        "updated",
+        "error",
+        "error",
+        "created",
+    ]
+    history = lrqc_session.execute(select(QcOutcomeHistory)).scalars().all()
+    assert len(history) == 1
+
+    results = lrqc_client.post(
+        "/qc/qc_outcome/retrieve", json=[t.dict() for t in outcomes[:2] + new]
+    ).json()
+    assert [(r["well_label"], r["description"]) for r in results] == [
+        ("W0", "Failed"),
+        ("W1", "Passed"),
+        ("W1", "Failed"),
+    ]
+
+    response = lrqc_client.post(
+        "/qc/qc_outcome/create", json=item(outcomes[2], "rejected")
+    )
+    assert response.status_code == 400
+
+
+def test_search(lrqc_client, outcomes):
+    items = [
+        {
+            "pacbio_entity": {"run_name": run_name, "well_label": "A1"},
+            "qc_outcome": {"user_name": "ab123", "description": "Failed"},
+        }
+        for run_name in ("RUN-12", "RUN-120", "RUN_12", "RUN-2")
+    ]
+    lrqc_client.post("/qc/qc_outcome/create_bulk", json=items)
+
+    def search(**params):
+        response = lrqc_client.get("/qc/qc_outcome/search", params=params)
+        assert response.status_code == 200
+        return [(r["run_name"], r["well_label"]) for r in response.json()]
+
+    assert len(search(run_name="RUN-1")) == 40
+    assert search(run_name="RUN-12") == [("RUN-12", "A1")]
+    assert search(run_name_prefix="RUN-12") == [("RUN-12", "A1"), ("RUN-120", "A1")]
+    assert search(run_name_prefix="RUN_") == [("RUN_12", "A1")]
+
+    updated = datetime.fromisoformat(
+        lrqc_client.post(
+            "/qc/qc_outcome/retrieve", json=[{"run_name": "RUN-2", "well_label": "A1"}]
+        ).json()[0]["date_updated"]
+    )
+    second = timedelta(seconds=1)
+    assert search(updated_since=updated - second, run_name_prefix="RUN-2") == [
+        ("RUN-2", "A1")
+    ]
+    assert search(updated_before=updated - second, run_name_prefix="RUN-2") == []
+    assert len(search(updated_before=updated + second)) == 44
+
+    assert lrqc_client.get("/qc/qc_outcome/search").status_code == 400
+
+
+def test_search_etag(lrqc_client, outcomes):
+    response = lrqc_client.get("/qc/qc_outcome/search", params={"run_name": "RUN-1"})
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    def search(**headers):
+        return lrqc_client.get(
+            "/qc/qc_outcome/search", params={"run_name": "RUN-1"}, headers=headers
+        )
+
+    not_modified = search(**{"If-None-Match": f'"other", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert search(**{"If-None-Match": '"other"'}).status_code == 200
+
+    lrqc_client.post(
+        "/qc/qc_outcome/create_bulk",
+        json=[
+            {
+                "pacbio_entity": outcomes[3].dict(),
+                "qc_outcome": {"user_name": "ab123", "description": "Failed"},
+            }
+        ],
+    )
+    response = search(**{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 40
+
+
+def test_search_etag_changes(lrqc_session, lrqc_client, outcomes):
+    # The outcomes were last updated long ago, so that a change of user alone moves
+    # their latest date_updated.
+    lrqc_session.execute(
+        text("UPDATE qc_outcome SET date_updated = '2020-01-01 00:00:00'")
+    )
+    lrqc_session.commit()
+
+    response = lrqc_client.get("/qc/qc_outcome/search", params={"run_name": "RUN-1"})
+    etag = response.headers["ETag"]
+
+    lrqc_client.post(
+        "/qc/qc_outcome/create_bulk",
+        json=[
+            {
+                "pacbio_entity": outcomes[2].dict(),
+                "qc_outcome": {"user_name": "cd456", "description": "Passed"},
+            }
+        ],
+    )
+
+    response = lrqc_client.get(
+        "/qc/qc_outcome/search",
+        params={"run_name": "RUN-1"},
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [o["user_name"] for o in response.json()].count("cd456") == 1
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from lrqc.serialization import FastJSONRoute, coerce_column, from_orm_trusted
+
+
+class Record(BaseModel):
+    name: str = None
+    day: date = None
+    time: datetime = None
+    ratio: float = None
+    count: int = None
+    flag: bool = None
+    tags: List[str] = []
+
+    class Config:
+        orm_mode = True
+
+
+ROW = SimpleNamespace(
+    name=42,
+    day=datetime(2022, 5, 3, 12, 35),
+    time=datetime(2022, 5, 3, 12, 35, 1, 5000),
+    ratio=Decimal("0.25"),
+    count=Decimal(7),
+    flag=1,
+)
+
+
+def test_from_orm_trusted_matches_from_orm():
+    trusted = from_orm_trusted(Record, ROW)
+
+    assert trusted == Record.from_orm(ROW)
+    assert trusted.tags is not Record.__fields__["tags"].default
+
+
+def test_coerce_column_matches_from_orm():
+    rows = [
+        ROW,
+        SimpleNamespace(name=None, day=None, ratio=None, count=None, flag=None),
+    ]
+
+    for name in ("name", "day", "ratio", "count", "flag"):
+        values = [getattr(row, name) for row in rows]
+        assert coerce_column(Record, name, values) == [
+            getattr(Record.from_orm(row), name) for row in rows
+        ], name
+
+
+def test_fast_json_route_matches_default_route():
+    app = FastAPI()
+
+    @app.get("/default", response_model=List[Record])
+    async def default():
+        return [Record.from_orm(ROW)]
+
+    app.router.route_class = FastJSONRoute
+
+    @app.get("/fast", response_model=List[Record])
+    async def fast():
+        return [from_orm_trusted(Record, ROW)]
+
+    client = TestClient(app)
+    response = client.get("/fast")
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == client.get("/default").json()
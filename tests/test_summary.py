@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from lrqc.cache import configure_caches
+from lrqc.lrqc_outcome.db.summary import rebuild_summaries
+from lrqc.lrqc_outcome.endpoints.annotations import create_annotation
+from lrqc.lrqc_outcome.endpoints.qc_outcomes import create_qc_outcome
+from lrqc.lrqc_outcome.endpoints.summary import qc_summary_cache, retrieve_summaries
+from lrqc.lrqc_outcome.models import Annotation, PacBioSearch, QcOutcomeInit
+
+
+def test_rebuild(lrqc_session, call_lrqc, outcomes):
+    assert call_lrqc(retrieve_summaries, outcomes) == []
+
+    rebuild_summaries(lrqc_session)
+    lrqc_session.commit()
+    # The rebuild bypasses the writers, which invalidate the cache.
+    qc_summary_cache.clear()
+
+    summaries = call_lrqc(retrieve_summaries, outcomes[3:0:-1])
+    assert [s.well_label for s in summaries] == ["W3", "W2", "W1"]
+    assert {(s.description, s.annotation_count) for s in summaries} == {("Passed", 2)}
+
+
+def test_maintained_on_write(call_lrqc):
+    new = PacBioSearch(run_name="RUN-2", well_label="W0")
+    other = PacBioSearch(run_name="RUN-2", well_label="W1")
+
+    call_lrqc(create_annotation, [new, other], Annotation(annotation="Note"))
+    call_lrqc(
+        create_qc_outcome, new, QcOutcomeInit(user_name="ab123", description="Passed")
+    )
+    call_lrqc(
+        create_qc_outcome, new, QcOutcomeInit(user_name="cd456", description="Failed")
+    )
+
+    summaries = call_lrqc(retrieve_summaries, [new, other])
+    assert [(s.description, s.user_name, s.annotation_count) for s in summaries] == [
+        ("Failed", "cd456", 1),
+        (None, None, 1),
+    ]
+    assert summaries[0].date_updated is not None
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_cache_invalidated_on_write(call_lrqc, tmp_path, shared):
+    if shared:
+        configure_caches(f"sqlite:///{tmp_path / 'cache.db'}")
+    try:
+        new = PacBioSearch(run_name="RUN-2", well_label="W0")
+        assert call_lrqc(retrieve_summaries, [new]) == []
+
+        call_lrqc(create_annotation, [new], Annotation(annotation="Note"))
+        summaries = call_lrqc(retrieve_summaries, [new])
+        assert [s.annotation_count for s in summaries] == [1]
+
+        call_lrqc(
+            create_qc_outcome,
+            new,
+            QcOutcomeInit(user_name="ab123", description="Passed"),
+        )
+        summaries = call_lrqc(retrieve_summaries, [new])
+        assert [s.description for s in summaries] == ["Passed"]
+        assert asyncio.run(qc_summary_cache.stats()).hits == 0
+        assert call_lrqc(retrieve_summaries, [new]) == summaries
+        # Summaries are only cached in a shared backend.
+        assert asyncio.run(qc_summary_cache.stats()).hits == (1 if shared else 0)
+    finally:
+        configure_caches(None)
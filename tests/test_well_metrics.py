@@ -0,0 +1,146 @@
+from collections import Counter
+from datetime import date, datetime
+from statistics import mean
+
+import pytest
+
+pytest.importorskip("ml_warehouse")
+
+from ml_warehouse.schema import PacBioRunWellMetrics  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from lrqc.mlwh.aggregation import bucket_start  # noqa: E402
+from lrqc.mlwh.endpoints.well_metrics import summary_cache  # noqa: E402
+
+
+def well_rows(mlwh_engine, since, until, *columns):
+    """Get some columns of the wells completed in a period, from the MLWH."""
+
+    stmt = (
+        select(
+            PacBioRunWellMetrics.pac_bio_run_name,
+            PacBioRunWellMetrics.well_label,
+            PacBioRunWellMetrics.well_complete,
+            *columns,
+        )
+        .filter(
+            PacBioRunWellMetrics.well_complete >= since,
+            PacBioRunWellMetrics.well_complete < until,
+        )
+        .order_by(
+            PacBioRunWellMetrics.well_complete,
+            PacBioRunWellMetrics.pac_bio_run_name,
+            PacBioRunWellMetrics.well_label,
+        )
+    )
+    with mlwh_engine.connect() as connection:
+        return connection.execute(stmt).all()
+
+
+def test_well_metrics(app_client, mlwh_engine):
+    completes = [
+        row.well_complete for row in well_rows(mlwh_engine, datetime.min, datetime.max)
+    ]
+    since, until = completes[5], completes[-5]
+    rows = well_rows(
+        mlwh_engine,
+        since,
+        until,
+        PacBioRunWellMetrics.hifi_read_bases,
+        PacBioRunWellMetrics.well_status,
+    )
+    assert rows
+
+    response = app_client.get(
+        "/mlwh/pacbio/well_metrics",
+        params={
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "metrics": ["hifi_read_bases", "well_status", "hifi_read_bases"],
+        },
+    )
+
+    assert response.status_code == 200
+    columns = response.json()
+    assert list(zip(columns["run_name"], columns["well_label"])) == [
+        (row.pac_bio_run_name, row.well_label) for row in rows
+    ]
+    assert list(map(datetime.fromisoformat, columns["well_complete"])) == [
+        row.well_complete for row in rows
+    ]
+    assert columns["metrics"] == {
+        "hifi_read_bases": [row.hifi_read_bases for row in rows],
+        "well_status": [row.well_status for row in rows],
+    }
+
+    response = app_client.get(
+        "/mlwh/pacbio/well_metrics",
+        params={"since": since.isoformat(), "metrics": ["no_such_metric"]},
+    )
+    assert response.status_code == 400
+
+
+def test_well_metric_summaries(app_client, mlwh_engine, monkeypatch):
+    rows = well_rows(
+        mlwh_engine,
+        datetime.min,
+        datetime.max,
+        PacBioRunWellMetrics.instrument_name,
+        PacBioRunWellMetrics.chip_type,
+        PacBioRunWellMetrics.hifi_read_bases,
+    )
+    groups = Counter(
+        (bucket_start(r.well_complete, "week"), r.instrument_name, r.chip_type)
+        for r in rows
+    )
+    first = rows[0].well_complete.date()
+    # The weeks from the one of the first well to the current one.
+    weeks = (bucket_start(date.today(), "week") - bucket_start(first, "week")).days
+    buckets = weeks // 7 + 1
+
+    def get_summaries():
+        response = app_client.get(
+            "/mlwh/pacbio/well_metrics/summary",
+            params={"since": first.isoformat(), "metrics": ["hifi_read_bases"]},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    def cache_stats():
+        return app_client.get("/mlwh/pacbio/well_metrics/summary/cache").json()
+
+    before = cache_stats()
+    summaries = get_summaries()
+    keys = [
+        (date.fromisoformat(s["bucket_start"]), s["instrument_name"], s["chip_type"])
+        for s in summaries
+    ]
+    assert keys == sorted(groups)
+    assert [s["wells"] for s in summaries] == [groups[key] for key in keys]
+    stats = summaries[0]["metrics"]["hifi_read_bases"]
+    values = [
+        r.hifi_read_bases
+        for r in rows
+        if (bucket_start(r.well_complete, "week"), r.instrument_name, r.chip_type)
+        == keys[0]
+        and r.hifi_read_bases is not None
+    ]
+    assert stats["count"] == len(values)
+    assert stats["mean"] == pytest.approx(mean(values))
+
+    # The summaries of all the buckets but the current one are cached.
+    assert cache_stats()["misses"] - before["misses"] == buckets
+    assert cache_stats()["size"] - before["size"] == buckets - 1
+    assert get_summaries() == summaries
+    assert cache_stats()["hits"] - before["hits"] == buckets - 1
+
+    # Expired summaries are summarised again.
+    monkeypatch.setattr(summary_cache.backend, "ttl", 0)
+    assert get_summaries() == summaries
+    assert cache_stats()["hits"] - before["hits"] == buckets - 1
+
+    response = app_client.get(
+        "/mlwh/pacbio/well_metrics/summary",
+        params={"since": first.isoformat(), "metrics": ["well_status"]},
+    )
+    assert response.status_code == 400